@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# benchmarks/bench_analytics.py
+"""
+Line-item analytics: vectorised (NumPy) against pure-Python aggregation.
+
+    python benchmarks/bench_analytics.py --lines 1000000
+
+Builds SalesFacts from N synthetic line items, then times the per-product,
+per-customer and per-day reports with each engine and checks they agree.
+Without NumPy installed only the pure-Python times are shown.
+"""
+import argparse
+import datetime
+import random
+import time
+
+import benchutil   # noqa: F401  (puts src/ on sys.path)
+import analytics   # noqa: E402
+
+
+def synthetic_lines(n, products, customers, days, seed=42):
+    rng = random.Random(seed)
+    start = datetime.date(2025, 1, 1)
+    order = 0
+    for i in range(n):
+        if i % 3 == 0:
+            order += 1
+        yield (f"ORD{order:08d}", f"C{rng.randrange(customers):06d}", f"P{rng.randrange(products):06d}",
+               str(rng.randint(1, 5)), f"{rng.randint(50, 50000) / 100:.2f}",
+               (start + datetime.timedelta(days=i * days // n)).isoformat())
+
+
+def run_reports(facts):
+    t0 = time.perf_counter()
+    result = (facts.by_product(analytics.TOP_N), facts.by_customer(analytics.TOP_N), facts.by_day(), facts.totals())
+    return result, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lines', type=int, default=1000000)
+    parser.add_argument('--products', type=int, default=20000)
+    parser.add_argument('--customers', type=int, default=50000)
+    parser.add_argument('--days', type=int, default=90)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    facts = analytics.SalesFacts.from_values(synthetic_lines(args.lines, args.products, args.customers, args.days))
+    print(f"load {len(facts):,} lines into columns: {time.perf_counter() - t0:.2f}s")
+
+    numpy = analytics.np
+    timings = {}
+    results = {}
+    for engine in (['numpy'] if numpy is not None else []) + ['python']:
+        analytics.np = numpy if engine == 'numpy' else None
+        results[engine], timings[engine] = run_reports(facts)
+        print(f"{engine:>7}: product + customer + day reports in {timings[engine]:.3f}s")
+    analytics.np = numpy
+
+    if len(results) == 2:
+        same = results['numpy'] == results['python']
+        print(f"speedup {timings['python'] / timings['numpy']:.1f}x, "
+              f"{'✅ identical results' if same else '❌ results differ'}")
+        raise SystemExit(0 if same else 1)
+
+
+if __name__ == '__main__':
+    main()
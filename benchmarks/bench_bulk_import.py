@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# benchmarks/bench_bulk_import.py
+"""
+Bulk product import/export on a large synthetic feed.
+
+    python benchmarks/bench_bulk_import.py --rows 1000000 --format csv
+
+Builds a catalog of half the feed size, then imports a feed where half the
+rows update existing products, the rest are new, and 1 in 1000 are invalid.
+Reports rows/sec and peak RSS, checks the counts, and times an export.
+Runs against a scratch data dir (INVENTORY_BACKEND is honoured).
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:   # Windows
+    resource = None
+
+import benchutil     # noqa: F401  (puts src/ on sys.path)
+import storage        # noqa: E402
+import product_feed   # noqa: E402
+
+
+def write_feed(path, rows, fmt):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f) if fmt == 'csv' else None
+        if writer:
+            writer.writerow(['product_id', 'name', 'price', 'stock'])
+        for i in range(rows):
+            # the first half of the feed updates the existing catalog, the rest is new
+            row = [f"P{i:07d}", f"Item {i}", f"{(i % 500) + 0.99:.2f}", str(i % 100)]
+            if i % 1000 == 999:
+                row[3] = 'lots'   # invalid stock
+            if writer:
+                writer.writerow(row)
+            else:
+                f.write(json.dumps(dict(zip(['product_id', 'name', 'price', 'stock'], row))) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        benchutil.use_data_dir(tmp)
+        backend = storage.get_backend()
+        existing = args.rows // 2
+        backend.import_products({'product_id': f"P{i:07d}", 'name': f"Old {i}", 'price': '1.00', 'stock': '5'}
+                                for i in range(existing))
+        feed = os.path.join(tmp, f"feed.{args.format}")
+        write_feed(feed, args.rows, args.format)
+
+        result = product_feed.import_feed(feed)
+        print(f"import ({backend.name}, {args.format}): {result['read']:,} rows in {result['seconds']}s "
+              f"= {result['read'] / result['seconds']:,.0f} rows/sec")
+        if resource:
+            # ru_maxrss is KB on Linux, bytes on macOS
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            print(f"  peak RSS {peak / (2**20 if sys.platform == 'darwin' else 2**10):.0f} MB")
+        print(f"  {result['inserted']:,} new, {result['updated']:,} updated, {result['rejected']:,} rejected")
+
+        t0 = time.perf_counter()
+        exported = product_feed.export_feed(os.path.join(tmp, f"export.{args.format}"))
+        print(f"export: {exported:,} rows in {time.perf_counter() - t0:.2f}s")
+
+        bad = args.rows // 1000
+        expected_total = existing + sum(1 for i in range(existing, args.rows) if i % 1000 != 999)
+        ok = (result['rejected'] == bad and result['accepted'] == args.rows - bad
+              and exported == expected_total)
+        print("✅ counts check out" if ok else f"❌ unexpected counts (exported {exported}, expected {expected_total})")
+        raise SystemExit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
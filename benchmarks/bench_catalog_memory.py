@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# benchmarks/bench_catalog_memory.py
+"""
+Memory and speed of the compact product catalog against a list of dicts.
+
+    python benchmarks/bench_catalog_memory.py --products 1000000
+
+Writes a synthetic products.csv, then loads it both ways: as storage.read_csv
+dicts plus a product_id index (how the catalog used to be held), and as the
+column-array ProductTable behind list_products() today. Reports the memory
+each keeps alive (tracemalloc), load time, a full list_products() pass and
+random lookups.
+"""
+import argparse
+import gc
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+import benchutil        # noqa: F401  (puts src/ on sys.path)
+from storage import PRODUCT_FIELDS, read_csv, write_csv_temp, iter_csv_values   # noqa: E402
+from product_table import ProductTable, ProductRows                              # noqa: E402
+
+NAMES = ['Notebook', 'Pen', 'Stapler', 'Envelope Pack', 'Marker', 'Folder', 'Glue Stick', 'Ruler']
+
+
+def measure(build):
+    """Bytes still allocated by build()'s result once it returns."""
+    gc.collect()
+    tracemalloc.start()
+    obj = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, size
+
+
+def load_dicts(path):
+    rows = read_csv(path)
+    return rows, {r['product_id']: r for r in rows}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=1000000)
+    parser.add_argument('--lookups', type=int, default=200000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'products.csv')
+        os.replace(write_csv_temp(path, PRODUCT_FIELDS, (
+            [f"P{i:07d}", f"{rng.choice(NAMES)} {i % 5000}", f"{rng.randint(1, 99999) / 100:.2f}",
+             str(rng.randint(0, 500))] for i in range(args.products)), as_lists=True), path)
+        pids = [f"P{rng.randrange(args.products):07d}" for _ in range(args.lookups)]
+
+        (rows, index), dict_bytes = measure(lambda: load_dicts(path))
+        t0 = time.perf_counter()   # timed again without tracemalloc slowing it down
+        load_dicts(path)
+        dict_load = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        listed = [dict(r) for r in rows]   # what list_products() used to return
+        dict_list = time.perf_counter() - t0
+        del listed
+        t0 = time.perf_counter()
+        for pid in pids:
+            dict(index[pid])
+        dict_get = time.perf_counter() - t0
+        del rows, index
+
+        table, table_bytes = measure(lambda: ProductTable.from_values(iter_csv_values(path, PRODUCT_FIELDS)))
+        t0 = time.perf_counter()
+        ProductTable.from_values(iter_csv_values(path, PRODUCT_FIELDS))
+        table_load = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for _ in ProductRows(table):
+            pass
+        table_list = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for pid in pids:
+            table.get(pid)
+        table_get = time.perf_counter() - t0
+
+    print(f"{args.products:,} products")
+    print(f"{'':<22}{'memory':>12}{'load':>10}{'list all':>11}{'lookups':>10}")
+    print(f"{'list of dicts':<22}{dict_bytes / 2**20:>10.1f}MB{dict_load:>9.2f}s{dict_list:>10.2f}s{dict_get:>9.2f}s")
+    print(f"{'ProductTable':<22}{table_bytes / 2**20:>10.1f}MB{table_load:>9.2f}s{table_list:>10.2f}s{table_get:>9.2f}s")
+    ratio = dict_bytes / table_bytes
+    print(f"compact catalog uses {ratio:.1f}x less memory")
+    raise SystemExit(0 if ratio >= 2 else 1)
+
+
+if __name__ == '__main__':
+    main()
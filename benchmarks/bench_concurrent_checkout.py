@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# benchmarks/bench_concurrent_checkout.py
+"""
+Stress test: N processes run checkouts against one data directory at the same
+time, then the final stock is checked against exactly what was sold.
+
+    python benchmarks/bench_concurrent_checkout.py --procs 1 2 4 8 --orders 50
+"""
+import argparse
+import collections
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import benchutil
+from benchutil import quiet
+import accounts  # noqa: E402
+import products  # noqa: E402
+import sales     # noqa: E402
+import storage   # noqa: E402
+
+
+def make_catalog(data_dir, n_products, stock):
+    rows = [{'product_id': f"P{i:05d}", 'name': f"Item {i}", 'price': f"{1 + i % 50}.00", 'stock': str(stock)}
+            for i in range(n_products)]
+    benchutil.use_data_dir(data_dir)
+    storage.get_backend().upsert_products(rows)
+    return {r['product_id']: stock for r in rows}
+
+
+def worker(data_dir, seed, n_orders, n_products, start, results):
+    import customer
+    benchutil.use_data_dir(data_dir)
+    rng = random.Random(seed)
+    sold = collections.Counter()
+    ok = failed = 0
+    start.wait()
+    for _ in range(n_orders):
+        cart = []
+        for pid in rng.sample(range(n_products), rng.randint(1, 5)):
+            product_id = f"P{pid:05d}"
+            cart.append({'product_id': product_id, 'name': product_id, 'price': '1.00', 'qty': rng.randint(1, 3)})
+        with quiet():
+            done = customer.checkout(f"C{seed}", cart)
+        if done:
+            ok += 1
+            for it in cart:
+                sold[it['product_id']] += it['qty']
+        else:
+            failed += 1
+    results.put((dict(sold), ok, failed))
+
+
+def run(n_procs, n_orders, n_products, stock):
+    data_dir = tempfile.mkdtemp(prefix='inv_stress_')
+    try:
+        initial = make_catalog(data_dir, n_products, stock)
+        for seed in range(n_procs):
+            accounts.create_customer(f"C{seed}", f"Stress {seed}", 'x')
+        ctx = multiprocessing.get_context()
+        start, results = ctx.Event(), ctx.Queue()
+        procs = [ctx.Process(target=worker, args=(data_dir, seed, n_orders, n_products, start, results))
+                 for seed in range(n_procs)]
+        for p in procs:
+            p.start()
+        t0 = time.perf_counter()
+        start.set()
+        outcomes = [results.get() for _ in procs]
+        elapsed = time.perf_counter() - t0
+        for p in procs:
+            p.join()
+
+        sold = collections.Counter()
+        ok = failed = 0
+        for s, o, f in outcomes:
+            sold.update(s)
+            ok += o
+            failed += f
+
+        benchutil.use_data_dir(data_dir)
+        products.invalidate_catalog()
+        final = {p['product_id']: int(p['stock']) for p in products.list_products()}
+        expected = {pid: initial[pid] - sold[pid] for pid in initial}
+        lost = {pid: (expected[pid], final.get(pid)) for pid in expected if final.get(pid) != expected[pid]}
+        logged = sum(1 for _ in sales.iter_sales(*_today_range()))
+        return {
+            'procs': n_procs, 'orders_ok': ok, 'orders_rejected': failed,
+            'seconds': round(elapsed, 3), 'orders_per_sec': round(ok / elapsed, 1) if elapsed else 0,
+            'stock_exact': not lost, 'sales_logged': logged, 'sales_exact': logged == ok,
+            'mismatches': dict(list(lost.items())[:5]),
+        }
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def _today_range():
+    import datetime
+    today = datetime.date.today()
+    return today, today
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--procs', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--orders', type=int, default=50, help='checkouts per process')
+    parser.add_argument('--products', type=int, default=200)
+    parser.add_argument('--stock', type=int, default=1000, help='initial stock per product (lower it to force rejections)')
+    args = parser.parse_args()
+
+    print(f"backend: {storage.BACKEND}")
+    print(f"{'procs':>5} {'ok':>6} {'rejected':>9} {'secs':>8} {'orders/s':>9}  stock  sales")
+    all_exact = True
+    for n in args.procs:
+        r = run(n, args.orders, args.products, args.stock)
+        all_exact &= r['stock_exact'] and r['sales_exact']
+        print(f"{r['procs']:>5} {r['orders_ok']:>6} {r['orders_rejected']:>9} {r['seconds']:>8} {r['orders_per_sec']:>9}  "
+              f"{'exact' if r['stock_exact'] else 'LOST'}  {'exact' if r['sales_exact'] else 'LOST'}")
+        if r['mismatches']:
+            print(f"      mismatches (expected, actual): {r['mismatches']}")
+    raise SystemExit(0 if all_exact else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# benchmarks/bench_ids.py
+"""
+ID generator throughput and uniqueness.
+
+    python benchmarks/bench_ids.py --count 500000 --procs 4
+
+Reports IDs/sec in one process, then has N processes generate IDs at the same
+time and checks there are no duplicates and each process's IDs are sorted.
+"""
+import argparse
+import multiprocessing
+import time
+
+import benchutil  # noqa: F401  (puts src/ on sys.path)
+import ids        # noqa: E402
+
+
+def generate(count):
+    return [ids.new_order_id() for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=500000, help='IDs per process')
+    parser.add_argument('--procs', type=int, default=4)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    generate(args.count)
+    rate = args.count / (time.perf_counter() - t0)
+    print(f"single process: {rate:,.0f} IDs/sec")
+
+    with multiprocessing.Pool(args.procs) as pool:
+        batches = pool.map(generate, [args.count] * args.procs)
+    total = sum(len(b) for b in batches)
+    unique = len(set(i for b in batches for i in b))
+    ordered = all(b == sorted(b) for b in batches)
+    print(f"{args.procs} processes: {total:,} IDs, {total - unique} duplicates, "
+          f"{'sorted' if ordered else 'NOT sorted'} per process")
+    raise SystemExit(0 if unique == total and ordered and rate >= 100000 else 1)
+
+
+if __name__ == '__main__':
+    main()
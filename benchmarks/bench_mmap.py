@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# benchmarks/bench_mmap.py
+"""
+Stock update latency against catalog size: products.csv against the mmap
+binary catalog (products.bin).
+
+    python benchmarks/bench_mmap.py --sizes 1k 100k 1M
+
+For each size a seeded products.csv is written to a scratch directory and
+converted to products.bin. Then each backend runs set_stock (update_stock),
+a three-product adjust_stock (as a checkout does) and get_product on random
+products, each until --ops calls or --budget seconds. The CSV backend rewrites the
+file on every change, so its latency grows with the catalog. The binary
+catalog writes 8 bytes in place, so its latency should stay flat.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import benchutil   # noqa: F401  (puts src/ on sys.path)
+import datagen
+import mmap_backend   # noqa: E402
+from storage import PRODUCT_FIELDS, open_backend   # noqa: E402
+
+BACKENDS = ['csv', 'mmap']
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def timed(fn, make_input, max_ops, budget):
+    laps = []
+    deadline = time.perf_counter() + budget
+    while len(laps) < max_ops and (len(laps) < 3 or time.perf_counter() < deadline):
+        arg = make_input()
+        t0 = time.perf_counter()
+        fn(arg)
+        laps.append(time.perf_counter() - t0)
+    laps.sort()
+    return {'ops': len(laps), 'p50_ms': percentile(laps, 0.5) * 1000, 'p99_ms': percentile(laps, 0.99) * 1000}
+
+
+def run_size(workdir, label, rows, args):
+    data_dir = os.path.join(workdir, label)
+    os.makedirs(data_dir)
+    datagen._write(os.path.join(data_dir, 'products.csv'), PRODUCT_FIELDS, datagen.products(random.Random(42), rows))
+    t0 = time.perf_counter()
+    mmap_backend.build(data_dir)
+    print(f"{label:>6} build products.bin from products.csv: {time.perf_counter() - t0:.2f}s "
+          f"({os.path.getsize(os.path.join(data_dir, 'products.bin')) / 1e6:,.1f} MB)", flush=True)
+
+    rng = random.Random(args.seed)
+    pid = lambda: datagen.product_id(rng.randrange(rows))   # noqa: E731
+    for name in BACKENDS:
+        backend = open_backend(name, data_dir)
+        backend.get_product(pid())   # load / map the catalog before timing
+        ops = {
+            'update_stock': (lambda p: backend.set_stock(p, rng.randint(100, 500)), pid),
+            'adjust_stock (3)': (backend.adjust_stock, lambda: {pid(): 1 for _ in range(3)}),
+            'find_product': (backend.get_product, pid),
+        }
+        for op, (fn, make_input) in ops.items():
+            r = timed(fn, make_input, args.ops * (20 if op == 'find_product' else 1), args.budget)
+            print(f"{label:>6} {name:<6} {op:<20} {r['ops']:>7} {r['p50_ms']:>10.3f} {r['p99_ms']:>10.3f}", flush=True)
+        backend.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', default=['1k', '100k', '1M'], help='products, e.g. 1k 100k 1M')
+    parser.add_argument('--ops', type=int, default=500, help='calls per operation and backend')
+    parser.add_argument('--budget', type=float, default=10.0, help='seconds per operation and backend')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{'size':>6} {'store':<6} {'operation':<20} {'ops':>7} {'p50 ms':>10} {'p99 ms':>10}")
+    with tempfile.TemporaryDirectory(prefix='inv_mmap_') as workdir:
+        for label in args.sizes:
+            run_size(workdir, label, datagen.parse_count(label), args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# benchmarks/bench_service.py
+"""
+Load test for the inventory service: 1, 10 and 100 clients checking out at
+the same time, each on its own connection.
+
+    python benchmarks/bench_service.py --clients 1 10 100 --orders 20
+
+The service runs in its own process against a seeded scratch data directory
+(datagen). Every client places --orders orders of 1-5 lines from a shared
+set of --hot products, so the orders contend for the same stock. Reports
+checkout latency (p50 / p99) and orders/sec per level, then checks that the
+final stock of the hot products matches exactly what was sold.
+"""
+import argparse
+import collections
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+
+import benchutil
+import datagen
+import service   # noqa: E402
+
+HOT_STOCK = 1_000_000
+
+
+def run_service(data_dir, address, backend, journal):
+    import csv_backend
+    import storage
+    storage.BACKEND = backend
+    csv_backend.JOURNAL_MODE = journal
+    benchutil.use_data_dir(data_dir)
+    with benchutil.quiet():
+        service.main(['--listen', address])
+
+
+def wait_until_up(address, seconds=60):
+    deadline = time.monotonic() + seconds
+    while True:
+        try:
+            return service.Client(address, timeout=5).call('ping')
+        except service.ServiceError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def client(address, seed, n_orders, hot, n_customers, start, results):
+    rng = random.Random(seed)
+    conn = service.Client(address)
+    conn.call('ping')   # connect before the clock starts
+    sold, laps, failed = collections.Counter(), [], 0
+    start.wait()
+    for _ in range(n_orders):
+        lines = [(pid, rng.randint(1, 3)) for pid in rng.sample(hot, rng.randint(1, 5))]
+        t0 = time.perf_counter()
+        try:
+            conn.call('place_order', datagen.customer_id(rng.randrange(n_customers)), lines)
+        except Exception:
+            failed += 1
+        else:
+            sold.update(dict(lines))
+        laps.append(time.perf_counter() - t0)
+    conn.close()
+    results.append((sold, laps, failed))
+
+
+def run_level(address, n_clients, n_orders, hot, n_customers, seed):
+    start = threading.Barrier(n_clients + 1)
+    results = []
+    threads = [threading.Thread(target=client, args=(address, seed * 1000 + i, n_orders, hot, n_customers,
+                                                     start, results)) for i in range(n_clients)]
+    for t in threads:
+        t.start()
+    start.wait()
+    t0 = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    sold, laps, failed = collections.Counter(), [], 0
+    for s, lap, f in results:
+        sold.update(s)
+        laps += lap
+        failed += f
+    laps.sort()
+    return sold, {'clients': n_clients, 'orders': len(laps) - failed, 'failed': failed,
+                  'p50_ms': percentile(laps, 0.50) * 1000, 'p99_ms': percentile(laps, 0.99) * 1000,
+                  'orders_per_sec': (len(laps) - failed) / elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--orders', type=int, default=20, help='orders per client')
+    parser.add_argument('--rows', default='10k', help='products and customers generated')
+    parser.add_argument('--hot', type=int, default=200, help='products the orders are drawn from')
+    parser.add_argument('--backend', default=os.environ.get('INVENTORY_BACKEND', 'csv'))
+    parser.add_argument('--journal', action='store_true',
+                        help='CSV backend: journal stock changes, as INVENTORY_STOCK_JOURNAL=1 does')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rows = datagen.parse_count(args.rows)
+    with tempfile.TemporaryDirectory(prefix='inv_service_') as data_dir:
+        datagen.generate(data_dir, rows, args.seed, n_sales=1)
+        if args.backend != 'csv':
+            import migrate
+            with benchutil.quiet():
+                migrate.migrate('csv', args.backend, data_dir)
+        address = os.path.join(data_dir, service.SOCKET_NAME) if hasattr(service.socket, 'AF_UNIX') else None
+        address = address or f"127.0.0.1:{service.DEFAULT_PORT}"
+        server = multiprocessing.Process(target=run_service, args=(data_dir, address, args.backend, args.journal))
+        server.start()
+        try:
+            wait_until_up(address)
+            admin = service.Client(address)
+            hot = [datagen.product_id(i) for i in random.Random(args.seed).sample(range(rows), min(args.hot, rows))]
+            for pid in hot:
+                admin.call('update_stock', pid, HOT_STOCK)
+
+            print(f"backend: {args.backend}{' (journal)' if args.journal else ''}   {rows:,} products   "
+                  f"{len(hot)} hot products   {args.orders} orders/client")
+            print(f"{'clients':>8} {'orders':>8} {'failed':>7} {'p50 ms':>9} {'p99 ms':>9} {'orders/sec':>11}")
+            sold = collections.Counter()
+            for n in args.clients:
+                level_sold, r = run_level(address, n, args.orders, hot, rows, args.seed + n)
+                sold.update(level_sold)
+                print(f"{r['clients']:>8} {r['orders']:>8} {r['failed']:>7} {r['p50_ms']:>9.2f} "
+                      f"{r['p99_ms']:>9.2f} {r['orders_per_sec']:>11,.1f}", flush=True)
+
+            wrong = [pid for pid in hot
+                     if int(admin.call('find_product', pid)['stock']) != HOT_STOCK - sold[pid]]
+            print(f"\n{'✅ stock exact' if not wrong else f'❌ stock wrong for {len(wrong)} products'} "
+                  f"({sum(sold.values()):,} units sold)")
+            admin.close()
+        finally:
+            server.terminate()
+            server.join()
+
+
+if __name__ == '__main__':
+    main()
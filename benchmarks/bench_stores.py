@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# benchmarks/bench_stores.py
+"""
+Head-office reports over many store shards: speedup with the number of
+worker processes.
+
+    python benchmarks/bench_stores.py --stores 50 --workers 1 2 4 8
+
+Seeds --stores store directories under a scratch stores dir. Each gets
+--products products and --orders orders of 1-4 lines over a quarter, as
+monthly sales partitions plus line-item logs. Then it times
+stores.sales_by_store (the whole quarter) and stores.chain_low_stock with
+each worker count. It reports the speedup over one process and checks that
+every run merges to the same result. A speedup needs as many free cores
+as workers; on one core the extra processes only add their start-up cost.
+"""
+import argparse
+import datetime
+import os
+import random
+import tempfile
+import time
+
+import benchutil   # noqa: F401  (puts src/ on sys.path)
+import datagen
+import stores      # noqa: E402
+from storage import PRODUCT_FIELDS, SALES_FIELDS, LINE_ITEM_FIELDS   # noqa: E402
+
+START = datetime.date(2025, 10, 1)
+DAYS = 92
+
+
+def seed_store(path, n_products, n_orders, seed):
+    os.makedirs(os.path.join(path, 'sales'))
+    rng = random.Random(seed)
+    datagen._write(os.path.join(path, 'products.csv'), PRODUCT_FIELDS, datagen.products(rng, n_products))
+    sales, lines = {}, {}
+    for i in range(n_orders):
+        day = (START + datetime.timedelta(days=i * DAYS // n_orders)).isoformat()
+        order_id, customer_id = f"ORD{seed:03d}{i:08d}", datagen.customer_id(rng.randrange(n_orders // 4 + 1))
+        total = 0.0
+        for _ in range(rng.randint(1, 4)):
+            qty, price = rng.randint(1, 5), rng.randint(50, 50000) / 100
+            lines.setdefault(day[:7], []).append([order_id, customer_id, datagen.product_id(rng.randrange(n_products)),
+                                                 str(qty), f"{price:.2f}", day])
+            total += qty * price
+        sales.setdefault(day[:7], []).append([order_id, customer_id, day, f"{total:.2f}"])
+    for month in sales:
+        datagen._write(os.path.join(path, 'sales', f"sales_{month}.csv"), SALES_FIELDS, sales[month])
+        datagen._write(os.path.join(path, 'sales', f"lines_{month}.csv"), LINE_ITEM_FIELDS, lines[month])
+
+
+def run(workers):
+    end = START + datetime.timedelta(days=DAYS - 1)
+    t0 = time.perf_counter()
+    sales = stores.sales_by_store(START, end, workers=workers)
+    t1 = time.perf_counter()
+    low = stores.chain_low_stock(workers=workers)
+    t2 = time.perf_counter()
+    return (sales, low), t1 - t0, t2 - t1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stores', type=int, default=50)
+    parser.add_argument('--products', type=int, default=10000, help='products per store')
+    parser.add_argument('--orders', type=int, default=20000, help='orders per store')
+    cores = os.cpu_count() or 1
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1))) or [1])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='inv_stores_') as workdir:
+        stores.STORES_DIR = workdir
+        t0 = time.perf_counter()
+        for n in range(args.stores):
+            seed_store(os.path.join(workdir, f"S{n:03d}"), args.products, args.orders, n)
+        print(f"seeded {args.stores} stores x {args.products:,} products, {args.orders:,} orders "
+              f"in {time.perf_counter() - t0:.1f}s ({cores} cores)")
+        run(max(args.workers))   # builds the daily rollups once, outside the timings
+
+        print(f"{'workers':>8} {'sales s':>9} {'low s':>8} {'total s':>9} {'speedup':>8} {'per worker':>11}")
+        baseline = expected = None
+        for workers in sorted(set(args.workers) | {1}):
+            result, sales_s, low_s = run(workers)
+            total = sales_s + low_s
+            baseline = baseline or total   # one process comes first
+            expected = expected or result
+            speedup = baseline / total
+            print(f"{workers:>8} {sales_s:>9.2f} {low_s:>8.2f} {total:>9.2f} {speedup:>7.2f}x "
+                  f"{speedup / workers:>10.0%}{'' if result == expected else '   ❌ results differ'}", flush=True)
+        sales = expected[0]['total']
+        print(f"\n{sales['stores']} stores: {sales['orders']:,} orders, {sales['units']:,} units, "
+              f"revenue {sales['revenue']:,.2f}; {len(expected[1]['items']):,} low-stock items")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# benchmarks/bench_suite.py
+"""
+Core workflow benchmarks on seeded synthetic data.
+
+    python benchmarks/bench_suite.py --sizes 1k 100k 1M
+    python benchmarks/bench_suite.py --sizes 1k --out new.json --compare old.json
+
+For each size, datagen writes products, customers and sales with that many
+rows into a scratch directory, and each workflow is timed through the same
+functions the console uses:
+
+    products.find_product, products.search_products, products.update_stock, customer.checkout,
+    admin.sales_report over 1 day / 7 / 30 / 365 days, admin.low_stock_report,
+    billing.render_bill and billing.issue_bill (until the bill is archived)
+
+Interactive prompts are answered by the script and console output is
+discarded. The first call of each operation is timed on its own (cold
+caches); then it runs up to --ops more times or until --budget seconds are
+used, whichever comes first. Per-operation latency (first call, then mean,
+p50 and p99 of the warm calls) and throughput go to a JSON file. With
+--compare, p50 latencies are checked against an earlier run and the exit
+status is 1 if any got slower by more than --tolerance.
+
+Every size runs in a fresh process against its own temp directory, so no
+cache carries over between sizes. INVENTORY_BACKEND is honoured (or pass
+--backend).
+"""
+import argparse
+import concurrent.futures
+import datetime
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+import benchutil
+from benchutil import quiet, answers
+import datagen
+
+SIZES = ['1k', '100k', '1M']
+REPORT_RANGES = [1, 7, 30, 365]   # days, ending on datagen.END_DATE
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+MIN_DIFF_MS = 0.05   # smaller p50 changes are noise, never a regression
+MIN_WARM_OPS = 3
+
+
+# ------------------- TIMING ------------------- #
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def timed(fn, inputs, max_ops, budget):
+    """
+    Call fn(x) for x in inputs. The first call (cold caches) is reported on
+    its own; after it come up to max_ops warm calls, stopping once `budget`
+    seconds are used but never before MIN_WARM_OPS. Returns latency stats
+    for the warm calls.
+    """
+    inputs = iter(inputs)
+    t0 = time.perf_counter()
+    failed = int(fn(next(inputs)) is False)
+    first = time.perf_counter() - t0
+    laps = []
+    started = time.perf_counter()
+    for x in inputs:
+        t0 = time.perf_counter()
+        if fn(x) is False:
+            failed += 1
+        laps.append(time.perf_counter() - t0)
+        if len(laps) >= max_ops or (len(laps) >= MIN_WARM_OPS and time.perf_counter() - started >= budget):
+            break
+    total = sum(laps)
+    ordered = sorted(laps)
+    return {
+        'ops': len(laps), 'failed': failed, 'seconds': round(total, 4),
+        'ops_per_sec': round(len(laps) / total, 1) if total else None,
+        'first_ms': round(first * 1000, 3), 'mean_ms': round(total / len(laps) * 1000, 3),
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 3), 'p99_ms': round(percentile(ordered, 0.99) * 1000, 3),
+    }
+
+
+def forever(make):
+    while True:
+        yield make()
+
+
+# ------------------- ONE SIZE ------------------- #
+def run_size(label, rows, seed, backend_name, max_ops, budget, workdir):
+    """Generate the data for one size and time every operation on it (runs in its own process)."""
+    import storage
+    storage.BACKEND = backend_name
+    import admin
+    import billing
+    import customer
+    import products
+
+    data_dir = os.path.join(workdir, label)
+    setup = {'generate': datagen.generate(data_dir, rows, seed)['seconds']}
+    benchutil.use_data_dir(data_dir)
+    admin.REPORTS_FOLDER = os.path.join(data_dir, 'reports')
+
+    t0 = time.perf_counter()
+    with quiet():
+        if backend_name == 'csv':
+            storage.get_backend().sales.migrate_legacy_log()
+        else:
+            import migrate
+            migrate.migrate('csv', backend_name, data_dir)
+    setup['load_sales'] = round(time.perf_counter() - t0, 3)
+
+    rng = random.Random(seed)
+    pid = lambda: datagen.product_id(rng.randrange(rows))   # noqa: E731
+    cid = lambda: datagen.customer_id(rng.randrange(rows))  # noqa: E731
+    results = {}
+
+    def bench(name, fn, make_input, ops=max_ops):
+        with quiet():
+            results[name] = timed(fn, forever(make_input), ops, budget)
+        r = results[name]
+        print(f"{label:>6} {name:<30} {r['ops']:>6} {r['first_ms']:>10.3f} {r['p50_ms']:>10.3f} "
+              f"{r['p99_ms']:>10.3f} {r['ops_per_sec'] or 0:>10,.1f}", flush=True)
+
+    bench('products.find_product', products.find_product, pid, ops=max_ops * 20)
+    words = [name.split()[0].lower() for name in datagen.NAMES]
+    bench('products.search_products', products.search_products,
+          lambda: f"{rng.choice(words)[:rng.randint(3, 6)]} {rng.randrange(5000)}")
+    bench('products.update_stock', lambda a: products.update_stock(*a), lambda: (pid(), rng.randint(100, 500)))
+
+    def cart():
+        return [{'product_id': p, 'name': p, 'price': '1.00', 'qty': 1}
+                for p in {pid() for _ in range(rng.randint(1, 5))}]
+    bench('customer.checkout', lambda a: customer.checkout(*a), lambda: (cid(), cart()))
+
+    for days in REPORT_RANGES:
+        start = datagen.END_DATE - datetime.timedelta(days=days - 1)
+
+        def report(dates):
+            # 2) custom range, the two dates, then 'q' to every paging / "show orders" prompt
+            with answers('2', *dates, then='q'):
+                admin.sales_report()
+        bench(f"admin.sales_report[{days}d]", report,
+              lambda: (start.isoformat(), datagen.END_DATE.isoformat()))
+
+    bench('admin.low_stock_report', lambda _: admin.low_stock_report(), lambda: None)
+
+    def items():
+        return [{'product_id': p, 'name': f"Item {p}", 'price': '12.50', 'qty': rng.randint(1, 5)}
+                for p in (pid() for _ in range(5))]
+    bench('billing.render_bill', lambda it: billing.render_bill('ORD-BENCH', it, 62.5, user_id='C0'), items,
+          ops=max_ops * 20)
+
+    def issue(it):
+        billing.issue_bill('ORD-BENCH', it, 62.5, user_id='C0')
+        billing.wait_for_bills()
+    bench('billing.issue_bill', issue, items)
+
+    return {'rows': rows, 'setup': setup, 'ops': results}
+
+
+# ------------------- COMPARE ------------------- #
+def compare(old, new, tolerance):
+    """Print p50 changes per (size, op) present in both runs. Returns the regressions."""
+    regressions = []
+    print(f"\n{'size':>6} {'operation':<30} {'old p50':>10} {'new p50':>10} {'change':>8}")
+    for label, size in new['sizes'].items():
+        before = old.get('sizes', {}).get(label, {}).get('ops', {})
+        for name, stats in size['ops'].items():
+            if name not in before:
+                continue
+            was, now = before[name]['p50_ms'], stats['p50_ms']
+            change = (now - was) / was if was else 0.0
+            slower = change > tolerance and now - was > MIN_DIFF_MS
+            if slower:
+                regressions.append((label, name, was, now))
+            print(f"{label:>6} {name:<30} {was:>10.3f} {now:>10.3f} {change:>+8.0%}{'  ❌' if slower else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', default=SIZES, help='rows per file, e.g. 1k 100k 1M')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--backend', default=os.environ.get('INVENTORY_BACKEND', 'csv'))
+    parser.add_argument('--ops', type=int, default=200, help='max calls per operation (lookups and rendering: 20x)')
+    parser.add_argument('--budget', type=float, default=3.0, help='max seconds per operation')
+    parser.add_argument('--out', help=f'JSON results file (default: {RESULTS_DIR}/<backend>_<time>.json)')
+    parser.add_argument('--compare', metavar='OLD_JSON', help='earlier results to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p50 slowdown, as a fraction')
+    args = parser.parse_args()
+
+    started = datetime.datetime.now()
+    run = {'started': started.isoformat(timespec='seconds'), 'backend': args.backend, 'seed': args.seed,
+           'ops': args.ops, 'budget': args.budget, 'python': platform.python_version(),
+           'platform': platform.platform(), 'sizes': {}}
+    print(f"backend: {args.backend}   seed: {args.seed}")
+    print(f"{'size':>6} {'operation':<30} {'ops':>6} {'first ms':>10} {'p50 ms':>10} {'p99 ms':>10} {'ops/sec':>10}")
+    with tempfile.TemporaryDirectory(prefix='inv_bench_') as workdir:
+        for label in args.sizes:
+            # a fresh process per size: cold caches, and memory from the last size is given back
+            with concurrent.futures.ProcessPoolExecutor(max_workers=1) as pool:
+                run['sizes'][label] = pool.submit(run_size, label, datagen.parse_count(label), args.seed,
+                                                  args.backend, args.ops, args.budget, workdir).result()
+
+    out = args.out or os.path.join(RESULTS_DIR, f"{args.backend}_{started.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(run, f, indent=2)
+    print(f"\n📁 Results saved to {out}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(json.load(f), run, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} operation(s) slower than {args.compare} by more than {args.tolerance:.0%}")
+            sys.exit(1)
+        print("\n✅ No regressions")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+# benchmarks/benchutil.py
+"""Shared helpers for the benchmark scripts: point the app at a scratch data dir."""
+import builtins
+import contextlib
+import io
+import os
+import sys
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+import storage   # noqa: E402
+
+
+def use_data_dir(data_dir):
+    """Point the storage backend at `data_dir` (bills follow it to data_dir/bills)."""
+    storage.DATA_DIR = data_dir
+
+
+@contextlib.contextmanager
+def quiet():
+    """Swallow the console output of the interactive code paths."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+@contextlib.contextmanager
+def answers(*replies, then=''):
+    """Feed input() the given replies, then `then` for every further prompt."""
+    pending = iter(replies)
+    real_input = builtins.input
+    builtins.input = lambda prompt='': next(pending, then)
+    try:
+        yield
+    finally:
+        builtins.input = real_input
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# benchmarks/datagen.py
+"""
+Seeded synthetic data for the benchmarks.
+
+    python benchmarks/datagen.py DIR --rows 100000 --seed 42
+
+Writes products.csv, customers.csv and sales_log.csv with `rows` rows each
+into DIR, in the same layout as data/. The same seed always gives the same
+rows (only the random password salt differs). Sales are spread over the
+DAYS days up to END_DATE. The CSV backend moves sales_log.csv into monthly
+partitions the first time sales are used.
+All customers share one password ("bench") hashed once at a low cost, so
+generating a million of them stays fast.
+"""
+import argparse
+import datetime
+import os
+import random
+import time
+
+import benchutil  # noqa: F401  (puts src/ on sys.path)
+from storage import PRODUCT_FIELDS, CUSTOMER_FIELDS, SALES_FIELDS, write_csv_temp   # noqa: E402
+from accounts import hash_password                                                  # noqa: E402
+
+END_DATE = datetime.date(2025, 12, 31)
+DAYS = 365
+PASSWORD = 'bench'
+NAMES = ['Notebook', 'Pen', 'Stapler', 'Envelope Pack', 'Marker', 'Folder', 'Glue Stick', 'Ruler',
+         'Scissors', 'Tape', 'Highlighter', 'Eraser']
+FIRST_NAMES = ['Asha', 'Ben', 'Chen', 'Divya', 'Emil', 'Farah', 'Goran', 'Hana', 'Ivan', 'Jaya']
+
+
+def product_id(i):
+    return f"P{i:07d}"
+
+
+def customer_id(i):
+    return f"C{i:07d}"
+
+
+def _write(path, fields, rows):
+    os.replace(write_csv_temp(path, fields, rows, as_lists=True), path)
+
+
+def products(rng, count):
+    """About 2% of products are at or below the default reorder level."""
+    for i in range(count):
+        stock = rng.randint(0, 4) if rng.random() < 0.02 else rng.randint(5, 500)
+        yield [product_id(i), f"{rng.choice(NAMES)} {i % 5000}", f"{rng.randint(50, 99999) / 100:.2f}", str(stock)]
+
+
+def customers(rng, count):
+    password = hash_password(PASSWORD, iterations=1000)
+    for i in range(count):
+        yield [customer_id(i), f"{rng.choice(FIRST_NAMES)} {i}", password]
+
+
+def sales(rng, count, n_customers, end_date=END_DATE, days=DAYS):
+    start = end_date - datetime.timedelta(days=days - 1)
+    for i in range(count):
+        # spread evenly over the period, in date order like a real log
+        day = start + datetime.timedelta(days=i * days // count)
+        yield [f"ORD{i:08d}", customer_id(rng.randrange(n_customers)), day.isoformat(),
+               f"{rng.randint(100, 500000) / 100:.2f}"]
+
+
+def generate(data_dir, rows, seed=42, n_products=None, n_customers=None, n_sales=None):
+    """
+    Write the three files into data_dir (created if needed). Counts default
+    to `rows`. Returns {'products', 'customers', 'sales', 'seconds'}.
+    """
+    n_products = n_products or rows
+    n_customers = n_customers or rows
+    n_sales = n_sales or rows
+    os.makedirs(data_dir, exist_ok=True)
+    started = time.perf_counter()
+    # one generator per file, so changing one count leaves the others' data alone
+    _write(os.path.join(data_dir, 'products.csv'), PRODUCT_FIELDS, products(random.Random(seed), n_products))
+    _write(os.path.join(data_dir, 'customers.csv'), CUSTOMER_FIELDS, customers(random.Random(seed + 1), n_customers))
+    _write(os.path.join(data_dir, 'sales_log.csv'), SALES_FIELDS,
+           sales(random.Random(seed + 2), n_sales, n_customers))
+    return {'products': n_products, 'customers': n_customers, 'sales': n_sales,
+            'seconds': round(time.perf_counter() - started, 3)}
+
+
+def parse_count(text):
+    """'1k' -> 1000, '1M' -> 1000000, '2500' -> 2500."""
+    text = text.strip()
+    scale = {'k': 1000, 'K': 1000, 'm': 1000000, 'M': 1000000}.get(text[-1:], 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('data_dir')
+    parser.add_argument('--rows', type=parse_count, default=1000, help='rows per file, e.g. 1k, 100k, 1M')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    result = generate(args.data_dir, args.rows, args.seed)
+    print(f"✅ {result['products']:,} products, {result['customers']:,} customers, {result['sales']:,} sales "
+          f"in {args.data_dir} ({result['seconds']}s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# src/accounts.py
+"""
+Customer and admin accounts: registration, login and password hashing.
+
+Passwords are stored as salted PBKDF2-SHA256 hashes in the form
+
+    pbkdf2_sha256$<iterations>$<salt hex>$<hash hex>
+
+The cost is INVENTORY_PASSWORD_ITERATIONS (default 100000): raise it for
+more resistance to guessing, lower it for faster logins. Plaintext
+passwords from older data files, and hashes made with a different cost,
+are accepted once and re-hashed with the current setting on that login.
+"""
+import hashlib
+import hmac
+import os
+from storage import get_backend
+from service import exposed
+
+SCHEME = 'pbkdf2_sha256'
+PASSWORD_ITERATIONS = int(os.environ.get('INVENTORY_PASSWORD_ITERATIONS', '0')) or 100_000
+SALT_BYTES = 16
+
+
+# ------------------- HASHING ------------------- #
+def hash_password(password, iterations=None):
+    iterations = iterations or PASSWORD_ITERATIONS
+    salt = os.urandom(SALT_BYTES)
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+    return f"{SCHEME}${iterations}${salt.hex()}${digest.hex()}"
+
+
+def is_hashed(stored):
+    return (stored or '').startswith(SCHEME + '$')
+
+
+def verify_password(password, stored):
+    """
+    Check `password` against a stored value. Returns (ok, needs_rehash);
+    needs_rehash is True for legacy plaintext or a hash made with another cost.
+    """
+    stored = stored or ''
+    if not is_hashed(stored):
+        return hmac.compare_digest(password.encode('utf-8'), stored.encode('utf-8')), True
+    try:
+        _, iterations, salt, expected = stored.split('$')
+        iterations = int(iterations)
+        salt = bytes.fromhex(salt)
+    except ValueError:
+        return False, False
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+    return hmac.compare_digest(digest.hex(), expected), iterations != PASSWORD_ITERATIONS
+
+
+def _without_password(row):
+    """An account row as logins hand it out: the password hash never leaves this module (or the service)."""
+    return {k: v for k, v in row.items() if k != 'password'}
+
+
+# ------------------- CUSTOMERS ------------------- #
+@exposed('customer_exists')
+def customer_exists(cid):
+    return get_backend().get_customer(cid) is not None
+
+
+@exposed('create_customer', writes=True)
+def create_customer(cid, name, password):
+    """Create a customer. Returns False if the ID is already taken."""
+    return get_backend().add_customer({'customer_id': cid, 'name': name, 'password': hash_password(password)})
+
+
+# Logins are reads for the service: hashing is slow, so they run side by side, and the rare
+# re-hash goes through the backend's own locking rather than the single writer
+@exposed('authenticate_customer')
+def authenticate_customer(cid, password):
+    """The customer row, without its password, if the credentials match, else None."""
+    backend = get_backend()
+    row = backend.get_customer(cid)
+    if row is None:
+        return None
+    ok, rehash = verify_password(password, row.get('password'))
+    if not ok:
+        return None
+    if rehash:
+        row['password'] = hash_password(password)
+        backend.update_customer(row)
+    return _without_password(row)
+
+
+# ------------------- ADMINS ------------------- #
+@exposed('authenticate_admin')
+def authenticate_admin(username, password):
+    """The admin row, without its password, if the credentials match, else None."""
+    backend = get_backend()
+    row = backend.get_admin(username)
+    if row is None:
+        return None
+    ok, rehash = verify_password(password, row.get('password'))
+    if not ok:
+        return None
+    if rehash:
+        row['password'] = hash_password(password)
+        backend.update_admin(row)
+    return _without_password(row)
@@ -2,36 +2,63 @@
 # src/admin.py
 import csv
 import datetime
+import itertools
 import os
-from products import list_products, find_product, update_stock, add_product
-from billing import save_bill_csv, save_bill_txt
+from products import (list_products, find_product, save_product, remove_product, low_stock_items, field_limits,
+                      invalid_stock_ids, reorder_level, set_reorder_level, recent_low_stock_events,
+                      search_products, iter_search_results)
+from billing import find_bills, render_archived, export_bill
+from sales import summarize
+from reports import sales_report_csv, iter_report_rows, paginate, report_filename
+from storage import get_backend, field_limit_error
+from accounts import authenticate_admin
+from product_feed import import_feed, export_feed
+import analytics
+import demand
+import stores
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-DATA_DIR = os.path.join(BASE_DIR, 'data')
-ADMIN_FILE = os.path.join(DATA_DIR, 'admin.csv')
-SALES_LOG = os.path.join(DATA_DIR, 'sales_log.csv')
-PRODUCTS_FILE = os.path.join(DATA_DIR, 'products.csv')
-REPORTS_FOLDER = os.path.join(BASE_DIR, 'reports')   # Folder to store generated reports
+REPORTS_FOLDER = stores.reports_folder(os.path.join(BASE_DIR, 'reports'))   # Folder to store generated reports
 
 
 # ---------------- Admin Login ---------------- #
 def admin_login():
-    if not os.path.exists(ADMIN_FILE):
-        print(f"❌ Admin file not found at {ADMIN_FILE}. Please create it with at least one admin user.")
+    backend = get_backend()
+    if not backend.list_admins():
+        print(f"❌ No admin users found in {backend.data_dir}. Please create at least one admin user.")
         return False
 
     username = input("Enter admin username: ").strip()
     password = input("Enter admin password: ").strip()
-    with open(ADMIN_FILE, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            if row['username'] == username and row['password'] == password:
-                print("\n✅ Login successful. Welcome Admin!")
-                return True
+    if authenticate_admin(username, password):
+        print("\n✅ Login successful. Welcome Admin!")
+        return True
     print("\n❌ Invalid admin credentials.")
     return False
 
 
+# ---------------- Helper Function: Whole-number Input ---------------- #
+def ask_count(prompt):
+    """Ask until the answer is blank (None) or a whole number of 0 or more."""
+    while True:
+        answer = input(prompt).strip()
+        if not answer:
+            return None
+        if answer.isdigit():
+            return int(answer)
+        print("❌ Enter a whole number (0 or more), or leave it blank.")
+
+
+def ask_field(field, current, limits):
+    """Ask for a product field (blank keeps `current`) until it fits the catalog's limits."""
+    while True:
+        value = input(f"Enter new {field} (leave blank to keep same): ") or current
+        reason = field_limit_error({field: value}, limits)
+        if not reason:
+            return value
+        print(f"❌ Too long: {reason}.")
+
+
 # ---------------- Helper Function: Display Products ---------------- #
 def view_products():
     """Display all products in a clean tabular format."""
@@ -54,9 +81,16 @@ def view_products():
 
 # ---------------- Product Management ---------------- #
 def search_product():
-    pid = input("Enter Product ID to search: ").strip()
-    product = find_product(pid)
-    if product:
+    query = input("Enter Product ID or name to search: ").strip()
+    if not query:
+        print("\n❌ Enter a product ID or part of a name.")
+        return
+    total, first_page = search_products(query)
+    if not total:
+        print("\n❌ Product not found.")
+        return
+    if total == 1:
+        product = first_page[0]
         print("\nProduct Found:")
         print("-" * 50)
         print(f"{'Product ID':<15}: {product['product_id']}")
@@ -64,8 +98,16 @@ def search_product():
         print(f"{'Price':<15}: {product['price']}")
         print(f"{'Stock':<15}: {product['stock']}")
         print("-" * 50)
-    else:
-        print("\n❌ Product not found.")
+        return
+
+    print(f"\n🔎 {total} products match '{query}':")
+    print("-" * 70)
+    print(f"{'Product ID':<15}{'Name':<25}{'Price':<15}{'Stock':<10}")
+    print("-" * 70)
+    # later pages are only looked up if asked for
+    rows = itertools.chain(first_page, iter_search_results(query, offset=len(first_page)))
+    paginate(rows, lambda p: f"{p['product_id']:<15}{p['name']:<25}{p['price']:<15}{p['stock']:<10}")
+    print("-" * 70)
 
 
 def update_product():
@@ -76,81 +118,102 @@ def update_product():
         return
 
     print(f"Current product details: {product}")
-    name = input("Enter new name (leave blank to keep same): ") or product['name']
-    price = input("Enter new price (leave blank to keep same): ") or product['price']
+    limits = field_limits()
+    name = ask_field('name', product['name'], limits)
+    price = ask_field('price', product['price'], limits)
     stock = input("Enter new stock (leave blank to keep same): ") or product['stock']
+    level = ask_count(f"Enter reorder level (currently {reorder_level(pid)}, leave blank to keep same): ")
 
-    rows = list_products()
-    for r in rows:
-        if r['product_id'] == pid:
-            r['name'], r['price'], r['stock'] = name, price, stock
-
-    with open(PRODUCTS_FILE, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=['product_id', 'name', 'price', 'stock'])
-        writer.writeheader()
-        writer.writerows(rows)
+    try:
+        save_product({'product_id': pid, 'name': name, 'price': price, 'stock': stock})
+    except ValueError as exc:
+        print(f"\n❌ Product not updated: {exc}")
+        return
+    if level is not None:
+        set_reorder_level(pid, level)
     print("\n✅ Product updated successfully.")
 
 
 def delete_product():
     pid = input("Enter Product ID to delete: ").strip()
-    rows = list_products()
-    new_rows = [r for r in rows if r['product_id'] != pid]
-    if len(new_rows) == len(rows):
+    if not remove_product(pid):
         print("❌ Product not found.")
         return
-    with open(PRODUCTS_FILE, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=['product_id', 'name', 'price', 'stock'])
-        writer.writeheader()
-        writer.writerows(new_rows)
     print("\n✅ Product deleted successfully.")
 
 
+def import_products():
+    path = input("Enter feed file to import (.csv or .jsonl): ").strip()
+    if not os.path.isfile(path):
+        print("❌ File not found.")
+        return
+    result = import_feed(path)
+    print(f"\n✅ Imported {result['accepted']} of {result['read']} rows in {result['seconds']}s "
+          f"({result['inserted']} new, {result['updated']} updated).")
+    if result['rejected']:
+        print(f"⚠️ {result['rejected']} rows rejected (full list in {result['rejects_file']}):")
+        for line_no, reason in result['errors']:
+            print(f"   line {line_no}: {reason}")
+
+
+def export_products():
+    path = input("Enter file to export to (.csv or .jsonl): ").strip()
+    if not path:
+        print("❌ No file name given.")
+        return
+    print(f"\n✅ Exported {export_feed(path)} products to {path}")
+
+
 # ---------------- Low Stock Report ---------------- #
-def low_stock_report(threshold=5):
+def low_stock_report(threshold=None):
     """
-    Generate a low stock report.
-    Products with stock < threshold are considered low-stock.
+    Generate a low stock report from the low-stock index.
+    Products with stock < threshold are considered low-stock; without a
+    threshold, each product is compared with its own reorder level.
     Saves a CSV report in REPORTS_FOLDER and prints a table to console.
     """
-    products = list_products()
-    if not products:
-        print("\n❌ No products found in inventory.")
-        return
+    for pid in invalid_stock_ids():
+        print(f"⚠️ Skipping product with invalid stock value: {find_product(pid)}")
 
-    low_stock_items = []
-    for p in products:
-        stock_val = p.get('stock', '').strip()
-        try:
-            # handle floats like "3.0" and non-int strings gracefully
-            stock_num = int(float(stock_val)) if stock_val != '' else 0
-        except (ValueError, TypeError):
-            # if stock cannot be parsed, skip and warn
-            print(f"⚠️ Skipping product with invalid stock value: {p}")
-            continue
-
-        if stock_num < threshold:
-            # ensure output uses consistent types/strings
-            low_stock_items.append({
-                'product_id': p.get('product_id', ''),
-                'name': p.get('name', ''),
-                'price': p.get('price', ''),
-                'stock': str(stock_num)
-            })
-
-    if not low_stock_items:
-        print(f"\n✅ No low-stock products found (threshold: {threshold}).")
+    if threshold is None:
+        items = low_stock_items()
+        title = "stock < reorder level"
+    else:
+        items = [(pid, stock, threshold) for pid, stock in low_stock_items(threshold)]
+        title = f"stock < {threshold}"
+
+    low_stock_rows = []
+    for pid, stock, level in items:
+        p = find_product(pid) or {}
+        low_stock_rows.append({
+            'product_id': pid,
+            'name': p.get('name', ''),
+            'price': p.get('price', ''),
+            'stock': str(stock),
+            'reorder_level': str(level),
+        })
+
+    if not low_stock_rows:
+        print(f"\n✅ No low-stock products found ({title}).")
         return
 
     # Print low-stock table
-    print(f"\n📉 Low Stock Report (stock < {threshold}):")
-    print("-" * 70)
-    print(f"{'Product ID':<15}{'Name':<30}{'Price':<12}{'Stock':<8}")
-    print("-" * 70)
-    for item in low_stock_items:
-        print(f"{item['product_id']:<15}{item['name']:<30}{item['price']:<12}{item['stock']:<8}")
-    print("-" * 70)
-    print(f"Total low-stock items: {len(low_stock_items)}")
+    print(f"\n📉 Low Stock Report ({title}):")
+    print("-" * 76)
+    print(f"{'Product ID':<15}{'Name':<30}{'Price':<12}{'Stock':<8}{'Reorder':<8}")
+    print("-" * 76)
+    for item in low_stock_rows:
+        print(f"{item['product_id']:<15}{item['name']:<30}{item['price']:<12}{item['stock']:<8}"
+              f"{item['reorder_level']:<8}")
+    print("-" * 76)
+    print(f"Total low-stock items: {len(low_stock_rows)}")
+
+    events = recent_low_stock_events(5)
+    if events:
+        print("\n🔔 Recent low-stock alerts:")
+        for e in events:
+            print(f"   {e['time']}  {e['product_id']:<12}{e['name']:<25} stock {e['stock']} "
+                  f"(reorder level {e['reorder_level']})")
 
     # Save report to CSV
     os.makedirs(REPORTS_FOLDER, exist_ok=True)
@@ -158,28 +221,219 @@ def low_stock_report(threshold=5):
     report_file = os.path.join(REPORTS_FOLDER, f"low_stock_report_{timestamp}.csv")
 
     with open(report_file, 'w', newline='', encoding='utf-8') as rf:
-        fieldnames = ['product_id', 'name', 'price', 'stock']
+        fieldnames = ['product_id', 'name', 'price', 'stock', 'reorder_level']
         writer = csv.DictWriter(rf, fieldnames=fieldnames)
         writer.writeheader()
-        writer.writerows(low_stock_items)
+        writer.writerows(low_stock_rows)
         # add summary row
         writer.writerow({})
-        writer.writerow({'product_id': 'TOTAL LOW STOCK', 'stock': len(low_stock_items)})
+        writer.writerow({'product_id': 'TOTAL LOW STOCK', 'stock': len(low_stock_rows)})
 
     print(f"\n📁 Low-stock report saved successfully at: {report_file}")
 
 
+# ---------------- Sales Analytics ---------------- #
+def analytics_report():
+    """Top products and customers and per-day figures from the line-item fact log, saved as CSV."""
+    today = datetime.date.today()
+    try:
+        start = input(f"Enter start date (YYYY-MM-DD, blank = {analytics.quarter_start(today)}): ").strip()
+        end = input(f"Enter end date (YYYY-MM-DD, blank = {today}): ").strip()
+        start_date = datetime.date.fromisoformat(start) if start else analytics.quarter_start(today)
+        end_date = datetime.date.fromisoformat(end) if end else today
+    except ValueError:
+        print("❌ Invalid date.")
+        return
+
+    facts = analytics.load(start_date, end_date)
+    if not len(facts):
+        print("\n⚠️ No line items found for the selected date range.")
+        return
+    totals = facts.totals()
+    print(f"\n📊 Sales Analytics ({start_date} to {end_date}):")
+    print(f"🧾 Orders: {totals['orders']}   📦 Units: {totals['units']}   👥 Customers: {totals['customers']}"
+          f"   💰 Revenue: {totals['revenue']}")
+    if totals['skipped']:
+        print(f"⚠️ Skipped {totals['skipped']} line items with an unreadable quantity or price.")
+
+    products = facts.by_product()
+    print(f"\n🏆 Top {analytics.TOP_N} products by revenue:")
+    print("-" * 75)
+    print(f"{'Product ID':<15}{'Name':<25}{'Orders':<10}{'Units':<10}{'Revenue':<15}")
+    print("-" * 75)
+    for r in products[:analytics.TOP_N]:
+        name = (find_product(r['product_id']) or {}).get('name', '')
+        print(f"{r['product_id']:<15}{name:<25}{r['orders']:<10}{r['units']:<10}{r['revenue']:<15.2f}")
+
+    customers = facts.by_customer()
+    print(f"\n👥 Top {analytics.TOP_N} customers by revenue:")
+    print("-" * 50)
+    print(f"{'Customer ID':<15}{'Orders':<10}{'Units':<10}{'Revenue':<15}")
+    print("-" * 50)
+    for r in customers[:analytics.TOP_N]:
+        print(f"{r['customer_id']:<15}{r['orders']:<10}{r['units']:<10}{r['revenue']:<15.2f}")
+
+    print("\n📅 Per day:")
+    print("-" * 50)
+    print(f"{'Date':<15}{'Orders':<10}{'Units':<10}{'Revenue':<15}")
+    print("-" * 50)
+    paginate(facts.by_day(), lambda d: f"{d['date']:<15}{d['orders']:<10}{d['units']:<10}{d['revenue']:<15.2f}")
+
+    # Full per-product and per-customer tables go to CSV
+    saved = []
+    for prefix, key, rows in (('analytics_products', 'product_id', products),
+                              ('analytics_customers', 'customer_id', customers)):
+        report_file = report_filename(REPORTS_FOLDER, prefix)
+        os.makedirs(REPORTS_FOLDER, exist_ok=True)
+        with open(report_file, 'w', newline='', encoding='utf-8') as rf:
+            writer = csv.DictWriter(rf, fieldnames=[key, 'orders', 'units', 'revenue'])
+            writer.writeheader()
+            writer.writerows(rows)
+        saved.append(report_file)
+    print(f"\n📁 Analytics saved at: {saved[0]}\n                     {saved[1]}")
+
+
+# ---------------- Reorder Suggestions ---------------- #
+def reorder_report():
+    """Products that will run out soonest at their current sales rate, with how many to reorder."""
+    days = input(f"Days of stock to cover (blank = {demand.COVER_DAYS:g}): ").strip()
+    try:
+        cover_days = float(days) if days else demand.COVER_DAYS
+    except ValueError:
+        print("❌ Invalid number of days.")
+        return
+
+    rows = demand.reorder_suggestions(cover_days)
+    if not rows:
+        print(f"\n✅ Every selling product has at least {cover_days:g} days of stock.")
+        return
+    for r in rows:
+        r['name'] = (find_product(r['product_id']) or {}).get('name', '')
+
+    print(f"\n🚚 Reorder Suggestions (less than {cover_days:g} days of cover, soonest out first):")
+    print("-" * 85)
+    print(f"{'Product ID':<15}{'Name':<25}{'Stock':<8}{'Per day':<10}{'Days cover':<12}{'Reorder qty':<12}")
+    print("-" * 85)
+    paginate(rows, lambda r: f"{r['product_id']:<15}{r['name']:<25}{r['stock']:<8}{r['rate']:<10.2f}"
+                             f"{r['days_cover']:<12.1f}{r['suggested']:<12}")
+    print("-" * 85)
+    print(f"Products to reorder: {len(rows)}")
+
+    report_file = report_filename(REPORTS_FOLDER, 'reorder_suggestions')
+    os.makedirs(REPORTS_FOLDER, exist_ok=True)
+    with open(report_file, 'w', newline='', encoding='utf-8') as rf:
+        writer = csv.DictWriter(rf, fieldnames=['product_id', 'name', 'stock', 'rate', 'days_cover', 'suggested'])
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"\n📁 Reorder suggestions saved at: {report_file}")
+
+
+# ---------------- Head Office (all stores) ---------------- #
+def head_office_report():
+    """Sales by store or chain-wide low stock, read from every store's shard in parallel."""
+    if not stores.list_stores():
+        print(f"\n⚠️ No stores found under {stores.STORES_DIR} (create one with: python src/stores.py create ID).")
+        return
+    print("\n1) Sales by Store\n2) Chain-wide Low Stock")
+    ch = input("Choose: ").strip()
+    if ch == '1':
+        today = datetime.date.today()
+        try:
+            start = input(f"Enter start date (YYYY-MM-DD, blank = {today}): ").strip()
+            end = input(f"Enter end date (YYYY-MM-DD, blank = {today}): ").strip()
+            start_date = datetime.date.fromisoformat(start) if start else today
+            end_date = datetime.date.fromisoformat(end) if end else today
+        except ValueError:
+            print("❌ Invalid date.")
+            return
+        report = stores.sales_by_store(start_date, end_date)
+        print(f"\n🏬 Sales by Store ({start_date} to {end_date}):")
+        print("-" * 60)
+        print(f"{'Store':<12}{'Orders':<10}{'Customers':<12}{'Units':<10}{'Revenue':<15}")
+        print("-" * 60)
+        rows = report['stores'] + [dict(report['total'], store='TOTAL')]
+        paginate(rows, lambda r: f"{r['store']:<12}{r['orders']:<10}{r['customers']:<12}{r['units']:<10}"
+                                 f"{r['revenue']:<15.2f}")
+        fields = ['store', 'orders', 'customers', 'units', 'revenue']
+        prefix = 'chain_sales'
+    elif ch == '2':
+        level = input("Enter stock threshold (blank = each product's reorder level): ").strip()
+        try:
+            report = stores.chain_low_stock(int(level) if level else None)
+        except ValueError:
+            print("❌ Invalid threshold.")
+            return
+        print(f"\n📉 Chain-wide Low Stock ({len(report['items'])} items in {len(report['stores'])} stores):")
+        print("-" * 60)
+        print(f"{'Product ID':<15}{'Name':<25}{'Stores low':<12}{'Stock':<8}")
+        print("-" * 60)
+        paginate(report['by_product'],
+                 lambda r: f"{r['product_id']:<15}{r['name']:<25}{r['stores_low']:<12}{r['stock']:<8}")
+        rows = report['items']
+        fields = ['store', 'product_id', 'name', 'stock', 'reorder_level']
+        prefix = 'chain_low_stock'
+    else:
+        print("Invalid choice.")
+        return
+
+    report_file = report_filename(REPORTS_FOLDER, prefix)
+    os.makedirs(REPORTS_FOLDER, exist_ok=True)
+    with open(report_file, 'w', newline='', encoding='utf-8') as rf:
+        writer = csv.DictWriter(rf, fieldnames=fields, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"\n📁 Report saved at: {report_file}")
+
+
+# ---------------- Bill Lookup / Reprint ---------------- #
+def bill_lookup():
+    """Find archived bills by bill ID, order ID or customer ID and optionally export them."""
+    key = input("Enter Bill ID, Order ID or Customer ID: ").strip()
+    bills = find_bills(key)
+    if not bills:
+        print("\n❌ No bills found.")
+        return
+
+    for record in bills:
+        print(render_archived(record)['txt'])
+    print(f"Bills found: {len(bills)}")
+
+    if input("Export as .txt/.csv files? (y/n): ").strip().lower() == 'y':
+        for record in bills:
+            for path in export_bill(record):
+                print(f"📁 Saved as: {path}")
+
+
 # ---------------- Sales Reports ---------------- #
 def sales_report():
     print("\n1) Report for Current Day")
     print("2) Report for Custom Date Range")
     print("3) Low Stock Report")  # <-- new option added
+    print("4) Find / Reprint Bill")
+    print("5) Sales Analytics (top products / customers)")
+    print("6) Reorder Suggestions (days of cover)")
+    print("7) Head Office Reports (all stores)")
     ch = input("Choose: ")
     today = datetime.date.today()
 
     if ch == '3':
-        # call the low-stock report and return (keeps previous logic intact)
-        low_stock_report()
+        low_stock_report(ask_count("Enter stock threshold (blank = each product's reorder level): "))
+        return
+
+    if ch == '4':
+        bill_lookup()
+        return
+
+    if ch == '5':
+        analytics_report()
+        return
+
+    if ch == '6':
+        reorder_report()
+        return
+
+    if ch == '7':
+        head_office_report()
         return
 
     if ch == '1':
@@ -191,59 +445,31 @@ def sales_report():
         print("Invalid choice.")
         return
 
-    total_sales = 0
-    report_data = []
-
     print(f"\n📊 Sales Report ({start_date} to {end_date}):\n")
 
-    if not os.path.exists(SALES_LOG):
-        print("❌ No sales data found.")
-        return
-
-    with open(SALES_LOG, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            date_str = row.get('date', '').strip()
-            sale_date = None
-
-            # ✅ Try both possible formats (for compatibility)
-            for fmt in ("%Y-%m-%d", "%m/%d/%Y"):
-                try:
-                    sale_date = datetime.datetime.strptime(date_str, fmt).date()
-                    break
-                except ValueError:
-                    continue
-
-            if not sale_date:
-                print(f"⚠️ Skipping row with invalid date: {row}")
-                continue
-
-            if start_date <= sale_date <= end_date:
-                report_data.append(row)
-                print(row)
-                try:
-                    total_sales += float(row['total'])
-                except ValueError:
-                    print(f"⚠️ Skipping invalid total in row: {row}")
-
-    print(f"\n💰 Total Sales: {total_sales}")
+    # Per-day figures come from the rollups: one row per day rather than per order
+    summary = summarize(start_date, end_date)
+    if summary['days']:
+        print("-" * 50)
+        print(f"{'Date':<15}{'Orders':<10}{'Customers':<12}{'Revenue':<13}")
+        print("-" * 50)
+        paginate(summary['days'],
+                 lambda d: f"{d['date']:<15}{d['orders']:<10}{len(d['customer_ids']):<12}{d['revenue']:<13.2f}")
+        print("-" * 50)
 
     # ---------------- Save Report to CSV ---------------- #
-    if report_data:
-        os.makedirs(REPORTS_FOLDER, exist_ok=True)
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        report_file = os.path.join(REPORTS_FOLDER, f"report_{timestamp}.csv")
-
-        with open(report_file, 'w', newline='', encoding='utf-8') as rf:
-            fieldnames = report_data[0].keys()
-            writer = csv.DictWriter(rf, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(report_data)
+    # Orders are streamed straight into the report file, so memory stays flat for any range
+    report_file = report_filename(REPORTS_FOLDER)
+    sales_report_csv(start_date, end_date, report_file, summary)
 
-            # Add summary row
-            writer.writerow({})
-            writer.writerow({'order_id': 'TOTAL SALES', 'total': total_sales})
+    print(f"\n🧾 Orders: {summary['orders']}   👥 Distinct customers: {summary['customers']}")
+    print(f"💰 Total Sales: {summary['revenue']}")
 
-        print(f"\n📁 Report saved successfully at: {report_file}")
-    else:
+    if not summary['written']:
         print("\n⚠️ No sales found for the selected date range.")
+        return
+    print(f"\n📁 Report saved successfully at: {report_file}")
+    if input("Show the orders here? (y/N): ").strip().lower() == 'y':
+        print(f"\n{'Order ID':<22}{'Customer':<15}{'Date':<12}{'Total':>10}")
+        paginate(iter_report_rows(report_file),
+                 lambda r: f"{r['order_id']:<22}{r['customer_id']:<15}{r['date']:<12}{r['total']:>10}")
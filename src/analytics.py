@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# src/analytics.py
+"""
+Sales analytics over the line-item fact log (one row per order line:
+order_id, customer_id, product_id, qty, unit_price, date).
+
+    python src/analytics.py                       # this quarter so far
+    python src/analytics.py 2025-10-01 2025-12-31
+    python src/analytics.py backfill              # add lines for archived bills missing from the log
+
+load() reads a date range once into columns: product, customer, day and
+order are turned into small integer codes, alongside qty and revenue arrays.
+Every report is then a single pass over those columns per aggregate.
+With NumPy installed the passes are vectorised (np.bincount / np.unique on
+zero-copy views of the arrays). Without it, the same columns are summed with
+plain loops and the results are identical.
+"""
+import array
+import datetime
+import heapq
+import sys
+from storage import get_backend
+from sales import iter_line_items
+from billing import get_archive, wait_for_bills
+from instrument import timed
+
+try:
+    import numpy as np
+except ImportError:   # optional: fall back to pure Python
+    np = None
+
+ENGINE = 'numpy' if np is not None else 'python'
+TOP_N = 20
+
+
+# ------------------- LOADING ------------------- #
+class SalesFacts:
+    """Line items for a date range held column by column, with keys coded as ints."""
+
+    def __init__(self):
+        self.products, self.customers, self.days, self.orders = [], [], [], []
+        self.product = array.array('q')
+        self.customer = array.array('q')
+        self.day = array.array('q')
+        self.order = array.array('q')
+        self.qty = array.array('q')
+        self.revenue = array.array('d')
+        self.skipped = 0   # rows whose qty or price could not be parsed
+
+    @classmethod
+    def from_values(cls, rows):
+        """Build from value sequences in LINE_ITEM_FIELDS order."""
+        facts = cls()
+        codes = ({}, {}, {}, {})
+        keys = (facts.orders, facts.customers, facts.products, facts.days)
+        columns = (facts.order, facts.customer, facts.product, facts.day)
+        for order_id, customer_id, product_id, qty, price, day in rows:
+            try:
+                qty = int(qty)
+                amount = qty * float(price)
+            except (TypeError, ValueError):
+                facts.skipped += 1
+                continue
+            for key, code_of, names, column in zip((order_id, customer_id, product_id, day), codes, keys, columns):
+                code = code_of.get(key)
+                if code is None:
+                    code = code_of[key] = len(names)
+                    names.append(key)
+                column.append(code)
+            facts.qty.append(qty)
+            facts.revenue.append(amount)
+        return facts
+
+    def __len__(self):
+        return len(self.qty)
+
+    def column(self, name):
+        """A column as a NumPy view (no copy) when NumPy is available, else the array itself."""
+        values = getattr(self, name)
+        if np is None:
+            return values
+        return np.frombuffer(values, dtype=np.float64 if values.typecode == 'd' else np.int64)
+
+    # ------------------- AGGREGATES ------------------- #
+    def _sum_by(self, group, weights, size):
+        if np is not None:
+            return np.bincount(self.column(group), weights=self.column(weights), minlength=size)
+        totals = [0] * size
+        for code, value in zip(getattr(self, group), getattr(self, weights)):
+            totals[code] += value
+        return totals
+
+    def _distinct_by(self, group, member, size, members):
+        """Per group code, how many different `member` codes occur with it."""
+        if np is not None:
+            pairs = np.unique(self.column(group) * members + self.column(member))
+            return np.bincount(pairs // members, minlength=size)
+        counts = [0] * size
+        for code, _ in set(zip(getattr(self, group), getattr(self, member))):
+            counts[code] += 1
+        return counts
+
+    def _ranked(self, values, n):
+        """Positions of the n largest values (all, if n is None); ties keep code order either way."""
+        if np is not None:
+            order = np.argsort(-np.asarray(values), kind='stable')
+            return order if n is None else order[:n]
+        if n is None:
+            return sorted(range(len(values)), key=values.__getitem__, reverse=True)
+        return heapq.nlargest(n, range(len(values)), key=values.__getitem__)
+
+    def _aggregate(self, group, keys, key_name, n=None, by='revenue', sort_keys=False):
+        """One row per key of `group`: distinct orders, units and revenue; ranked by `by` (top n)."""
+        size = len(keys)
+        columns = {'units': self._sum_by(group, 'qty', size),
+                   'revenue': self._sum_by(group, 'revenue', size),
+                   'orders': self._distinct_by(group, 'order', size, len(self.orders))}
+        positions = (sorted(range(size), key=keys.__getitem__) if sort_keys
+                     else self._ranked(columns[by], n))
+        units, revenue, orders = columns['units'], columns['revenue'], columns['orders']
+        return [{key_name: keys[i], 'orders': int(orders[i]), 'units': int(units[i]),
+                 'revenue': round(float(revenue[i]), 2)} for i in positions]
+
+    def by_product(self, n=None, by='revenue'):
+        """[{'product_id', 'orders', 'units', 'revenue'}], largest `by` first (top n)."""
+        return self._aggregate('product', self.products, 'product_id', n, by)
+
+    def by_customer(self, n=None, by='revenue'):
+        """[{'customer_id', 'orders', 'units', 'revenue'}], largest `by` first (top n)."""
+        return self._aggregate('customer', self.customers, 'customer_id', n, by)
+
+    def by_day(self):
+        """[{'date', 'orders', 'units', 'revenue'}] in date order."""
+        return self._aggregate('day', self.days, 'date', sort_keys=True)
+
+    def totals(self):
+        if np is not None:
+            units, revenue = int(self.column('qty').sum()), float(self.column('revenue').sum())
+        else:
+            units, revenue = sum(self.qty), sum(self.revenue)
+        return {'lines': len(self), 'orders': len(self.orders), 'units': units, 'revenue': round(revenue, 2),
+                'products': len(self.products), 'customers': len(self.customers), 'skipped': self.skipped}
+
+
+@timed('analytics.load')
+def load(start_date, end_date):
+    """Line items dated start_date..end_date (inclusive) as SalesFacts."""
+    return SalesFacts.from_values(iter_line_items(start_date, end_date))
+
+
+def quarter_start(day):
+    return datetime.date(day.year, 3 * ((day.month - 1) // 3) + 1, 1)
+
+
+# ------------------- BACKFILL ------------------- #
+def backfill_from_bills():
+    """
+    Add fact-log lines for archived bills whose order has none yet (orders
+    placed before the log existed). Returns the number of orders added.
+    """
+    wait_for_bills()
+    backend = get_backend()
+    known = {values[0] for values in iter_line_items(datetime.date.min, datetime.date.max)}
+    added = 0
+    for record in get_archive().bills_between(datetime.datetime(2000, 1, 1),
+                                              datetime.datetime.now() + datetime.timedelta(days=1)):
+        if record['order_id'] in known or not record.get('items'):
+            continue
+        items = [it for it in record['items'] if it.get('product_id')]
+        if items:
+            sale_date = datetime.datetime.fromisoformat(record['date']).date()
+            backend.append_line_items(record['order_id'], record['customer_id'], sale_date, items)
+            known.add(record['order_id'])
+            added += 1
+    return added
+
+
+def main(argv):
+    if argv == ['backfill']:
+        print(f"✅ Added line items for {backfill_from_bills()} archived orders")
+        return 0
+    today = datetime.date.today()
+    try:
+        if len(argv) not in (0, 2):
+            raise ValueError
+        start, end = ([datetime.date.fromisoformat(a) for a in argv] if argv
+                      else (quarter_start(today), today))
+    except ValueError:
+        print("usage: python src/analytics.py [START END | backfill]   (dates as YYYY-MM-DD)")
+        return 2
+
+    facts = load(start, end)
+    t = facts.totals()
+    print(f"📊 {start} to {end} ({ENGINE}): {t['orders']} orders, {t['units']} units, ₹{t['revenue']}")
+    print(f"\n{'Product':<14}{'Orders':>8}{'Units':>8}{'Revenue':>14}")
+    for r in facts.by_product(TOP_N):
+        print(f"{r['product_id']:<14}{r['orders']:>8}{r['units']:>8}{r['revenue']:>14.2f}")
+    print(f"\n{'Customer':<14}{'Orders':>8}{'Units':>8}{'Revenue':>14}")
+    for r in facts.by_customer(TOP_N):
+        print(f"{r['customer_id']:<14}{r['orders']:>8}{r['units']:>8}{r['revenue']:>14.2f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
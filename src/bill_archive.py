@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# src/bill_archive.py
+import bisect
+import csv
+import io
+import json
+import os
+import threading
+from storage import file_lock
+import instrument
+from ids import BILL_PREFIX, id_bounds
+
+INDEX_FIELDS = ['bill_id', 'order_id', 'customer_id', 'segment', 'offset', 'length']
+
+
+class BillArchive:
+    """
+    Append-only bill store: one segment file per day (bills-YYYY-MM-DD.jsonl)
+    holding one JSON record per bill, plus index.csv mapping bill ID, order ID
+    and customer ID to (segment, offset, length). The index is held in memory
+    and only its new tail is read when other terminals append, so a lookup is
+    a dict hit followed by one seek + read.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.index_path = os.path.join(folder, 'index.csv')
+        self._lock = threading.RLock()
+        self._by_bill = {}
+        self._by_order = {}
+        self._by_customer = {}
+        self._sorted_ids = []   # bill IDs in time order (IDs from ids.py sort by creation time)
+        self._index_ino = None
+        self._index_pos = 0
+
+    # ------------------- INDEX ------------------- #
+    def _add_entry(self, entry):
+        entry['offset'], entry['length'] = int(entry['offset']), int(entry['length'])
+        self._by_bill[entry['bill_id']] = entry
+        self._by_order[entry['order_id']] = entry
+        self._by_customer.setdefault(entry['customer_id'], []).append(entry)
+        bill_id = entry['bill_id']
+        if not self._sorted_ids or bill_id > self._sorted_ids[-1]:
+            self._sorted_ids.append(bill_id)   # the usual case: appended in time order
+        else:
+            bisect.insort(self._sorted_ids, bill_id)
+
+    def _refresh(self):
+        """Pick up index lines appended since the last look (by us or another terminal)."""
+        try:
+            st = os.stat(self.index_path)
+        except FileNotFoundError:
+            return
+        if st.st_ino != self._index_ino:
+            self._by_bill, self._by_order, self._by_customer, self._sorted_ids = {}, {}, {}, []
+            self._index_ino, self._index_pos = st.st_ino, 0
+        if st.st_size <= self._index_pos:
+            return
+        with open(self.index_path, 'rb') as f:
+            f.seek(self._index_pos)
+            chunk = f.read()
+        if self._index_pos == 0:   # skip the header line
+            header_end = chunk.find(b'\n')
+            if header_end < 0:
+                return
+            self._index_pos = header_end + 1
+            chunk = chunk[header_end + 1:]
+        complete = chunk[:chunk.rfind(b'\n') + 1]   # ignore a line still being written
+        for row in csv.DictReader(io.StringIO(complete.decode('utf-8')), fieldnames=INDEX_FIELDS):
+            self._add_entry(row)
+        self._index_pos += len(complete)
+
+    # ------------------- WRITE ------------------- #
+    @instrument.timed('bill_archive.append')
+    def append(self, record):
+        """
+        Store one bill record (a dict with at least bill_id, order_id,
+        customer_id, date, items and total) and index it.
+        """
+        day = record['date'][:10]
+        segment = f"bills-{day}.jsonl"
+        payload = (json.dumps(record, separators=(',', ':')) + '\n').encode('utf-8')
+        os.makedirs(self.folder, exist_ok=True)
+        with self._lock, file_lock(self.index_path):
+            with open(os.path.join(self.folder, segment), 'ab') as f:
+                offset = f.seek(0, os.SEEK_END)
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            new_index = not os.path.exists(self.index_path)
+            with open(self.index_path, 'a', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=INDEX_FIELDS)
+                if new_index:
+                    writer.writeheader()
+                writer.writerow({'bill_id': record['bill_id'], 'order_id': record['order_id'],
+                                 'customer_id': record['customer_id'], 'segment': segment,
+                                 'offset': offset, 'length': len(payload)})
+        if instrument.ENABLED:
+            instrument.add_bytes('bill_archive.append', written=len(payload))
+        return record['bill_id']
+
+    # ------------------- READ ------------------- #
+    def _read(self, entry):
+        with open(os.path.join(self.folder, entry['segment']), 'rb') as f:
+            f.seek(entry['offset'])
+            return json.loads(f.read(entry['length']))
+
+    def get(self, bill_id):
+        with self._lock:
+            self._refresh()
+            entry = self._by_bill.get(bill_id)
+        return self._read(entry) if entry else None
+
+    def get_by_order(self, order_id):
+        with self._lock:
+            self._refresh()
+            entry = self._by_order.get(order_id)
+        return self._read(entry) if entry else None
+
+    def bills_for_customer(self, customer_id):
+        """All bills for a customer, oldest first."""
+        with self._lock:
+            self._refresh()
+            entries = list(self._by_customer.get(customer_id, []))
+        return [self._read(e) for e in entries]
+
+    def bills_between(self, start, end):
+        """Bills issued between two datetimes, found by bisecting the time-ordered bill IDs."""
+        lo, hi = id_bounds(start, end, BILL_PREFIX)
+        with self._lock:
+            self._refresh()
+            ids = self._sorted_ids[bisect.bisect_left(self._sorted_ids, lo):bisect.bisect_right(self._sorted_ids, hi)]
+            entries = [self._by_bill[i] for i in ids]
+        return [self._read(e) for e in entries]
+
+    def find(self, key):
+        """Look `key` up as a bill ID, then an order ID, then a customer ID. Returns a list."""
+        bill = self.get(key) or self.get_by_order(key)
+        return [bill] if bill else self.bills_for_customer(key)
+
+
+def bill_record(bill, items, total):
+    """Archive record for a bill rendered by billing.render_bill."""
+    return {
+        'bill_id': bill['bill_id'],
+        'order_id': bill['order_id'],
+        'customer_id': bill['customer_id'],
+        'date': bill['now'].isoformat(timespec='seconds'),
+        'items': [{'product_id': it.get('product_id', ''), 'name': it['name'],
+                   'qty': it['qty'], 'price': it['price']} for it in items],
+        'total': total,
+    }
@@ -1,92 +1,261 @@
 #!/usr/bin/env python3
 # src/billing.py
+import atexit
+import concurrent.futures
 import csv
 import datetime
+import io
 import os
-import random
+import threading
+import storage
+from bill_archive import BillArchive, bill_record
+from ids import new_bill_id
+from instrument import timed, result_size
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-DEFAULT_BILLS_FOLDER = os.path.join(BASE_DIR, 'bills')
+DEFAULT_BILLS_FOLDER = None   # None: bills/ for the default data dir, else <data dir>/bills (see bills_folder)
+BILL_WRITER_THREADS = 2   # archive append and optional file exports run side by side
+# Per-order .txt/.csv files are opt-in; every bill always goes to the archive
+BILL_FILE_EXPORT = os.environ.get('INVENTORY_BILL_FILES', '') == '1'
+
+
+def bills_folder():
+    """
+    Where bills go: DEFAULT_BILLS_FOLDER if set, else bills/ in the checkout
+    for the default data dir and <data dir>/bills for any other
+    (INVENTORY_DATA_DIR, a store shard), read from storage.DATA_DIR when
+    first needed so a scratch data dir never writes into the checkout.
+    """
+    if DEFAULT_BILLS_FOLDER:
+        return DEFAULT_BILLS_FOLDER
+    if os.path.abspath(storage.DATA_DIR) == os.path.join(BASE_DIR, 'data'):
+        return os.path.join(BASE_DIR, 'bills')
+    return os.path.join(storage.DATA_DIR, 'bills')
 
 
 def generate_bill_id():
-    """Generate a unique bill/invoice ID like INV202510121045AB12."""
-    timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-    rand_suffix = ''.join(random.choices('ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789', k=4))
-    return f"INV{timestamp}{rand_suffix}"
+    """Generate a unique, time-sortable bill/invoice ID like INV06GMPD5KS7Q0M000 (see ids.py)."""
+    return new_bill_id()
+
+
+# ------------------- RENDERING ------------------- #
+@timed('billing.render_bill')
+def render_bill(order_id, items, total, user_id=None, bill_id=None, now=None):
+    """
+    Build both invoice formats in memory with one bill ID and timestamp.
+    Returns a dict with 'bill_id', 'customer_id', 'order_id', 'now', 'txt' (str)
+    and 'csv' (str).
+    """
+    now = now or datetime.datetime.now()
+    bill_id = bill_id or generate_bill_id()
+    user_part = user_id if user_id else "unknown"
+    stamp = now.strftime('%d-%m-%Y %H:%M:%S')
+
+    txt = io.StringIO()
+    txt.write("=============================================\n")
+    txt.write("         INVENTORY MANAGEMENT SYSTEM         \n")
+    txt.write("=============================================\n")
+    txt.write(f"Bill ID     : {bill_id}\n")
+    txt.write(f"Customer ID : {user_part}\n")
+    txt.write(f"Order ID    : {order_id}\n")
+    txt.write(f"Date        : {stamp}\n")
+    txt.write("---------------------------------------------\n")
+    txt.write(f"{'Item':<20}{'Qty':<10}{'Price':<10}{'Subtotal':<10}\n")
+    txt.write("---------------------------------------------\n")
+    for it in items:
+        subtotal = it['qty'] * float(it['price'])
+        txt.write(f"{it['name']:<20}{it['qty']:<10}{it['price']:<10}{subtotal:<10.2f}\n")
+    txt.write("---------------------------------------------\n")
+    txt.write(f"{'TOTAL':<20}{'':<10}{'':<10}{total:<10.2f}\n")
+    txt.write("=============================================\n")
+    txt.write("        THANK YOU FOR YOUR PURCHASE!         \n")
+    txt.write("=============================================\n")
+
+    out = io.StringIO(newline='')
+    writer = csv.writer(out)
+    writer.writerow(["Bill ID", bill_id])
+    writer.writerow(["Customer ID", user_part])
+    writer.writerow(["Order ID", order_id])
+    writer.writerow(["Date", stamp])
+    writer.writerow([])
+    writer.writerow(['Item Name', 'Quantity', 'Price', 'Subtotal'])
+    for it in items:
+        subtotal = it['qty'] * float(it['price'])
+        writer.writerow([it['name'], it['qty'], it['price'], subtotal])
+    writer.writerow([])
+    writer.writerow(['', '', 'TOTAL', total])
+    writer.writerow([])
+    writer.writerow(['Thank you for your purchase!'])
+
+    return {'bill_id': bill_id, 'customer_id': user_part, 'order_id': order_id, 'now': now,
+            'txt': txt.getvalue(), 'csv': out.getvalue()}
+
+
+def bill_filename(bill, folder, ext):
+    """bill_<dd_mm_yyyy>_<user>_<HH_MM>_<bill id>.<ext> - the bill ID keeps same-minute orders apart."""
+    now = bill['now']
+    return f"{folder}/bill_{now.strftime('%d_%m_%Y')}_{bill['customer_id']}_{now.strftime('%H_%M')}_{bill['bill_id']}.{ext}"
+
+
+@timed('billing.write_file', written=result_size)
+def _write_file(fname, content, newline=None):
+    """Write one bill file; CSV content already carries its own line endings (newline='')."""
+    os.makedirs(os.path.dirname(fname) or '.', exist_ok=True)
+    with open(fname, 'w', newline=newline, encoding='utf-8') as f:
+        f.write(content)
+    return fname
+
+
+def _print_preview(bill):
+    print("\n----------- BILL PREVIEW -----------")
+    print(bill['txt'])
+    print("------------------------------------")
+
+
+# ------------------- BACKGROUND WRITER ------------------- #
+class BillWriter:
+    """
+    Runs bill I/O (archive appends, file exports) on a small thread pool so
+    checkout never waits on disk. Pending jobs are flushed at interpreter
+    exit; call wait() to block until everything queued so far is on disk.
+    """
+
+    def __init__(self, threads=BILL_WRITER_THREADS):
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=threads, thread_name_prefix='bill-writer')
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args):
+        future = self._pool.submit(fn, *args)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self._pending.discard(future)
+        if future.exception() is not None:
+            print(f"\n⚠️ Failed to save bill: {future.exception()}")
+
+    def wait(self, timeout=None):
+        """Block until all bill files queued so far are written. Returns False on timeout."""
+        with self._lock:
+            pending = list(self._pending)
+        _, not_done = concurrent.futures.wait(pending, timeout=timeout)
+        return not not_done
+
+
+_writer = None
+_writer_lock = threading.Lock()
+_archives = {}
+
 
+def get_archive():
+    """The bill archive under <bills folder>/archive."""
+    folder = os.path.join(bills_folder(), 'archive')
+    with _writer_lock:
+        if folder not in _archives:
+            _archives[folder] = BillArchive(folder)
+        return _archives[folder]
 
+
+def get_bill_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = BillWriter()
+            atexit.register(_writer.wait)
+        return _writer
+
+
+def wait_for_bills(timeout=None):
+    """Wait for every bill queued with save_bill() to reach disk. Returns False on timeout."""
+    return _writer.wait(timeout) if _writer is not None else True
+
+
+@timed('billing.issue_bill')
+def issue_bill(order_id, items, total, folder=None, user_id=None):
+    """
+    Render the bill once and queue it for the archive (plus .txt/.csv files
+    when INVENTORY_BILL_FILES=1) on the background writer, without printing
+    anything. Returns the rendered bill.
+    """
+    return queue_bill(render_bill(order_id, items, total, user_id=user_id), items, total, folder)
+
+
+def queue_bill(bill, items, total, folder=None):
+    """Queue an already rendered bill for the archive (and files), as issue_bill does. Returns the bill."""
+    writer = get_bill_writer()
+    writer.submit(get_archive().append, bill_record(bill, items, total))
+    if BILL_FILE_EXPORT:
+        folder = folder or bills_folder()
+        bill['txt_file'] = bill_filename(bill, folder, 'txt')
+        bill['csv_file'] = bill_filename(bill, folder, 'csv')
+        writer.submit(_write_file, bill['txt_file'], bill['txt'])
+        writer.submit(_write_file, bill['csv_file'], bill['csv'], '')
+    return bill
+
+
+def print_bill(bill):
+    print("\n🧾 Bill Generated Successfully!")
+    print(f"🗄️  Archived as: {bill['bill_id']}")
+    _print_preview(bill)
+
+
+@timed('billing.save_bill')
+def save_bill(order_id, items, total, folder=None, user_id=None):
+    """Issue the bill (see issue_bill) and print its preview from memory. Returns the rendered bill."""
+    bill = issue_bill(order_id, items, total, folder=folder, user_id=user_id)
+    print_bill(bill)
+    return bill
+
+
+# ------------------- ARCHIVE LOOKUP / EXPORT ------------------- #
+def find_bills(key):
+    """Bills matching a bill ID, order ID or customer ID (see BillArchive.find)."""
+    wait_for_bills()
+    return get_archive().find(key)
+
+
+def render_archived(record):
+    """Re-render an archived bill exactly as it was issued."""
+    return render_bill(record['order_id'], record['items'], record['total'], user_id=record['customer_id'],
+                       bill_id=record['bill_id'], now=datetime.datetime.fromisoformat(record['date']))
+
+
+@timed('billing.export_bill')
+def export_bill(record, folder=None, formats=('txt', 'csv')):
+    """Write .txt and/or .csv copies of an archived bill; returns the file paths."""
+    folder = folder or bills_folder()
+    bill = render_archived(record)
+    paths = []
+    for ext in formats:
+        paths.append(_write_file(bill_filename(bill, folder, ext), bill[ext], '' if ext == 'csv' else None))
+    return paths
+
+
+# ------------------- SYNCHRONOUS SAVES ------------------- #
+@timed('billing.save_bill_txt')
 def save_bill_txt(order_id, items, total, folder=None, user_id=None):
     """Save bill in .txt format with proper invoice structure."""
-    folder = folder or DEFAULT_BILLS_FOLDER
-    os.makedirs(folder, exist_ok=True)
-    now = datetime.datetime.now()
-    date_str = now.strftime("%d_%m_%Y")
-    time_str = now.strftime("%H_%M")
-    bill_id = generate_bill_id()
-
-    user_part = user_id if user_id else "unknown"
-    fname = f"{folder}/bill_{date_str}_{user_part}_{time_str}.txt"
-
-    with open(fname, 'w', encoding='utf-8') as f:
-        f.write("=============================================\n")
-        f.write("         INVENTORY MANAGEMENT SYSTEM         \n")
-        f.write("=============================================\n")
-        f.write(f"Bill ID     : {bill_id}\n")
-        f.write(f"Customer ID : {user_part}\n")
-        f.write(f"Order ID    : {order_id}\n")
-        f.write(f"Date        : {now.strftime('%d-%m-%Y %H:%M:%S')}\n")
-        f.write("---------------------------------------------\n")
-        f.write(f"{'Item':<20}{'Qty':<10}{'Price':<10}{'Subtotal':<10}\n")
-        f.write("---------------------------------------------\n")
-
-        for it in items:
-            subtotal = it['qty'] * float(it['price'])
-            f.write(f"{it['name']:<20}{it['qty']:<10}{it['price']:<10}{subtotal:<10.2f}\n")
-
-        f.write("---------------------------------------------\n")
-        f.write(f"{'TOTAL':<20}{'':<10}{'':<10}{total:<10.2f}\n")
-        f.write("=============================================\n")
-        f.write("        THANK YOU FOR YOUR PURCHASE!         \n")
-        f.write("=============================================\n")
+    folder = folder or bills_folder()
+    bill = render_bill(order_id, items, total, user_id=user_id)
+    fname = _write_file(bill_filename(bill, folder, 'txt'), bill['txt'])
 
     print("\n🧾 Bill Generated Successfully!")
     print(f"📁 Saved as: {fname}")
-    print("\n----------- BILL PREVIEW -----------")
-    with open(fname, 'r', encoding='utf-8') as f:
-        print(f.read())
-    print("------------------------------------")
+    _print_preview(bill)
 
     return fname
 
 
+@timed('billing.save_bill_csv')
 def save_bill_csv(order_id, items, total, folder=None, user_id=None):
     """Save bill in .csv format for record keeping."""
-    folder = folder or DEFAULT_BILLS_FOLDER
-    os.makedirs(folder, exist_ok=True)
-    now = datetime.datetime.now()
-    date_str = now.strftime("%d_%m_%Y")
-    time_str = now.strftime("%H_%M")
-    bill_id = generate_bill_id()
-
-    user_part = user_id if user_id else "unknown"
-    fname = f"{folder}/bill_{date_str}_{user_part}_{time_str}.csv"
-
-    with open(fname, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow(["Bill ID", bill_id])
-        writer.writerow(["Customer ID", user_part])
-        writer.writerow(["Order ID", order_id])
-        writer.writerow(["Date", now.strftime("%d-%m-%Y %H:%M:%S")])
-        writer.writerow([])
-        writer.writerow(['Item Name', 'Quantity', 'Price', 'Subtotal'])
-        for it in items:
-            subtotal = it['qty'] * float(it['price'])
-            writer.writerow([it['name'], it['qty'], it['price'], subtotal])
-        writer.writerow([])
-        writer.writerow(['', '', 'TOTAL', total])
-        writer.writerow([])
-        writer.writerow(['Thank you for your purchase!'])
+    folder = folder or bills_folder()
+    bill = render_bill(order_id, items, total, user_id=user_id)
+    fname = _write_file(bill_filename(bill, folder, 'csv'), bill['csv'], newline='')
 
     print(f"\n✅ CSV version saved as: {fname}")
 
@@ -0,0 +1,711 @@
+#!/usr/bin/env python3
+# src/csv_backend.py
+import collections
+import csv
+import datetime
+import io
+import os
+import threading
+from storage import (Backend, StockError, PRODUCT_FIELDS, CUSTOMER_FIELDS, ADMIN_FIELDS, SALES_FIELDS,
+                     REORDER_FIELDS, LINE_ITEM_FIELDS, HOLD_FIELDS, read_csv, iter_csv, iter_csv_values,
+                     append_csv, append_csv_rows, atomic_write_csv, line_item_rows, write_csv_temp, file_lock,
+                     file_etag, write_csv_if_unchanged, retry_on_conflict, merge_product_feed)
+from journal import Journal
+from product_table import ProductTable, ProductRows
+
+# Journal mode: stock/product changes are appended to data/products.journal
+# instead of rewriting products.csv, and folded back in once it grows large.
+JOURNAL_MODE = os.environ.get('INVENTORY_STOCK_JOURNAL', '') == '1'
+JOURNAL_MAX_BYTES = int(os.environ.get('INVENTORY_JOURNAL_MAX_BYTES', '0')) or None
+
+DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%Y")
+UNPARSED_PARTITION = 'sales_unparsed.csv'
+ROLLUP_FIELDS = ['date', 'orders', 'revenue']
+ROLLUP_CUSTOMER_FIELDS = ['date', 'customer_id']
+FOLD_ROLLUP_ROWS = 256   # appended sale rows a month's rollup may carry before a read folds them
+
+
+def parse_sale_date(date_str):
+    """Parse a sale date in any of the historical formats; None if unparseable."""
+    date_str = (date_str or '').strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(date_str, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+# ------------------- CATALOG CACHE ------------------- #
+class ProductCatalog:
+    """In-memory product index keyed by product_id.
+
+    The products are held in a compact ProductTable until any backing file
+    is rewritten (its inode, mtime or size changes), so edits made by other
+    code paths (or other terminals) are picked up on the next call.
+    """
+
+    def __init__(self, filename, journal=None):
+        self.filename = filename
+        self.journal = journal
+        self.hits = 0
+        self.misses = 0
+        self._signature = None
+        self._loaded = False
+        self._table = ProductTable()
+        self._lock = threading.RLock()
+
+    def _file_signature(self):
+        paths = self.journal.paths() if self.journal else [self.filename]
+        return tuple(file_etag(path) for path in paths)
+
+    def _refresh(self):
+        signature = self._file_signature()
+        if self._loaded and signature == self._signature:
+            self.hits += 1
+            return
+        self.misses += 1
+        if self.journal:
+            self._table = ProductTable.from_rows(self.journal.load())
+        else:
+            self._table = ProductTable.from_values(iter_csv_values(self.filename, PRODUCT_FIELDS))
+        self._signature = signature
+        self._loaded = True
+
+    def invalidate(self):
+        """Drop the cached rows so the next access re-reads the file."""
+        self._loaded = False
+
+    def signature(self):
+        """Etags of the backing files as of the last load."""
+        with self._lock:
+            self._refresh()
+            return self._signature
+
+    def apply(self, changed=(), deleted=(), signature=None):
+        """
+        Fold our own just-written changes into the cache instead of re-reading.
+        `signature` is the etag taken right after the write, while still locked.
+        """
+        with self._lock:
+            for r in changed:
+                self._table.upsert(r)
+            if deleted:
+                self._table = self._table.without(deleted)
+            self._signature = signature if signature is not None else self._file_signature()
+
+    def merged_values(self, changed=(), deleted=()):
+        """
+        Value lists for the catalog as it will be once `changed` and `deleted`
+        are applied, in file order, for writing the CSV without a dict per row.
+        """
+        with self._lock:
+            self._refresh()
+            table = self._table
+        pending = {r['product_id']: [r.get(k, '') for k in PRODUCT_FIELDS] for r in changed}
+        gone = set(deleted)
+        for pos in range(len(table)):
+            pid = table.ids[pos]
+            if pid not in gone:
+                yield pending.pop(pid, None) or table.values(pos)
+        for values in pending.values():
+            if values[0] not in gone:
+                yield values
+
+    def rows(self):
+        """All products as a read-only sequence of dicts, built as they are read (stock as of now)."""
+        with self._lock:
+            self._refresh()
+            return ProductRows(self._table)
+
+    def get(self, pid):
+        with self._lock:
+            self._refresh()
+            return self._table.get(pid)
+
+    def iter_rows(self):
+        return iter(self.rows())
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'products': len(self._table)}
+
+
+# ------------------- KEYED APPEND-ONLY FILES ------------------- #
+class AppendOnlyIndex:
+    """
+    Hash index over an append-only CSV file (customers.csv, admin.csv,
+    reorder_levels.csv), keyed by `key`. The file is parsed once; after that only the bytes
+    appended since the last look are read, so lookups and duplicate checks
+    are dict hits however many accounts there are. Updates are appended as
+    a new row for the same key and the latest row wins. If the file is
+    replaced or shrinks, it is read again from the start.
+    """
+
+    def __init__(self, filename, fields, key):
+        self.filename = filename
+        self.fields = fields
+        self.key = key
+        self._lock = threading.RLock()
+        self._rows = {}
+        self._header = None
+        self._ino = None
+        self._pos = 0
+
+    def _reset(self, ino=None):
+        self._rows, self._header, self._ino, self._pos = {}, None, ino, 0
+
+    def _refresh(self):
+        try:
+            st = os.stat(self.filename)
+        except FileNotFoundError:
+            self._reset()
+            return
+        if st.st_ino != self._ino or st.st_size < self._pos:
+            self._reset(st.st_ino)
+        if st.st_size == self._pos:
+            return
+        with file_lock(self.filename, shared=True), open(self.filename, 'rb') as f:
+            f.seek(self._pos)
+            chunk = f.read()
+        if self._header is None:
+            header_end = chunk.find(b'\n')
+            if header_end < 0:
+                return
+            self._header = next(csv.reader([chunk[:header_end].decode('utf-8-sig')]))
+            self._pos += header_end + 1
+            chunk = chunk[header_end + 1:]
+        # Appends happen under the exclusive lock, so an unterminated last line
+        # is a file saved without a final newline: index it, but read it again
+        # next time in case it is later completed.
+        complete = chunk[:chunk.rfind(b'\n') + 1]
+        for row in csv.DictReader(io.StringIO(chunk.decode('utf-8')), fieldnames=self._header):
+            if row.get(self.key):
+                self._rows[row[self.key]] = row
+        self._pos += len(complete)
+
+    def get(self, key):
+        with self._lock:
+            self._refresh()
+            row = self._rows.get(key)
+            return dict(row) if row is not None else None
+
+    def rows(self):
+        with self._lock:
+            self._refresh()
+            return [dict(r) for r in self._rows.values()]
+
+    def add(self, row, replace=False):
+        """
+        Append `row`. Unless `replace` is set, refuse (return False) when the
+        key is already present; with `replace`, refuse when it is missing.
+        """
+        with self._lock, file_lock(self.filename):
+            self._refresh()
+            if (row[self.key] in self._rows) != replace:
+                return False
+            append_csv(self.filename, self.fields, {k: row.get(k, '') for k in self.fields})
+            self._refresh()
+            return True
+
+    def put(self, row):
+        """Append `row` whether or not its key exists (insert or update)."""
+        with self._lock:
+            append_csv(self.filename, self.fields, {k: row.get(k, '') for k in self.fields})
+
+
+# ------------------- SALES PARTITIONS ------------------- #
+class CsvSalesLog:
+    """
+    Sales log partitioned by month (sales/sales_YYYY-MM.csv) with per-day
+    rollups alongside. A legacy single-file sales_log.csv is migrated into
+    partitions on first use.
+
+    Rollups are append-only, so a checkout never rewrites a month. Each
+    sale appends a one-order row to rollup_YYYY-MM.csv, and its customer to
+    rollup_customers_YYYY-MM.csv the first time they buy that day. Readers
+    add the rows up per day. daily_totals and rebuild_rollups rewrite the
+    month one row per day.
+    """
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.sales_dir = os.path.join(data_dir, 'sales')
+        self.legacy_log = os.path.join(data_dir, 'sales_log.csv')
+        self._customer_days = {}   # month -> {(date, customer_id)} already in its customers file
+
+    def partition_path(self, day):
+        return os.path.join(self.sales_dir, f"sales_{day.strftime('%Y-%m')}.csv")
+
+    def lines_path(self, month):
+        """Line-item fact log for a 'YYYY-MM' month."""
+        return os.path.join(self.sales_dir, f"lines_{month}.csv")
+
+    def rollup_path(self, month):
+        """Daily rollup file for a 'YYYY-MM' month."""
+        return os.path.join(self.sales_dir, f"rollup_{month}.csv")
+
+    def rollup_customers_path(self, month):
+        """(date, customer_id) pairs behind a month's distinct-customer counts."""
+        return os.path.join(self.sales_dir, f"rollup_customers_{month}.csv")
+
+    @staticmethod
+    def _partition_month(fname):
+        """'sales_2025-11.csv' -> '2025-11' (None for anything else)."""
+        if fname.startswith('sales_') and fname.endswith('.csv') and len(fname) == len('sales_YYYY-MM.csv'):
+            return fname[len('sales_'):-len('.csv')]
+        return None
+
+    def months(self):
+        """Sorted 'YYYY-MM' months that have a sales partition."""
+        if not os.path.isdir(self.sales_dir):
+            return []
+        return sorted(m for m in (self._partition_month(f) for f in os.listdir(self.sales_dir)) if m)
+
+    def lock(self):
+        """Serialises partition appends, rollup updates and migration across terminals."""
+        return file_lock(os.path.join(self.sales_dir, 'sales'))
+
+    # ------------------- MIGRATION ------------------- #
+    def migrate_legacy_log(self):
+        """
+        One-time move of data/sales_log.csv into monthly partitions.
+        Dates are normalised to YYYY-MM-DD so partitions can be filtered with plain
+        string comparison. Rows already present in a partition are not duplicated,
+        so re-running after an interrupted migration is safe.
+        Returns the number of rows migrated.
+        """
+        if not os.path.exists(self.legacy_log):
+            return 0
+
+        unparsed_path = os.path.join(self.sales_dir, UNPARSED_PARTITION)
+        buckets = collections.defaultdict(list)
+        for row in read_csv(self.legacy_log):
+            sale_date = parse_sale_date(row.get('date'))
+            if sale_date:
+                row['date'] = sale_date.strftime("%Y-%m-%d")
+                buckets[self.partition_path(sale_date)].append(row)
+            else:
+                buckets[unparsed_path].append(row)
+
+        migrated = 0
+        for path, rows in buckets.items():
+            existing = read_csv(path)
+            seen = collections.Counter(tuple(r.get(k, '') for k in SALES_FIELDS) for r in existing)
+            for row in rows:
+                key = tuple(row.get(k, '') for k in SALES_FIELDS)
+                if seen[key]:
+                    seen[key] -= 1
+                    continue
+                existing.append({k: row.get(k, '') for k in SALES_FIELDS})
+                migrated += 1
+            atomic_write_csv(path, SALES_FIELDS, existing)
+
+        unparsed = len(buckets.get(unparsed_path, []))
+        if unparsed:
+            print(f"⚠️ {unparsed} sales rows had invalid dates; kept in {UNPARSED_PARTITION}")
+
+        for path in buckets:
+            month = self._partition_month(os.path.basename(path))
+            if month:
+                self.rebuild_rollups(month)
+        os.replace(self.legacy_log, os.path.join(self.data_dir, 'sales_log.migrated.csv'))
+        return migrated
+
+    def _ensure_migrated(self):
+        if os.path.exists(self.legacy_log):
+            with self.lock():
+                self.migrate_legacy_log()
+
+    # ------------------- READ / WRITE ------------------- #
+    def append(self, order_id, customer_id, sale_date, total, items=None):
+        """
+        Append one order to the partition for its date, its items to that
+        month's line-item log, and fold it into the daily rollup.
+        """
+        self._ensure_migrated()
+        day = sale_date.strftime("%Y-%m-%d")
+        with self.lock():
+            append_csv(self.partition_path(sale_date), SALES_FIELDS, {
+                'order_id': order_id,
+                'customer_id': customer_id,
+                'date': day,
+                'total': total,
+            })
+            if items:
+                self.append_lines(order_id, customer_id, sale_date, items)
+            self._record_rollup(day, customer_id, total)
+
+    def append_lines(self, order_id, customer_id, sale_date, items):
+        day = sale_date.strftime("%Y-%m-%d")
+        with self.lock():
+            append_csv_rows(self.lines_path(day[:7]), LINE_ITEM_FIELDS,
+                            line_item_rows(order_id, customer_id, day, items))
+
+    def iter_lines(self, start_date, end_date):
+        """Yield line-item value lists dated start_date..end_date, reading only the months in range."""
+        start, end = start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")
+        date_col = LINE_ITEM_FIELDS.index('date')
+        for month in self.months():
+            if not (start[:7] <= month <= end[:7]):
+                continue
+            whole_month = start <= f"{month}-01" and f"{month}-31" <= end
+            for values in iter_csv_values(self.lines_path(month), LINE_ITEM_FIELDS):
+                if whole_month or start <= values[date_col] <= end:
+                    yield values
+
+    def iter(self, start_date, end_date):
+        """Yield sales rows dated start_date..end_date (inclusive), reading only the months in range."""
+        self._ensure_migrated()
+        start, end = start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")
+        for month in self.months():
+            if not (start[:7] <= month <= end[:7]):
+                continue
+            for row in iter_csv(os.path.join(self.sales_dir, f"sales_{month}.csv")):
+                if start <= row.get('date', '') <= end:
+                    yield row
+
+    # ------------------- DAILY ROLLUPS ------------------- #
+    def _rollup_current(self, month):
+        """True if both rollup files exist in the append-only layout (older ones held customer_ids)."""
+        path = self.rollup_path(month)
+        if not os.path.exists(path) or not os.path.exists(self.rollup_customers_path(month)):
+            return False
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            return next(csv.reader(f), None) == ROLLUP_FIELDS
+
+    def _read_rollup(self, month):
+        """
+        date -> {'orders', 'revenue', 'customer_ids'} for one month, folding
+        the appended sale rows per day. Also returns how many rows were read.
+        """
+        days, rows = {}, 0
+        for day, orders, revenue in iter_csv_values(self.rollup_path(month), ROLLUP_FIELDS):
+            rows += 1
+            t = days.get(day)
+            if t is None:
+                t = days[day] = {'orders': 0, 'revenue': 0.0, 'customer_ids': set()}
+            t['orders'] += int(orders or 0)
+            t['revenue'] += float(revenue or 0)
+        for day, customer_id in iter_csv_values(self.rollup_customers_path(month), ROLLUP_CUSTOMER_FIELDS):
+            if day in days:
+                days[day]['customer_ids'].add(customer_id)
+        return days, rows
+
+    def _write_rollup(self, month, days):
+        """Replace a month's rollup files with one row per day (and per customer and day)."""
+        atomic_write_csv(self.rollup_path(month), ROLLUP_FIELDS, [
+            {'date': day, 'orders': t['orders'], 'revenue': round(t['revenue'], 2)}
+            for day, t in sorted(days.items())])
+        atomic_write_csv(self.rollup_customers_path(month), ROLLUP_CUSTOMER_FIELDS, [
+            {'date': day, 'customer_id': cid}
+            for day, t in sorted(days.items()) for cid in sorted(t['customer_ids'])])
+        self._customer_days.pop(month, None)
+
+    @staticmethod
+    def _add_to_day(days, day, customer_id, total):
+        t = days.setdefault(day, {'orders': 0, 'revenue': 0.0, 'customer_ids': set()})
+        t['orders'] += 1
+        try:
+            t['revenue'] += float(total)
+        except (TypeError, ValueError):
+            pass
+        t['customer_ids'].add(customer_id)
+
+    def _record_rollup(self, day, customer_id, total):
+        """
+        Fold one sale into its day: append a one-order row, and the customer
+        if this terminal has not yet seen them buy that day. Call under lock().
+        """
+        month = day[:7]
+        if not self._rollup_current(month):
+            self.rebuild_rollups(month)   # rebuild already includes the sale just appended
+            return
+        try:
+            revenue = float(total)
+        except (TypeError, ValueError):
+            revenue = 0.0
+        append_csv(self.rollup_path(month), ROLLUP_FIELDS, {'date': day, 'orders': 1, 'revenue': revenue})
+        seen = self._customer_days.get(month)
+        if seen is None:
+            seen = self._customer_days[month] = set(map(tuple, iter_csv_values(
+                self.rollup_customers_path(month), ROLLUP_CUSTOMER_FIELDS)))
+        if (day, customer_id) not in seen:
+            # another terminal may append the same pair; readers count distinct IDs, so that is harmless
+            seen.add((day, customer_id))
+            append_csv(self.rollup_customers_path(month), ROLLUP_CUSTOMER_FIELDS,
+                       {'date': day, 'customer_id': customer_id})
+
+    def rebuild_rollups(self, month=None):
+        """Recompute daily rollups from the raw partitions (one month, or all of them)."""
+        for m in ([month] if month else self.months()):
+            days = {}
+            for row in read_csv(os.path.join(self.sales_dir, f"sales_{m}.csv")):
+                self._add_to_day(days, row.get('date', ''), row.get('customer_id', ''), row.get('total'))
+            self._write_rollup(m, days)
+
+    def daily_totals(self, start_date, end_date):
+        """
+        Per-day totals for start_date..end_date (inclusive), read from the rollups,
+        so the cost follows the number of days rather than the number of orders.
+        A month whose appended rows outnumber its days by FOLD_ROLLUP_ROWS is
+        rewritten folded, one row per day, as it is read.
+        """
+        self._ensure_migrated()
+        start, end = start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")
+        totals = []
+        for month in self.months():
+            if not (start[:7] <= month <= end[:7]):
+                continue
+            if not self._rollup_current(month):
+                with self.lock():
+                    if not self._rollup_current(month):
+                        self.rebuild_rollups(month)
+            days, rows = self._read_rollup(month)
+            if rows - len(days) >= FOLD_ROLLUP_ROWS:
+                with self.lock():
+                    days, _ = self._read_rollup(month)   # again, now that nobody can append
+                    self._write_rollup(month, days)
+            for day, t in sorted(days.items()):
+                if start <= day <= end:
+                    totals.append(dict(t, date=day))
+        return totals
+
+
+# ------------------- BACKEND ------------------- #
+class CsvBackend(Backend):
+    """The original flat-file layout under data/: products.csv, customers.csv, admin.csv, sales/."""
+    name = 'csv'
+
+    def __init__(self, data_dir, journal=None):
+        super().__init__(data_dir)
+        self.products_file = os.path.join(data_dir, 'products.csv')
+        self.customers_file = os.path.join(data_dir, 'customers.csv')
+        self.admin_file = os.path.join(data_dir, 'admin.csv')
+        use_journal = JOURNAL_MODE if journal is None else journal
+        self.journal = (Journal(self.products_file, PRODUCT_FIELDS, 'product_id', max_bytes=JOURNAL_MAX_BYTES)
+                        if use_journal else None)
+        self.catalog = ProductCatalog(self.products_file, self.journal)
+        self.customers = AppendOnlyIndex(self.customers_file, CUSTOMER_FIELDS, 'customer_id')
+        self.admins = AppendOnlyIndex(self.admin_file, ADMIN_FIELDS, 'username')
+        self.reorder_levels = AppendOnlyIndex(os.path.join(data_dir, 'reorder_levels.csv'),
+                                              REORDER_FIELDS, 'product_id')
+        self.holds_file = os.path.join(data_dir, 'holds.csv')
+        self.holds = AppendOnlyIndex(self.holds_file, HOLD_FIELDS, 'hold_id')
+        self.sales = CsvSalesLog(data_dir)
+
+    # ------------------- PRODUCTS ------------------- #
+    def _mutate(self, compute):
+        """
+        Run `compute()` against the current catalog and persist what it returns.
+        `compute` returns (changed_rows, deleted_ids, result) and may raise to abort.
+
+        Journal mode validates and appends under an exclusive lock, so each batch
+        sees every earlier one. CSV mode is optimistic: the new products.csv is
+        only swapped in if nobody rewrote it since it was read, otherwise the
+        whole read-validate-write is retried against the fresh file.
+        Product listeners are told about the write once it has landed.
+        """
+        catalog = self.catalog
+
+        def old_rows(changed, deleted):
+            return [(r['product_id'], catalog.get(r['product_id']), dict(r)) for r in changed] + \
+                   [(pid, catalog.get(pid), None) for pid in deleted]
+
+        if self.journal:
+            with file_lock(self.journal.journal_path):
+                before = catalog.signature()
+                changed, deleted, result = compute()
+                changes = old_rows(changed, deleted)
+                self.journal.append(changed, deleted)
+                catalog.apply(changed, deleted)
+                after = catalog.signature()
+        else:
+            def attempt():
+                before = catalog.signature()
+                changed, deleted, result = compute()
+                changes = old_rows(changed, deleted)
+                try:
+                    etag = write_csv_if_unchanged(self.products_file, PRODUCT_FIELDS,
+                                                  catalog.merged_values(changed, deleted), before[0], as_lists=True)
+                except Exception:
+                    catalog.invalidate()
+                    raise
+                catalog.apply(changed, deleted, (etag,))
+                return result, changes, before, (etag,)
+
+            result, changes, before, after = retry_on_conflict(attempt)
+        if changes:
+            self._notify_products(changes, before, after)
+        return result
+
+    def list_products(self):
+        return self.catalog.rows()
+
+    def get_product(self, pid):
+        return self.catalog.get(pid)
+
+    def upsert_products(self, rows):
+        rows = list(rows)
+        self._mutate(lambda: (rows, (), None))
+
+    def import_products(self, rows):
+        """
+        Stream a bulk upsert into one rewrite of the catalog, in bounded
+        memory whatever the feed size (storage.merge_product_feed spills the
+        feed to sorted runs on disk). The existing catalog is streamed from
+        disk (CSV mode) or replayed once (journal mode) and merged while the
+        new file is written. Holding the write lock for the whole merge means
+        no other terminal's change can be lost or retried.
+        """
+        lock_path = self.journal.journal_path if self.journal else self.products_file
+        with file_lock(lock_path):
+            if self.journal:
+                current = [[r.get(k, '') for k in PRODUCT_FIELDS] for r in self.journal.load()]
+                existing = lambda: current   # noqa: E731
+            else:
+                existing = lambda: iter_csv_values(self.products_file, PRODUCT_FIELDS)   # noqa: E731
+            with merge_product_feed(existing, rows, tmp_dir=self.data_dir) as (counts, merged):
+                if not counts['received']:
+                    return {'inserted': 0, 'updated': 0}
+                if self.journal:
+                    self.journal.replace_all(merged)
+                else:
+                    tmp = write_csv_temp(self.products_file, PRODUCT_FIELDS, merged, as_lists=True)
+                    os.replace(tmp, self.products_file)
+        self.catalog.invalidate()
+        self._notify_products(None)
+        return {'inserted': counts['inserted'], 'updated': counts['received'] - counts['inserted']}
+
+    def iter_products(self):
+        return self.catalog.iter_rows()
+
+    def delete_product(self, pid):
+        def compute():
+            if self.catalog.get(pid) is None:
+                return (), (), False
+            return (), [pid], True
+        return self._mutate(compute)
+
+    def set_stock(self, pid, stock):
+        def compute():
+            product = self.catalog.get(pid)
+            if product is None:
+                return (), (), None
+            product['stock'] = str(stock)
+            return [product], (), None
+        self._mutate(compute)
+
+    def adjust_stock(self, changes):
+        def compute():
+            updated = []
+            problems = []
+            for pid, delta in changes.items():
+                product = self.catalog.get(pid)
+                if product is None:
+                    problems.append(f"{pid}: product not found")
+                    continue
+                current = int(float(product.get('stock') or 0))
+                if current + delta < 0:
+                    problems.append(f"{pid}: only {current} in stock, {-delta} requested")
+                    continue
+                product['stock'] = str(current + delta)
+                updated.append(product)
+            if problems:
+                raise StockError("; ".join(problems))
+            return updated, (), {p['product_id']: int(p['stock']) for p in updated}
+        return self._mutate(compute)
+
+    def products_version(self):
+        return self.catalog.signature()
+
+    def catalog_stats(self):
+        return self.catalog.stats()
+
+    def invalidate(self):
+        self.catalog.invalidate()
+
+    def compact(self):
+        if self.journal:
+            self.journal.compact()
+            self.catalog.invalidate()
+
+    # ------------------- CUSTOMERS / ADMINS ------------------- #
+    def list_customers(self):
+        return self.customers.rows()
+
+    def get_customer(self, cid):
+        return self.customers.get(cid)
+
+    def add_customer(self, row):
+        return self.customers.add(row)
+
+    def update_customer(self, row):
+        self.customers.add(row, replace=True)
+
+    def list_admins(self):
+        return self.admins.rows()
+
+    def get_admin(self, username):
+        return self.admins.get(username)
+
+    def update_admin(self, row):
+        self.admins.add(row, replace=True)
+
+    # ------------------- REORDER LEVELS ------------------- #
+    def list_reorder_levels(self):
+        levels = {}
+        for row in self.reorder_levels.rows():
+            try:
+                levels[row['product_id']] = int(row['reorder_level'])
+            except (TypeError, ValueError):
+                continue   # blank = cleared
+        return levels
+
+    def set_reorder_level(self, pid, level):
+        self.reorder_levels.put({'product_id': pid, 'reorder_level': '' if level is None else int(level)})
+
+    def reorder_levels_version(self):
+        return file_etag(self.reorder_levels.filename)   # appended to on every change
+
+    # ------------------- STOCK HOLDS ------------------- #
+    def list_holds(self):
+        rows = []
+        for row in self.holds.rows():
+            try:
+                if int(row['qty']) > 0:
+                    rows.append(row)
+            except (TypeError, ValueError):
+                continue
+        return rows
+
+    def put_holds(self, rows):
+        append_csv_rows(self.holds_file, HOLD_FIELDS, rows)
+
+    def holds_version(self):
+        return file_etag(self.holds_file)
+
+    def purge_holds(self, now):
+        """Rewrite holds.csv with just the live holds (it only ever grows otherwise)."""
+        with file_lock(self.holds_file):
+            live = [r for r in self.list_holds() if float(r.get('expires') or 0) > now]
+            os.replace(write_csv_temp(self.holds_file, HOLD_FIELDS, live), self.holds_file)
+
+    # ------------------- SALES ------------------- #
+    def append_sale(self, order_id, customer_id, sale_date, total, items=None):
+        self.sales.append(order_id, customer_id, sale_date, total, items)
+
+    def append_line_items(self, order_id, customer_id, sale_date, items):
+        self.sales.append_lines(order_id, customer_id, sale_date, items)
+
+    def iter_line_items(self, start_date, end_date):
+        return self.sales.iter_lines(start_date, end_date)
+
+    def iter_sales(self, start_date, end_date):
+        return self.sales.iter(start_date, end_date)
+
+    def daily_totals(self, start_date, end_date):
+        return self.sales.daily_totals(start_date, end_date)
+
+    def rebuild_rollups(self):
+        with self.sales.lock():
+            self.sales.rebuild_rollups()
@@ -1,46 +1,42 @@
 #!/usr/bin/env python3
 # src/customer.py
-import csv
-import datetime
-import os
-from products import list_products, update_stock, find_product
-from billing import save_bill_txt, save_bill_csv
-
-BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-DATA_DIR = os.path.join(BASE_DIR, 'data')
-CUSTOMER_FILE = os.path.join(DATA_DIR, 'customers.csv')
-SALES_LOG = os.path.join(DATA_DIR, 'sales_log.csv')
+import itertools
+from products import list_products, search_products, iter_search_results
+from billing import print_bill
+from accounts import customer_exists, create_customer, authenticate_customer
+from orders import place_order, hold_line, release_cart, OrderError
+from reservations import HOLD_SECONDS
+from ids import new_cart_id
+from reports import paginate
+from instrument import timed
 
 
 # ---------------- Customer Registration & Login ---------------- #
 def register_customer():
     cid = input("Enter Customer ID: ").strip()
+    if not cid:
+        print("\n❌ Customer ID cannot be empty.")
+        return
+    if customer_exists(cid):
+        print("\n❌ That Customer ID is already taken.")
+        return
     name = input("Enter Name: ").strip()
     password = input("Enter Password: ").strip()
 
-    os.makedirs(os.path.dirname(CUSTOMER_FILE) or '.', exist_ok=True)
-    file_exists = os.path.exists(CUSTOMER_FILE)
-    with open(CUSTOMER_FILE, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        if not file_exists:
-            writer.writerow(['customer_id','name','password'])
-        writer.writerow([cid, name, password])
+    # checked again on write, in case another terminal took the ID meanwhile
+    if not create_customer(cid, name, password):
+        print("\n❌ That Customer ID is already taken.")
+        return
     print("\n✅ Registration successful!")
 
 
 def customer_login():
-    if not os.path.exists(CUSTOMER_FILE):
-        print("\n❌ No customers registered yet.")
-        return None
-
     cid = input("Enter Customer ID: ").strip()
     password = input("Enter Password: ").strip()
-    with open(CUSTOMER_FILE, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            if row['customer_id'] == cid and row['password'] == password:
-                print("\n✅ Login successful. Welcome,", row['name'])
-                return cid
+    row = authenticate_customer(cid, password)
+    if row:
+        print("\n✅ Login successful. Welcome,", row['name'])
+        return cid
     print("\n❌ Invalid credentials.")
     return None
 
@@ -64,50 +60,97 @@ def display_cart(cart):
     print("-" * 60)
 
 
+# ---------------- Helper Function: Browse Products ---------------- #
+def show_products(query=''):
+    """Page through the products matching a name search, best match first (all products if blank)."""
+    if query:
+        total, first_page = search_products(query)
+        if not total:
+            print(f"\n❌ No products match '{query}'.")
+            return
+        print(f"\n🔎 {total} products match '{query}':")
+        rows = itertools.chain(first_page, iter_search_results(query, offset=len(first_page)))
+    else:
+        rows = list_products()
+        print(f"\n📦 {len(rows)} products:")
+    print("-" * 60)
+    print(f"{'Product ID':<12}{'Name':<28}{'Price':<10}{'Stock':<10}")
+    print("-" * 60)
+    paginate(rows, lambda p: f"{p['product_id']:<12}{p['name']:<28}{p['price']:<10}{p['stock']:<10}")
+    print("-" * 60)
+
+
 # ---------------- Cart Management ---------------- #
 def customer_menu(cid):
+    """Cart lines are held for HOLD_SECONDS so other terminals cannot sell them; leaving gives them back."""
     cart = []
+    cart_id = new_cart_id()
+    try:
+        _cart_loop(cid, cart, cart_id)
+    finally:
+        if cart:
+            release_cart(cart_id)
+
+
+def _hold(cart_id, pid, qty):
+    """Hold `qty` of a product for the cart. Returns the priced item, or None (after saying why) if it failed."""
+    try:
+        return hold_line(cart_id, pid, qty)
+    except OrderError as e:
+        print(f"❌ {e}")
+        return None
+
+
+def _cart_loop(cid, cart, cart_id):
     while True:
         print("\n1) View Products\n2) Add to Cart\n3) Update Cart\n4) Remove Item\n5) View Cart\n6) Checkout\n7) Exit")
         ch = input("Choose: ")
 
         if ch == '1':
-            for p in list_products():
-                print(p)
+            show_products(input("Search product name (blank = all products): ").strip())
 
         elif ch == '2':
-            pid = input("Enter product ID to add: ")
-            qty = int(input("Enter quantity: "))
-            product = find_product(pid)
-            if not product:
-                print("❌ Product not found.")
-            elif int(product['stock']) < qty:
-                print("❌ Not enough stock.")
+            pid = input("Enter product ID to add: ").strip()
+            qty = input("Enter quantity: ").strip()
+            if not qty.isdigit() or int(qty) <= 0:
+                print("❌ Quantity must be a whole number above zero.")
+                continue
+            # The hold covers the whole line, so adding more of an item asks for the new total
+            line = next((it for it in cart if it['product_id'] == pid), None)
+            item = _hold(cart_id, pid, int(qty) + (line['qty'] if line else 0))
+            if item is None:
+                continue
+            item.pop('expires', None)
+            if line:
+                line['qty'] = item['qty']
             else:
-                # If item already exists in cart, update qty
-                for it in cart:
-                    if it['product_id'] == pid:
-                        it['qty'] += qty
-                        break
-                else:
-                    cart.append({'product_id': pid, 'name': product['name'], 'price': product['price'], 'qty': qty})
-                print("✅ Added to cart.")
+                cart.append(item)
+            print(f"✅ Added to cart (held for {HOLD_SECONDS // 60} minutes).")
 
         elif ch == '3':
             pid = input("Enter product ID to update quantity: ")
-            for item in cart:
-                if item['product_id'] == pid:
-                    item['qty'] = int(input("Enter new quantity: "))
-                    print("✅ Updated.")
-                    break
-            else:
+            line = next((it for it in cart if it['product_id'] == pid), None)
+            if line is None:
                 print("❌ Item not found in cart.")
+                continue
+            qty = input("Enter new quantity: ").strip()
+            if not qty.isdigit():
+                print("❌ Quantity must be a whole number.")
+                continue
+            if int(qty) == 0:
+                _hold(cart_id, pid, 0)
+                cart.remove(line)
+                print("✅ Removed successfully.")
+            elif _hold(cart_id, pid, int(qty)) is not None:
+                line['qty'] = int(qty)
+                print("✅ Updated.")
 
         elif ch == '4':
             pid = input("Enter product ID to remove: ")
-            new_cart = [it for it in cart if it['product_id'] != pid]
-            if len(new_cart) < len(cart):
-                cart = new_cart
+            line = next((it for it in cart if it['product_id'] == pid), None)
+            if line:
+                _hold(cart_id, pid, 0)
+                cart.remove(line)
                 print("✅ Removed successfully.")
             else:
                 print("❌ Item not found in cart.")
@@ -120,8 +163,8 @@ def customer_menu(cid):
                 print("\n⚠️ You cannot checkout because your cart is empty.")
             else:
                 display_cart(cart)
-                checkout(cid, cart)
-                cart.clear()  # clear cart after successful checkout
+                if checkout(cid, cart, cart_id):
+                    cart.clear()  # the holds became the sale
             break
 
         elif ch == '7':
@@ -129,46 +172,44 @@ def customer_menu(cid):
 
 
 # ---------------- Checkout & Billing ---------------- #
-def checkout(cid, cart):
+@timed('customer.checkout')
+def checkout(cid, cart, cart_id=None):
+    """
+    Place the cart through orders.place_order and show the bill. Returns the
+    placed order (see place_order), or None if nothing was placed: an empty
+    cart or a refused order, whose reason is printed. With `cart_id`, the
+    units the cart holds are the ones sold.
+    """
     if not cart:
         print("❌ Cart is empty.")
-        return
+        return None
 
-    total = sum(float(it['price']) * it['qty'] for it in cart)
-    order_id = f"ORD{int(datetime.datetime.now().timestamp())}"
-    print(f"\n🧾 Generating Bill for {order_id} ...")
+    # Stock for the whole order is taken in one write; nothing is billed if any line is short
+    try:
+        order = place_order(cid, [(it['product_id'], it['qty']) for it in cart], cart_id=cart_id)
+    except OrderError as e:
+        print(f"❌ Checkout failed: {e}")
+        return None
+
+    print(f"\n🧾 Generating Bill for {order['order_id']} ...")
 
     # Display bill in console
     print("\n===== BILL SUMMARY =====")
-    print(f"Order ID: {order_id}")
+    print(f"Order ID: {order['order_id']}")
     print(f"Customer ID: {cid}")
-    print(f"Date: {datetime.date.today()}")
+    print(f"Date: {order['date']}")
     print("-" * 60)
     print(f"{'Product':<20}{'Qty':<10}{'Price':<10}{'Subtotal':<10}")
     print("-" * 60)
-    for it in cart:
+    for it in order['items']:
         subtotal = float(it['price']) * it['qty']
         print(f"{it['name']:<20}{it['qty']:<10}{it['price']:<10}{subtotal:<10}")
     print("-" * 60)
-    print(f"{'Total':<20}{'':<10}{'':<10}{total:<10}")
+    print(f"{'Total':<20}{'':<10}{'':<10}{order['total']:<10}")
     print("=" * 60)
 
-    # Save bill files
-    save_bill_txt(order_id, cart, total, user_id=cid)
-    save_bill_csv(order_id, cart, total, user_id=cid)
-    # Log sale
-    os.makedirs('..\\data', exist_ok=True)
-    file_exists = os.path.exists(SALES_LOG)
-    with open(SALES_LOG, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        if not file_exists:
-            writer.writerow(['order_id', 'customer_id', 'date', 'total'])
-        writer.writerow([order_id, cid, datetime.date.today().strftime("%Y-%m-%d"), total])
-
-    # Update stock
-    for it in cart:
-        product = find_product(it['product_id'])
-        new_stock = int(product['stock']) - it['qty']
-        update_stock(it['product_id'], new_stock)
-
-    print(f"✅ Bill saved. Total: ₹{total}")
\ No newline at end of file
+    # Bill files are written in the background; the preview prints from memory
+    print_bill(order['bill'])
+
+    print(f"✅ Bill saved. Total: ₹{order['total']}")
+    return order
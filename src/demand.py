@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# src/demand.py
+"""
+Sales velocity per product and reorder suggestions ranked by days of cover.
+
+    python src/demand.py             # reorder suggestions
+    python src/demand.py rebuild     # recompute every rate from the line-item log
+
+Each product's demand is an exponentially weighted daily sales rate:
+
+    rate(d) = ALPHA * units sold on day d + (1 - ALPHA) * rate(d - 1)
+
+with ALPHA set by a half-life of HALF_LIFE_DAYS (INVENTORY_DEMAND_HALF_LIFE,
+default 7). Only the rate and the day it was last updated are kept. A sale
+of q units on a later day decays the rate to that day and adds ALPHA * q.
+A sale dated before the last update is added already decayed. So a
+checkout costs O(1) per line, and replaying history in any order gives the
+same rates. Reading the rate on a later day just decays it.
+
+Rates live in data/demand.csv plus an append-only demand.journal
+(journal.Journal): each checkout appends one batch holding the new rates
+of the products it sold. Another terminal's batches are picked up by
+reloading when the journal files change. The rates can always be rebuilt
+from the line-item log, and are the first time they are needed.
+
+Days of cover is stock / rate. The report lists products with less cover
+than COVER_DAYS (INVENTORY_REORDER_COVER_DAYS, default 14), least first,
+with the quantity that would bring them up to it. It looks at each product
+with a rate once, and never at the sales history.
+"""
+import datetime
+import math
+import os
+import sys
+import threading
+from storage import file_lock, file_etag
+from journal import Journal
+from products import get_backend
+import low_stock
+from instrument import timed
+from service import exposed
+
+HALF_LIFE_DAYS = float(os.environ.get('INVENTORY_DEMAND_HALF_LIFE', '0')) or 7.0
+COVER_DAYS = float(os.environ.get('INVENTORY_REORDER_COVER_DAYS', '0')) or 14.0
+ALPHA = 1 - 0.5 ** (1 / HALF_LIFE_DAYS)
+MIN_RATE = 0.01   # units/day below which a product no longer counts as selling
+DEMAND_FIELDS = ['product_id', 'rate', 'day']   # rate as of `day` (YYYY-MM-DD)
+
+_trackers = {}
+
+
+def add_sale(state, day, qty):
+    """Fold `qty` units sold on `day` (a date ordinal) into a (rate, day) state (None = no sales yet)."""
+    if state is None:
+        return ALPHA * qty, day
+    rate, last = state
+    if day >= last:
+        return rate * (1 - ALPHA) ** (day - last) + ALPHA * qty, day
+    return rate + ALPHA * qty * (1 - ALPHA) ** (last - day), last
+
+
+def rate_on(state, day):
+    """Units per day as of `day` (a date ordinal)."""
+    rate, last = state
+    return rate * (1 - ALPHA) ** max(0, day - last)
+
+
+class DemandTracker:
+    """The (rate, day) of every product that has sold, for one backend's data directory."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.journal = Journal(os.path.join(backend.data_dir, 'demand.csv'), DEMAND_FIELDS, 'product_id',
+                               fsync=False)   # rebuildable from the line items, so not worth an fsync per checkout
+        self.rates = {}      # product_id -> (rate, date ordinal)
+        self._seen = None    # journal file etags as of our last load or write
+        self._lock = threading.RLock()
+
+    def _etags(self):
+        return tuple(file_etag(path) for path in self.journal.paths())
+
+    def _load(self):
+        """Make self.rates current. Returns True if they had to be rebuilt from the line items."""
+        seen = self._etags()
+        if seen == self._seen:
+            return False
+        if not any(seen):
+            self.rebuild()
+            return True
+        rates = {}
+        for row in self.journal.load():
+            try:
+                rates[row['product_id']] = (float(row['rate']), datetime.date.fromisoformat(row['day']).toordinal())
+            except (KeyError, TypeError, ValueError):
+                continue
+        self.rates, self._seen = rates, seen
+        return False
+
+    def record(self, sale_date, quantities):
+        """Fold one order's {product_id: units} into the rates and journal the new ones."""
+        day = sale_date.toordinal()
+        with self._lock, file_lock(self.journal.journal_path):
+            if self._load():
+                return   # just rebuilt from the line items, which already hold this order
+            rows = []
+            for pid, qty in quantities.items():
+                rate, last = self.rates[pid] = add_sale(self.rates.get(pid), day, qty)
+                rows.append({'product_id': pid, 'rate': repr(rate),
+                             'day': datetime.date.fromordinal(last).isoformat()})
+            self.journal.append(rows)
+            self._seen = self._etags()
+
+    def rebuild(self):
+        """Recompute every rate from the whole line-item log. Returns the number of line items read."""
+        rates = {}
+        lines = 0
+        with self._lock, file_lock(self.journal.journal_path):
+            for _, _, pid, qty, _, day in self.backend.iter_line_items(datetime.date.min, datetime.date.max):
+                try:
+                    rates[pid] = add_sale(rates.get(pid), datetime.date.fromisoformat(day).toordinal(), int(qty))
+                except (TypeError, ValueError):
+                    continue
+                lines += 1
+            self.journal.replace_all([pid, repr(rate), datetime.date.fromordinal(last).isoformat()]
+                                     for pid, (rate, last) in rates.items())
+            self.rates, self._seen = rates, self._etags()
+        return lines
+
+    def current(self):
+        """product_id -> (rate, date ordinal), reloaded first if another terminal has written since."""
+        with self._lock:
+            self._load()
+            return self.rates
+
+
+def watch(backend):
+    """The demand tracker for `backend`, created on first use."""
+    tracker = _trackers.get(id(backend))
+    if tracker is None or tracker.backend is not backend:
+        tracker = _trackers[id(backend)] = DemandTracker(backend)
+    return tracker
+
+
+# ------------------- API ------------------- #
+@timed('demand.record_sale')
+def record_sale(sale_date, items):
+    """Update the demand rates with an order's items ({'product_id', 'qty'} dicts)."""
+    quantities = {}
+    for it in items:
+        quantities[it['product_id']] = quantities.get(it['product_id'], 0) + int(it['qty'])
+    watch(get_backend()).record(sale_date, quantities)
+
+
+@exposed('demand_rate')
+@timed('demand.demand_rate')
+def demand_rate(pid):
+    """Current units/day for one product (0.0 if it has not sold)."""
+    state = watch(get_backend()).current().get(pid)
+    return rate_on(state, datetime.date.today().toordinal()) if state else 0.0
+
+
+@exposed('reorder_suggestions')
+@timed('demand.reorder_suggestions')
+def reorder_suggestions(cover_days=None):
+    """
+    Products with less than `cover_days` (default COVER_DAYS) of stock at
+    their current sales rate, least cover first: [{'product_id', 'stock',
+    'rate', 'days_cover', 'suggested'}], `suggested` being the units that
+    would restore full cover.
+    """
+    cover_days = COVER_DAYS if cover_days is None else cover_days
+    backend = get_backend()
+    today = datetime.date.today().toordinal()
+    stock = low_stock.watch(backend).index().stock
+    rows = []
+    for pid, state in watch(backend).current().items():
+        units = stock.get(pid)
+        rate = rate_on(state, today)
+        if units is None or rate < MIN_RATE:
+            continue   # deleted, unreadable stock, or no longer selling
+        cover = max(units, 0) / rate
+        if cover < cover_days:
+            rows.append({'product_id': pid, 'stock': units, 'rate': round(rate, 2), 'days_cover': round(cover, 1),
+                         'suggested': max(0, math.ceil(rate * cover_days - units))})
+    rows.sort(key=lambda r: (r['days_cover'], -r['rate'], r['product_id']))
+    return rows
+
+
+@timed('demand.rebuild_demand')
+def rebuild_demand():
+    """Recompute the demand rates from the line-item log. Returns the number of line items read."""
+    return watch(get_backend()).rebuild()
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ['rebuild']:
+        print(f"✅ Rebuilt demand rates from {rebuild_demand()} line items")
+    elif not sys.argv[1:]:
+        print(f"{'Product':<14}{'Stock':>8}{'Per day':>10}{'Days cover':>12}{'Suggest':>10}")
+        for r in reorder_suggestions():
+            print(f"{r['product_id']:<14}{r['stock']:>8}{r['rate']:>10.2f}{r['days_cover']:>12.1f}{r['suggested']:>10}")
+    else:
+        print("usage: python src/demand.py [rebuild]")
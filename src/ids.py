@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# src/ids.py
+"""
+Sortable, collision-free IDs for orders, bills and carts.
+
+Each ID packs 80 bits into 16 Crockford base32 characters:
+
+    48 bits  milliseconds since the Unix epoch
+    16 bits  node (terminal) number
+    16 bits  per-millisecond sequence
+
+Nothing is shared between terminals at generation time. The node number is
+leased once per process: it takes an exclusive lock on one byte of
+<data dir>/node_leases.lock, the first one free from INVENTORY_NODE_ID (or
+from 0), and holds it for as long as the process lives. No two live
+processes sharing a data dir can hold the same node. A forked child leases
+the next free node after its parent's. If the lease file cannot be used,
+the node falls back to the process ID. Within a process IDs are strictly
+increasing, even if the clock steps back, and because the alphabet is in
+ASCII order, sorting IDs as strings sorts them by time, which is what
+id_bounds() relies on for range queries.
+"""
+import datetime
+import os
+import threading
+import time
+import storage
+
+try:
+    import fcntl
+except ImportError:   # Windows: msvcrt byte-range locks instead
+    fcntl = None
+    import msvcrt
+
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'   # Crockford base32, ASCII-ordered
+ID_LENGTH = 16
+ORDER_PREFIX = 'ORD'
+BILL_PREFIX = 'INV'
+CART_PREFIX = 'CART'
+
+_DECODE = {c: i for i, c in enumerate(ALPHABET)}
+_PAIRS = [a + b for a in ALPHABET for b in ALPHABET]   # encode 10 bits per lookup
+_MAX_SEQ = 0xFFFF
+NODE_LEASE_FILE = 'node_leases.lock'
+
+
+def _configured_node():
+    configured = os.environ.get('INVENTORY_NODE_ID')
+    return int(configured) & 0xFFFF if configured else None
+
+
+def _try_lock(f, node):
+    """Lock byte `node` of the lease file without waiting; False if another process holds it."""
+    try:
+        if fcntl:
+            # POSIX record locks belong to the process: a forked child holds none of its parent's
+            fcntl.lockf(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB, 1, node)
+        else:
+            f.seek(node)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _lease_node(start, f=None):
+    """
+    Lock the first free node at or after `start` (wrapping) in the data
+    dir's lease file, for the life of the process. Returns (node, file);
+    the file must stay open, since closing it gives the lease up. Returns
+    (None, None) if there is no usable lease file.
+    """
+    if f is None:
+        try:
+            os.makedirs(storage.DATA_DIR, exist_ok=True)
+            f = open(os.path.join(storage.DATA_DIR, NODE_LEASE_FILE), 'a+b')
+        except OSError:
+            return None, None
+    for i in range(_MAX_SEQ + 1):
+        node = (start + i) & 0xFFFF
+        if _try_lock(f, node):
+            return node, f
+    return None, f
+
+
+class IdGenerator:
+    """Monotonic ID source for one process (one per process: leases are per process); thread-safe."""
+
+    def __init__(self, node=None):
+        self.node = None if node is None else node & 0xFFFF   # None: leased on first use
+        self._start = _configured_node() or 0
+        self._lease = None
+        self._last_ms = 0
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def _take_node(self):
+        node, self._lease = _lease_node(self._start, self._lease)
+        self.node = node if node is not None else os.getpid() & 0xFFFF
+
+    def reseed(self):
+        """After a fork: lease the next free node after the parent's (the child must not reuse it)."""
+        self._lock = threading.Lock()   # the parent's lock may have been held mid-fork
+        if self.node is not None:
+            self._start = (self.node + 1) & 0xFFFF
+        self.node = None
+        self._last_ms = 0
+        self._seq = 0
+
+    def next_value(self):
+        with self._lock:
+            if self.node is None:
+                self._take_node()
+            now = time.time_ns() // 1_000_000
+            if now > self._last_ms:
+                self._last_ms, self._seq = now, 0
+            else:
+                # same millisecond (or the clock stepped back): keep counting,
+                # borrowing the next millisecond when the sequence runs out
+                self._seq += 1
+                if self._seq > _MAX_SEQ:
+                    self._last_ms += 1
+                    self._seq = 0
+            return (self._last_ms << 32) | (self.node << 16) | self._seq
+
+    def new_id(self):
+        return encode(self.next_value())
+
+
+def encode(value):
+    """80-bit int -> 16-char base32 string."""
+    return ''.join(_PAIRS[(value >> shift) & 0x3FF] for shift in (70, 60, 50, 40, 30, 20, 10, 0))
+
+
+def decode(text):
+    value = 0
+    for ch in text:
+        value = (value << 5) | _DECODE[ch]
+    return value
+
+
+_generator = IdGenerator()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_generator.reseed)
+
+
+def new_id():
+    return _generator.new_id()
+
+
+def new_order_id():
+    return ORDER_PREFIX + _generator.new_id()
+
+
+def new_bill_id():
+    return BILL_PREFIX + _generator.new_id()
+
+
+def new_cart_id():
+    return CART_PREFIX + _generator.new_id()
+
+
+def is_sortable_id(prefixed_id, prefix):
+    """True for IDs made here (older ORD<unix seconds> / INV<timestamp> IDs are not)."""
+    body = prefixed_id[len(prefix):]
+    return (prefixed_id.startswith(prefix) and len(body) == ID_LENGTH
+            and all(ch in _DECODE for ch in body))
+
+
+def id_time(prefixed_id, prefix=''):
+    """Creation time embedded in an ID (local time, like datetime.now())."""
+    ms = decode(prefixed_id[len(prefix):]) >> 32
+    return datetime.datetime.fromtimestamp(ms / 1000)
+
+
+def id_bounds(start, end, prefix=''):
+    """
+    Smallest and largest possible IDs created between two datetimes
+    (inclusive), for bisecting or comparing sorted IDs as a time index.
+    """
+    lo = int(start.timestamp() * 1000) << 32
+    hi = (int(end.timestamp() * 1000) << 32) | 0xFFFFFFFF
+    return prefix + encode(lo), prefix + encode(hi)
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# src/instrument.py
+"""
+Opt-in performance instrumentation for the storage, product, billing and
+checkout hot paths.
+
+    INVENTORY_METRICS=json python src/main.py        # or =prom, or --metrics[=prom]
+    INVENTORY_PROFILE=customer.checkout python src/main.py   # or --profile OP
+
+Functions marked with @timed('name') record call counts, errors, bytes read
+and written and a latency histogram per name. When the process exits the
+stats are written as JSON or Prometheus text to INVENTORY_METRICS_FILE
+(default reports/metrics_<time>_<pid>.json|.prom; '-' for stdout).
+With INVENTORY_PROFILE=<name>, calls of that one operation also run under
+cProfile. The profile is saved next to the metrics as a .pstats file.
+
+Instrumentation is applied when the modules are imported. When it is off,
+@timed returns the function untouched, so the cost is nothing at all.
+Because of that it has to be switched on (env var, or configure() / the
+main.py flags) before the app modules are imported.
+"""
+import atexit
+import bisect
+import cProfile
+import datetime
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+FORMATS = ('json', 'prom')
+# Histogram bucket upper bounds in seconds (the last bucket is +Inf)
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+FORMAT = None         # 'json' / 'prom' when enabled
+OUTPUT = None         # file to dump to at exit ('-' = stdout)
+PROFILE_OP = None     # operation captured with cProfile
+ENABLED = False
+
+_stats = {}
+_lock = threading.Lock()
+_profile = {'profiler': None, 'active': False, 'calls': 0}
+_started = None
+
+
+class OpStats:
+    """Counters and a latency histogram for one operation."""
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def observe(self, seconds, failed=False):
+        with _lock:
+            self.calls += 1
+            self.errors += failed
+            self.seconds += seconds
+            if seconds > self.max_seconds:
+                self.max_seconds = seconds
+            self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+
+    def as_dict(self):
+        return {
+            'calls': self.calls, 'errors': self.errors, 'seconds': round(self.seconds, 6),
+            'mean_ms': round(self.seconds / self.calls * 1000, 4) if self.calls else 0.0,
+            'max_ms': round(self.max_seconds * 1000, 4),
+            'bytes_read': self.bytes_read, 'bytes_written': self.bytes_written,
+            'latency_buckets': {('+Inf' if i == len(BUCKETS) else repr(BUCKETS[i])): n
+                                for i, n in enumerate(self.buckets) if n},
+        }
+
+
+def stats(name):
+    with _lock:
+        op = _stats.get(name)
+        if op is None:
+            op = _stats[name] = OpStats(name)
+        return op
+
+
+# ------------------- RECORDING ------------------- #
+def file_size(path):
+    try:
+        return os.path.getsize(path)
+    except (OSError, TypeError):
+        return 0
+
+
+def add_bytes(name, read=0, written=0):
+    """Count bytes for an operation from inside its body (only call when ENABLED)."""
+    op = stats(name)
+    with _lock:
+        op.bytes_read += read
+        op.bytes_written += written
+
+
+def observe(name, seconds, failed=False):
+    """Record one timing that is not a whole function call, e.g. a lock wait."""
+    stats(name).observe(seconds, failed)
+
+
+def _start_profile(name):
+    """Begin cProfile capture if this is the profiled operation and no capture is running."""
+    if name != PROFILE_OP:
+        return False
+    with _lock:
+        if _profile['active']:
+            return False   # nested call, or another thread is being profiled
+        _profile['active'] = True
+        if _profile['profiler'] is None:
+            _profile['profiler'] = cProfile.Profile()
+        _profile['calls'] += 1
+    _profile['profiler'].enable()
+    return True
+
+
+def _stop_profile():
+    _profile['profiler'].disable()
+    with _lock:
+        _profile['active'] = False
+
+
+def timed(name, read=None, written=None):
+    """
+    Decorator: record calls and latency under `name`. `read` / `written` are
+    optional callables (result, *args, **kwargs) -> bytes, run after each call.
+    Generator functions are timed across their whole iteration, counting
+    only the time spent inside the generator.
+    Returns the function untouched when instrumentation is off.
+    """
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+        op = stats(name)
+
+        def account(result, args, kwargs):
+            if read is not None or written is not None:
+                add_bytes(name, read(result, *args, **kwargs) if read else 0,
+                          written(result, *args, **kwargs) if written else 0)
+
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def generator_wrapper(*args, **kwargs):
+                profiling = _start_profile(name)
+                elapsed, failed = 0.0, False
+                inner = fn(*args, **kwargs)
+                try:
+                    while True:
+                        t0 = time.perf_counter()
+                        try:
+                            item = next(inner)
+                        except StopIteration:
+                            break
+                        except BaseException:
+                            failed = True
+                            raise
+                        finally:
+                            elapsed += time.perf_counter() - t0
+                        yield item
+                finally:
+                    inner.close()
+                    if profiling:
+                        _stop_profile()
+                    op.observe(elapsed, failed)
+                    account(None, args, kwargs)
+            return generator_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            profiling = _start_profile(name)
+            t0 = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException:
+                op.observe(time.perf_counter() - t0, failed=True)
+                raise
+            finally:
+                if profiling:
+                    _stop_profile()
+            op.observe(time.perf_counter() - t0)
+            account(result, args, kwargs)
+            return result
+        return wrapper
+    return decorate
+
+
+def path_size(result, path, *args, **kwargs):
+    """`read`/`written` helper: size of the file named by the first argument."""
+    return file_size(path)
+
+
+def result_size(result, *args, **kwargs):
+    """`read`/`written` helper: size of the file whose path was returned."""
+    return file_size(result)
+
+
+# ------------------- OUTPUT ------------------- #
+def snapshot():
+    """All stats so far as a JSON-ready dict."""
+    with _lock:
+        ops = {name: op for name, op in _stats.items() if op.calls}
+    return {'started': _started, 'pid': os.getpid(), 'argv': sys.argv,
+            'profile': PROFILE_OP, 'ops': {name: ops[name].as_dict() for name in sorted(ops)}}
+
+
+def _label(name):
+    return name.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def prometheus_text():
+    """All stats in the Prometheus text exposition format."""
+    with _lock:
+        ops = [_stats[name] for name in sorted(_stats) if _stats[name].calls]
+    lines = []
+    for metric, kind, help_text, value in (
+            ('inventory_calls_total', 'counter', 'Calls per operation.', lambda op: op.calls),
+            ('inventory_errors_total', 'counter', 'Calls that raised.', lambda op: op.errors),
+            ('inventory_bytes_read_total', 'counter', 'Bytes read from files.', lambda op: op.bytes_read),
+            ('inventory_bytes_written_total', 'counter', 'Bytes written to files.', lambda op: op.bytes_written)):
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+        lines += [f'{metric}{{op="{_label(op.name)}"}} {value(op)}' for op in ops]
+    lines += ["# HELP inventory_latency_seconds Time per call.", "# TYPE inventory_latency_seconds histogram"]
+    for op in ops:
+        label = _label(op.name)
+        running = 0
+        for bound, count in zip(BUCKETS + ('+Inf',), op.buckets):
+            running += count
+            lines.append(f'inventory_latency_seconds_bucket{{op="{label}",le="{bound}"}} {running}')
+        lines.append(f'inventory_latency_seconds_sum{{op="{label}"}} {op.seconds!r}')
+        lines.append(f'inventory_latency_seconds_count{{op="{label}"}} {op.calls}')
+    return "\n".join(lines) + "\n"
+
+
+def default_output(fmt):
+    stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.join(BASE_DIR, 'reports', f"metrics_{stamp}_{os.getpid()}.{fmt}")
+
+
+def dump(path=None, fmt=None):
+    """Write the stats (and the cProfile capture, if any). Returns the metrics path."""
+    fmt = fmt or FORMAT or 'json'
+    path = path or OUTPUT or default_output(fmt)
+    text = prometheus_text() if fmt == 'prom' else json.dumps(snapshot(), indent=2) + "\n"
+    if path == '-':
+        sys.stdout.write(text)
+    else:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+    profiler = _profile['profiler']
+    if profiler is not None:
+        base = os.path.splitext(path)[0] if path != '-' else default_output(fmt)[:-len(fmt) - 1]
+        profile_path = f"{base}.{PROFILE_OP}.pstats"
+        profiler.dump_stats(profile_path)
+        print(f"🔬 cProfile of {PROFILE_OP} ({_profile['calls']} calls) saved to {profile_path} "
+              f"(python -m pstats {profile_path})", file=sys.stderr)
+    return path
+
+
+def _dump_at_exit():
+    path = dump()
+    if path != '-':
+        print(f"📈 Metrics saved to {path}", file=sys.stderr)
+
+
+# ------------------- SWITCHING ON ------------------- #
+def configure(fmt=None, output=None, profile=None):
+    """
+    Switch instrumentation on. Only functions imported after this call are
+    instrumented. fmt is 'json' or 'prom'. Stats are dumped at exit.
+    """
+    global FORMAT, OUTPUT, PROFILE_OP, ENABLED, _started
+    if fmt not in (None,) + FORMATS:
+        raise ValueError(f"metrics format must be one of {', '.join(FORMATS)}, not {fmt!r}")
+    FORMAT = fmt or FORMAT or 'json'
+    OUTPUT = output or OUTPUT
+    PROFILE_OP = profile or PROFILE_OP
+    if not ENABLED:
+        ENABLED = True
+        _started = datetime.datetime.now().isoformat(timespec='seconds')
+        atexit.register(_dump_at_exit)
+
+
+def configure_from_args(argv):
+    """Handle --metrics[=json|prom], --metrics-file PATH and --profile OP; returns the other arguments."""
+    rest, fmt, output, profile = [], None, None, None
+    args = iter(argv)
+    for arg in args:
+        if arg == '--metrics':
+            fmt = 'json'
+        elif arg.startswith('--metrics='):
+            fmt = arg.split('=', 1)[1]
+        elif arg == '--metrics-file':
+            output = next(args, None)
+        elif arg == '--profile':
+            profile = next(args, None)
+        else:
+            rest.append(arg)
+    if fmt or output or profile:
+        configure(fmt, output, profile)
+    return rest
+
+
+def _configure_from_env():
+    fmt = os.environ.get('INVENTORY_METRICS', '').strip().lower()
+    profile = os.environ.get('INVENTORY_PROFILE', '').strip()
+    if fmt in ('', '0', 'off') and not profile:
+        return
+    configure('json' if fmt in ('', '0', 'off', '1', 'on') else fmt,
+              os.environ.get('INVENTORY_METRICS_FILE') or None, profile or None)
+
+
+_configure_from_env()
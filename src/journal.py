@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# src/journal.py
+import atexit
+import json
+import os
+import threading
+from storage import read_csv, write_csv_temp, file_lock, file_etag
+import instrument
+
+DEFAULT_MAX_BYTES = 1024 * 1024   # compact once the live journal passes ~1 MB
+
+
+class Journal:
+    """
+    Snapshot CSV plus an append-only change journal, keyed by one column.
+
+    Each append is a single JSON line holding a whole batch of changes, so a
+    crash mid-write leaves at most one torn line that is ignored on replay.
+    Rows are always journalled with their full, absolute values, which makes
+    replaying a batch twice harmless and keeps compaction crash-safe:
+
+        products.csv                  snapshot
+        products.journal.compacting   batches being folded into the snapshot
+        products.journal              live batches
+
+    Current state = snapshot + compacting + live, replayed in that order.
+    Readers take a shared lock on the journal and writers an exclusive one,
+    so several processes (or threads) can share the same files.
+    """
+
+    def __init__(self, snapshot_path, fields, key, max_bytes=None, fsync=True):
+        self.snapshot_path = snapshot_path
+        self.fields = fields
+        self.key = key
+        self.max_bytes = max_bytes or DEFAULT_MAX_BYTES
+        self.fsync = fsync
+        base = os.path.splitext(snapshot_path)[0]
+        self.journal_path = base + '.journal'
+        self.compacting_path = self.journal_path + '.compacting'
+        self._compactor = None
+        atexit.register(self.wait)
+
+    def paths(self):
+        """Files whose contents make up the current state (for change detection)."""
+        return [self.snapshot_path, self.compacting_path, self.journal_path]
+
+    # ------------------- REPLAY ------------------- #
+    @staticmethod
+    def _replay(path, state):
+        if not os.path.exists(path):
+            return
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    batch = json.loads(line)
+                except ValueError:
+                    continue   # torn write from a crash; the batch never committed
+                for row in batch.get('set', []):
+                    state[row['key']] = row['row']
+                for key in batch.get('del', []):
+                    state.pop(key, None)
+
+    def load(self):
+        """Return the current rows: snapshot with all journalled batches applied."""
+        with file_lock(self.journal_path, shared=True):
+            state = {r.get(self.key): r for r in read_csv(self.snapshot_path)}
+            self._replay(self.compacting_path, state)
+            self._replay(self.journal_path, state)
+        return list(state.values())
+
+    # ------------------- APPEND ------------------- #
+    def _repair_tail(self, f):
+        """Cut a torn trailing line left by a crash so the next batch starts cleanly."""
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b'\n':
+            return
+        f.seek(0)
+        data = f.read()
+        f.truncate(data.rfind(b'\n') + 1)
+        f.seek(0, os.SEEK_END)
+
+    @instrument.timed('journal.append')
+    def append(self, rows=(), deleted=()):
+        """Durably append one batch of upserted rows and deleted keys."""
+        batch = {}
+        if rows:
+            batch['set'] = [{'key': r[self.key], 'row': {k: r.get(k, '') for k in self.fields}} for r in rows]
+        if deleted:
+            batch['del'] = list(deleted)
+        if not batch:
+            return
+        line = (json.dumps(batch, separators=(',', ':')) + '\n').encode('utf-8')
+
+        with file_lock(self.journal_path):
+            dirpath = os.path.dirname(self.journal_path)
+            if dirpath:
+                os.makedirs(dirpath, exist_ok=True)
+            with open(self.journal_path, 'ab+') as f:
+                self._repair_tail(f)
+                f.write(line)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+                size = f.tell()
+        if instrument.ENABLED:
+            instrument.add_bytes('journal.append', written=len(line))
+        if size >= self.max_bytes:
+            self.compact(background=True)
+
+    # ------------------- COMPACTION ------------------- #
+    def compact(self, background=False):
+        """
+        Fold the journal into a new snapshot.
+        The live journal is renamed aside first so new batches keep appending
+        while the snapshot is rewritten, optionally on a background thread.
+        """
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        with file_lock(self.journal_path):
+            if not os.path.exists(self.compacting_path):
+                if not os.path.exists(self.journal_path):
+                    return
+                os.replace(self.journal_path, self.compacting_path)
+        if background:
+            self._compactor = threading.Thread(target=self._fold, name='journal-compactor', daemon=True)
+            self._compactor.start()
+        else:
+            self._fold()
+
+    def _fold(self):
+        with file_lock(self.journal_path, shared=True):
+            seen = (file_etag(self.snapshot_path), file_etag(self.compacting_path))
+            if seen[1] is None:
+                return   # another process already folded it
+            state = {r.get(self.key): r for r in read_csv(self.snapshot_path)}
+            self._replay(self.compacting_path, state)
+        tmp = write_csv_temp(self.snapshot_path, self.fields, list(state.values()))
+        try:
+            with file_lock(self.journal_path):
+                # Only swap in if no other compactor got there first
+                if (file_etag(self.snapshot_path), file_etag(self.compacting_path)) == seen:
+                    os.replace(tmp, self.snapshot_path)
+                    os.remove(self.compacting_path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def replace_all(self, rows):
+        """
+        Make `rows` (any iterable of value lists in `fields` order) the whole
+        state: write it as the new snapshot and drop both journals. Callers
+        hold the journal lock across reading the old state and calling this.
+        """
+        tmp = write_csv_temp(self.snapshot_path, self.fields, rows, as_lists=True)
+        try:
+            with file_lock(self.journal_path):
+                os.replace(tmp, self.snapshot_path)
+                for path in (self.compacting_path, self.journal_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def wait(self):
+        """Block until a running background compaction has finished."""
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
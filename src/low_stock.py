@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# src/low_stock.py
+"""
+Low-stock tracking: per-product reorder levels, a sorted low-stock index and
+alerts when a product drops below its reorder level.
+
+The index keeps every product in two sorted lists, one by stock level and one
+by headroom (stock minus reorder level). "Below N" and "below its own reorder
+level" are then a bisect plus a slice: O(log n + k) for k matching products.
+It is kept current from the backend's product-change notifications, and
+rebuilt only when products_version() or reorder_levels_version() shows
+another terminal changed something behind its back. The reorder levels are
+likewise re-read only when their version moves, so a query or a checkout
+costs a version check, not a copy of every level.
+
+When a write takes a product from at/above its reorder level to below it, a
+low-stock event goes to data/low_stock_events.csv and to any callbacks
+registered with on_low_stock().
+"""
+import bisect
+import collections
+import datetime
+import os
+import threading
+from storage import append_csv, iter_csv
+
+DEFAULT_REORDER_LEVEL = 5
+EVENTS_FILE = 'low_stock_events.csv'
+EVENT_FIELDS = ['time', 'product_id', 'name', 'stock', 'reorder_level']
+
+_monitors = {}
+_callbacks = []
+
+
+def _stock(row):
+    """Stock as an int, or None if the row has none / it cannot be parsed."""
+    if row is None:
+        return None
+    try:
+        return int(float(str(row.get('stock', '')).strip() or 0))
+    except ValueError:
+        return None
+
+
+class LowStockIndex:
+    """Products ordered by stock level and by headroom below their reorder level."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.version = None
+        self.levels_version = None
+        self.levels = {}
+        self.stock = {}
+        self.invalid = []   # product IDs whose stock could not be parsed
+        self._by_stock = []
+        self._by_headroom = []
+
+    def level(self, pid):
+        return self.levels.get(pid, DEFAULT_REORDER_LEVEL)
+
+    def rebuild(self):
+        backend = self.backend
+        self.version = backend.products_version()
+        self.levels_version = backend.reorder_levels_version()
+        self.levels = backend.list_reorder_levels()
+        self.stock, self.invalid = {}, []
+        for row in backend.list_products():
+            stock = _stock(row)
+            if stock is None:
+                self.invalid.append(row.get('product_id'))
+            else:
+                self.stock[row['product_id']] = stock
+        self._by_stock = sorted((s, pid) for pid, s in self.stock.items())
+        self._by_headroom = sorted((s - self.level(pid), pid) for pid, s in self.stock.items())
+
+    @staticmethod
+    def _discard(keys, key):
+        i = bisect.bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            del keys[i]
+
+    def _remove(self, pid):
+        stock = self.stock.pop(pid, None)
+        if stock is not None:
+            self._discard(self._by_stock, (stock, pid))
+            self._discard(self._by_headroom, (stock - self.level(pid), pid))
+
+    def _insert(self, pid, stock):
+        self.stock[pid] = stock
+        bisect.insort(self._by_stock, (stock, pid))
+        bisect.insort(self._by_headroom, (stock - self.level(pid), pid))
+
+    def update(self, pid, stock):
+        """Move one product to a new stock level (None = gone / unparseable)."""
+        self._remove(pid)
+        if stock is not None:
+            self._insert(pid, stock)
+
+    def set_level(self, pid, level):
+        stock = self.stock.get(pid)
+        self._remove(pid)
+        if level is None:
+            self.levels.pop(pid, None)
+        else:
+            self.levels[pid] = level
+        if stock is not None:
+            self._insert(pid, stock)
+
+    def below(self, threshold):
+        """[(product_id, stock)] with stock < threshold, lowest first."""
+        end = bisect.bisect_left(self._by_stock, (threshold, ''))
+        return [(pid, stock) for stock, pid in self._by_stock[:end]]
+
+    def below_reorder_level(self):
+        """[(product_id, stock, reorder level)] with stock below their own level, furthest below first."""
+        end = bisect.bisect_left(self._by_headroom, (0, ''))
+        return [(pid, self.stock[pid], self.level(pid)) for _, pid in self._by_headroom[:end]]
+
+
+class LowStockMonitor:
+    """Watches one backend: keeps its LowStockIndex current and raises low-stock events."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.events_file = os.path.join(backend.data_dir, EVENTS_FILE)
+        self._lock = threading.RLock()
+        self._index = None
+        self._levels = None
+        self._levels_version = None
+        backend.subscribe_products(self._on_change)
+
+    def index(self):
+        """
+        The low-stock index, rebuilt if it is missing or another terminal
+        changed the products or reorder levels since it was last brought up to date.
+        """
+        with self._lock:
+            index = self._index
+            stale = index is None or index.version is None or index.version != self.backend.products_version()
+            if not stale:
+                levels_version = self.backend.reorder_levels_version()
+                stale = (index.levels != self.levels() if levels_version is None
+                         else index.levels_version != levels_version)
+            if stale:
+                self._index = index = LowStockIndex(self.backend)
+                index.rebuild()
+            return index
+
+    def levels(self):
+        """Explicit reorder levels, re-read only when reorder_levels_version() has moved. Do not modify."""
+        with self._lock:
+            version = self.backend.reorder_levels_version()
+            if self._levels is None or version is None or version != self._levels_version:
+                self._levels, self._levels_version = self.backend.list_reorder_levels(), version
+            return self._levels
+
+    def set_level(self, pid, level):
+        with self._lock:
+            before = self.backend.reorder_levels_version()
+            self.backend.set_reorder_level(pid, level)
+            after = self.backend.reorder_levels_version()
+            self._levels = None   # re-read on next use
+            index = self._index
+            if index is not None:
+                if before is None or index.levels_version == before:
+                    index.set_level(pid, level)
+                    index.levels_version = after
+                else:
+                    self._index = None   # another terminal changed levels too: rebuild on next use
+
+    def _on_change(self, changes, before, after):
+        with self._lock:
+            index = self._index
+            if changes is None:
+                self._index = None   # bulk change: rebuild on next use
+                return
+            if index is not None:
+                if before is not None and index.version == before:
+                    for pid, _, new in changes:
+                        index.update(pid, _stock(new))
+                    index.version = after
+                else:
+                    self._index = None
+            levels = self.levels()
+            events = []
+            for pid, old, new in changes:
+                level = levels.get(pid, DEFAULT_REORDER_LEVEL)
+                old_stock, new_stock = _stock(old), _stock(new)
+                if old_stock is not None and new_stock is not None and old_stock >= level > new_stock:
+                    events.append({'time': datetime.datetime.now().isoformat(timespec='seconds'),
+                                   'product_id': pid, 'name': new.get('name', ''),
+                                   'stock': new_stock, 'reorder_level': level})
+        for event in events:
+            append_csv(self.events_file, EVENT_FIELDS, event)
+            for callback in list(_callbacks):
+                callback(event)
+
+    def recent_events(self, count=10):
+        return list(collections.deque(iter_csv(self.events_file), maxlen=count))
+
+
+def watch(backend):
+    """The monitor for `backend`, created (and subscribed) on first use."""
+    monitor = _monitors.get(id(backend))
+    if monitor is None or monitor.backend is not backend:
+        monitor = _monitors[id(backend)] = LowStockMonitor(backend)
+    return monitor
+
+
+def on_low_stock(callback):
+    """Call callback(event) whenever a product drops below its reorder level."""
+    _callbacks.append(callback)
@@ -1,7 +1,26 @@
 #!/usr/bin/env python3
 # src/main.py
-from admin import admin_login, view_products, search_product, update_product, delete_product, sales_report
-from customer import register_customer, customer_login, customer_menu
+import sys
+import instrument
+import service
+
+# --metrics[=json|prom] / --metrics-file PATH / --profile OP switch on instrumentation,
+# --store ID works on one store's data (src/stores.py), and --service [ADDRESS] makes this
+# console a client of the inventory service (src/service.py); all are applied as the app
+# modules below are imported
+if __name__ == '__main__':
+    try:
+        argv = instrument.configure_from_args(sys.argv[1:])
+        import stores   # only now: it imports storage, which picks up the instrumentation as it loads
+        service.configure_from_args(stores.configure_from_args(argv))
+        if service.CLIENT is not None:
+            service.CLIENT.call('ping')   # fail now rather than at the first menu choice
+    except (service.ServiceError, ValueError) as exc:
+        sys.exit(f"❌ {exc}")
+
+from admin import (admin_login, view_products, search_product, update_product, delete_product,  # noqa: E402
+                   import_products, export_products, sales_report)
+from customer import register_customer, customer_login, customer_menu  # noqa: E402
 
 
 def main_menu():
@@ -14,7 +33,8 @@ def main_menu():
                     print("\n 1) Manage Products 2) Reports 3) Exit")
                     ch = input("Choose option: ")
                     if ch == '1':
-                        print("\n 1) View Products \n 2) Search Products \n 3) Update Products \n 4) Delete Products")
+                        print("\n 1) View Products \n 2) Search Products \n 3) Update Products \n 4) Delete Products"
+                              "\n 5) Import Products \n 6) Export Products")
                         sub = input("Choose: ")
                         if sub == '1':
                             view_products()
@@ -24,6 +44,10 @@ def main_menu():
                             update_product()
                         elif sub == '4':
                             delete_product()
+                        elif sub == '5':
+                            import_products()
+                        elif sub == '6':
+                            export_products()
                     elif ch == '2':
                         sales_report()
                     else:
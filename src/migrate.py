@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# src/migrate.py
+"""
+Copy the current data into another storage backend.
+
+    python src/migrate.py --to sqlite                 # data/*.csv -> data/inventory.db
+    python src/migrate.py --to sqlite --data-dir DIR
+
+Afterwards run the app with INVENTORY_BACKEND=sqlite.
+"""
+import argparse
+import storage
+from storage import open_backend
+
+
+def migrate(source_name, target_name, data_dir):
+    source = open_backend(source_name, data_dir)
+    target = open_backend(target_name, data_dir)
+    if not hasattr(target, 'import_from'):
+        raise SystemExit(f"❌ The {target_name} backend cannot be used as a migration target.")
+    counts = target.import_from(source)
+    target.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--from', dest='source', default='csv', choices=sorted(storage.BACKENDS))
+    parser.add_argument('--to', dest='target', default='sqlite', choices=sorted(storage.BACKENDS))
+    parser.add_argument('--data-dir', default=storage.DATA_DIR)
+    args = parser.parse_args()
+    if args.source == args.target:
+        parser.error("source and target backends must differ")
+
+    counts = migrate(args.source, args.target, args.data_dir)
+    print(f"✅ Migrated {args.source} -> {args.target} in {args.data_dir}:")
+    for table, n in counts.items():
+        print(f"   {table:<10} {n}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+# src/mmap_backend.py
+"""
+Binary product catalog. This is the CSV backend, except that products live
+in data/products.bin, a file of fixed-width records opened with mmap.
+
+    INVENTORY_BACKEND=mmap python src/main.py   # products.bin is built from products.csv on first use
+    python src/mmap_backend.py build            # products.csv -> products.bin (again)
+    python src/mmap_backend.py export           # products.bin -> products.csv
+
+Layout (little-endian): a 64-byte header, then one 160-byte record per slot.
+
+    header   magic | slots in use | layout generation | write count
+    record   stock int64 | live flag | product_id 32 | name 96 | price 16 bytes (UTF-8, NUL padded)
+
+The product_id -> slot index is built once from the records. A stock change
+is then an 8-byte write at a known offset instead of a rewrite of the whole
+catalog. Reading a product unpacks one record instead of parsing a file.
+Stock is the first field and 8-byte aligned, so other terminals read it
+without a lock and always see a whole value.
+
+Names and prices are never rewritten in place. Editing one writes the
+product to a new slot and retires the old one, so a reader sees either the
+old product or the new one, never half of each. Inserts, edits and deletes
+bump the layout generation, which tells other terminals to re-read the
+index. Retired slots are squeezed out once they outnumber the live ones.
+Writers hold the products.bin file lock. Customers, admins, holds and sales
+stay in their CSV files.
+
+Writes go to the page cache. A crashed process loses nothing, but a power
+cut can. Set INVENTORY_MMAP_FSYNC=1 to flush each write's page to disk.
+"""
+import argparse
+import contextlib
+import mmap
+import os
+import struct
+import threading
+from collections.abc import Sequence
+import storage
+from storage import PRODUCT_FIELDS, atomic_write_csv, file_lock, merge_product_feed
+from csv_backend import CsvBackend
+
+MAGIC = b'INVPROD1'
+HEADER = struct.Struct('<8sQQQ32x')        # magic, slots in use, layout generation, write count
+COUNT = struct.Struct('<Q')
+RECORD = struct.Struct('<q?32s96s16s7x')   # stock, live, product_id, name, price
+SLOT_KEY = struct.Struct('<8x?32s119x')    # just live + product_id, for building the index
+STOCK = struct.Struct('<q')
+SLOTS_AT, GENERATION_AT, WRITES_AT = 8, 16, 24
+FIELD_BYTES = {'product_id': 32, 'name': 96, 'price': 16}
+MIN_SLOTS = 1024
+FSYNC = os.environ.get('INVENTORY_MMAP_FSYNC', '') == '1'
+
+
+def _offset(slot):
+    return HEADER.size + slot * RECORD.size
+
+
+def _text(data):
+    return data.rstrip(b'\0').decode('utf-8')
+
+
+def _field(pid, name, value):
+    data = str(value or '').encode('utf-8')
+    if len(data) > FIELD_BYTES[name]:
+        raise ValueError(f"{pid}: {name} is longer than {FIELD_BYTES[name]} bytes")
+    return data
+
+
+def _stock_int(pid, text):
+    text = str(text if text is not None else '').strip()
+    try:
+        return int(text or 0)
+    except ValueError:
+        pass
+    try:
+        return int(float(text))
+    except (ValueError, OverflowError):
+        raise ValueError(f"{pid}: stock {text!r} is not a number") from None
+
+
+def record_values(values):
+    """RECORD fields for a live product, from values in PRODUCT_FIELDS order; ValueError if they do not fit."""
+    pid, name, price, stock = (list(values) + [''] * 4)[:4]
+    if not pid:
+        raise ValueError("product without a product_id")
+    return (_stock_int(pid, stock), True, _field(pid, 'product_id', pid),
+            _field(pid, 'name', name), _field(pid, 'price', price))
+
+
+def _row(mapped, slot):
+    stock, _, pid, name, price = RECORD.unpack_from(mapped, _offset(slot))
+    return {'product_id': _text(pid), 'name': _text(name), 'price': _text(price), 'stock': str(stock)}
+
+
+def write_catalog(filename, rows, generation=0):
+    """
+    Write a fresh catalog file next to `filename` from value lists in
+    PRODUCT_FIELDS order (one per product ID), with some free slots to grow
+    into. Returns the temp path to rename into place.
+    """
+    dirpath = os.path.dirname(filename)
+    if dirpath:
+        os.makedirs(dirpath, exist_ok=True)
+    tmp = f"{filename}.tmp{os.getpid()}.{threading.get_ident()}"
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, 0, generation, 0))
+            count = 0
+            for values in rows:
+                f.write(RECORD.pack(*record_values(values)))
+                count += 1
+            f.truncate(_offset(max(MIN_SLOTS, count + count // 4)))   # free slots read back as zeros
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, count, generation, 0))
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        os.remove(tmp)
+        raise
+    return tmp
+
+
+# ------------------- MAPPED CATALOG ------------------- #
+class BinaryCatalog:
+    """
+    products.bin mapped into memory, with its product_id -> slot index.
+    Offers the same reads as ProductCatalog; writes go through writing().
+    """
+
+    def __init__(self, filename, initial_rows=None):
+        self.filename = filename
+        self.initial_rows = initial_rows   # called for the first products when the file does not exist yet
+        self.hits = 0
+        self.misses = 0
+        self.index = {}     # product_id -> slot, in slot order
+        self.retired = 0
+        self._map = None
+        self._ino = None
+        self._generation = None
+        self._slots = 0
+        self._lock = threading.RLock()
+
+    # ------------------- MAPPING ------------------- #
+    def _create(self):
+        with file_lock(self.filename):
+            if not os.path.exists(self.filename):
+                rows = self.initial_rows() if self.initial_rows else ()
+                os.replace(write_catalog(self.filename, rows), self.filename)
+
+    def _open(self):
+        """Map the file as it is now. Old maps are left to close once no row view uses them."""
+        with open(self.filename, 'r+b') as f:
+            ino = os.fstat(f.fileno()).st_ino
+            mapped = mmap.mmap(f.fileno(), 0)
+        if mapped[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.filename} is not a product catalog file")
+        if ino != self._ino:
+            self._generation = None   # a different file: read its slots again
+        self._map, self._ino = mapped, ino
+
+    def _sync(self):
+        """Catch up with other terminals: reopen a replaced file, remap a grown one, re-index a changed layout."""
+        try:
+            ino = os.stat(self.filename).st_ino
+        except FileNotFoundError:
+            self._create()
+            ino = None
+        if ino is None or ino != self._ino:
+            self._open()
+        _, slots, generation, _ = HEADER.unpack_from(self._map)
+        if _offset(slots) > len(self._map):
+            self._open()
+        if generation == self._generation:
+            self.hits += 1
+            return
+        self.misses += 1
+        index, retired = {}, 0
+        with memoryview(self._map) as view:
+            for slot, (live, pid) in enumerate(SLOT_KEY.iter_unpack(view[HEADER.size:_offset(slots)])):
+                if live:
+                    index[_text(pid)] = slot
+                else:
+                    retired += 1
+        self.index, self.retired, self._slots, self._generation = index, retired, slots, generation
+
+    def invalidate(self):
+        """Drop the mapping and index so the next access reopens the file."""
+        with self._lock:
+            self._ino = self._generation = None
+
+    # ------------------- READ ------------------- #
+    def signature(self):
+        """(file, layout generation, write count): changes with every write, from any terminal."""
+        with self._lock:
+            self._sync()
+            _, _, generation, writes = HEADER.unpack_from(self._map)
+            return (self._ino, generation, writes)
+
+    def get(self, pid):
+        with self._lock:
+            self._sync()
+            slot = self.index.get(pid)
+            return _row(self._map, slot) if slot is not None else None
+
+    def rows(self):
+        """All products as a read-only sequence of dicts, in slot order, built as they are read."""
+        with self._lock:
+            self._sync()
+            return BinaryRows(self._map, list(self.index.values()))
+
+    def iter_rows(self):
+        return iter(self.rows())
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'products': len(self.index),
+                'slots': self._slots, 'retired_slots': self.retired}
+
+    # ------------------- WRITE ------------------- #
+    @contextlib.contextmanager
+    def writing(self):
+        """Exclusive access for a write, against this process's threads and every other terminal."""
+        with self._lock, file_lock(self.filename):
+            self._sync()
+            yield self
+
+    def _flush(self, offset, length):
+        if FSYNC:
+            start = offset - offset % mmap.ALLOCATIONGRANULARITY
+            self._map.flush(start, offset + length - start)
+
+    def _append(self, record):
+        slot = self._slots
+        if _offset(slot + 1) > len(self._map):
+            capacity = (len(self._map) - HEADER.size) // RECORD.size
+            with open(self.filename, 'r+b') as f:
+                f.truncate(_offset(max(MIN_SLOTS, 2 * capacity)))
+            self._open()   # same file, so the index stays
+        RECORD.pack_into(self._map, _offset(slot), *record)
+        self._flush(_offset(slot), RECORD.size)
+        self.index[_text(record[2])] = slot
+        self._slots = slot + 1
+
+    def _retire(self, pid):
+        slot = self.index.pop(pid)
+        self._map[_offset(slot) + STOCK.size] = 0   # the live flag
+        self._flush(_offset(slot), RECORD.size)
+        self.retired += 1
+
+    def apply(self, changed=(), deleted=()):
+        """
+        Write `changed` rows and delete the `deleted` IDs. Call inside writing().
+        Every row is checked before anything is written. A change to stock
+        alone is written in place; any other change goes to a new slot.
+        Returns [(product_id, old row, new row)] for the product listeners.
+        """
+        records = [record_values([r.get(k, '') for k in PRODUCT_FIELDS]) for r in changed]
+        changes = []
+        moved = False
+        for record in records:
+            pid = _text(record[2])
+            slot = self.index.get(pid)
+            old = _row(self._map, slot) if slot is not None else None
+            if old is not None and (old['name'], old['price']) == (_text(record[3]), _text(record[4])):
+                STOCK.pack_into(self._map, _offset(slot), record[0])
+                self._flush(_offset(slot), STOCK.size)
+            else:
+                if old is not None:
+                    self._retire(pid)
+                self._append(record)
+                moved = True
+            changes.append((pid, old, _row(self._map, self.index[pid])))
+        for pid in deleted:
+            if pid in self.index:
+                old = _row(self._map, self.index[pid])
+                self._retire(pid)
+                moved = True
+                changes.append((pid, old, None))
+        if changes:
+            self._commit(moved)
+        return changes
+
+    def _commit(self, moved):
+        """Publish a write in the header: the slot count first, then the generation other terminals watch."""
+        mapped = self._map
+        if moved:
+            COUNT.pack_into(mapped, SLOTS_AT, self._slots)
+            self._generation = COUNT.unpack_from(mapped, GENERATION_AT)[0] + 1
+            COUNT.pack_into(mapped, GENERATION_AT, self._generation)
+        COUNT.pack_into(mapped, WRITES_AT, COUNT.unpack_from(mapped, WRITES_AT)[0] + 1)
+        self._flush(0, HEADER.size)
+        if self.retired > max(MIN_SLOTS, len(self.index)):
+            try:
+                self.compact()
+            except PermissionError:
+                pass   # Windows will not replace a file another terminal has mapped; try again later
+
+    def replace_all(self, rows):
+        """Swap in a fresh file holding just `rows` (value lists). Call inside writing()."""
+        generation = COUNT.unpack_from(self._map, GENERATION_AT)[0] + 1
+        os.replace(write_catalog(self.filename, rows, generation), self.filename)
+        self._sync()
+
+    def compact(self):
+        """Rewrite the file without its retired slots."""
+        with self.writing():
+            if self.retired:
+                self.replace_all([r[k] for k in PRODUCT_FIELDS] for r in self.rows())
+
+
+class BinaryRows(Sequence):
+    """
+    Read-only list-like view of the products in a mapped catalog, like
+    ProductRows, but nothing is copied up front: rows are unpacked when
+    touched, so stock is read live.
+    """
+
+    def __init__(self, mapped, slots):
+        self._map = mapped
+        self._slots = slots
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [_row(self._map, slot) for slot in self._slots[i]]
+        return _row(self._map, self._slots[i])
+
+    def __iter__(self):
+        mapped = self._map
+        for slot in self._slots:
+            yield _row(mapped, slot)
+
+    def __repr__(self):
+        return f"<BinaryRows: {len(self)} products>"
+
+
+# ------------------- BACKEND ------------------- #
+class MmapBackend(CsvBackend):
+    """The CSV backend with products in data/products.bin instead of products.csv."""
+    name = 'mmap'
+
+    def __init__(self, data_dir):
+        super().__init__(data_dir, journal=False)
+        self.catalog_file = os.path.join(data_dir, 'products.bin')
+        self.catalog = BinaryCatalog(self.catalog_file, lambda: csv_values(data_dir))
+
+    def _mutate(self, compute):
+        """
+        Run `compute()` against the current catalog and write what it returns,
+        under the catalog's exclusive lock. `compute` returns (changed_rows,
+        deleted_ids, result) and may raise to abort.
+        """
+        with self.catalog.writing() as catalog:
+            before = catalog.signature()
+            changed, deleted, result = compute()
+            changes = catalog.apply(changed, deleted)
+            after = catalog.signature()
+        if changes:
+            self._notify_products(changes, before, after)
+        return result
+
+    def field_limits(self):
+        return dict(FIELD_BYTES)
+
+    def names_version(self, version=None):
+        # (file, layout generation): in-place stock writes only move the write count after them
+        return (version or self.products_version())[:2]
+
+    def import_products(self, rows):
+        """
+        Bulk upsert, merged with the current catalog into one freshly written
+        products.bin, in bounded memory (see storage.merge_product_feed).
+        """
+        with self.catalog.writing() as catalog:
+            existing = lambda: ([r[k] for k in PRODUCT_FIELDS] for r in catalog.rows())   # noqa: E731
+            with merge_product_feed(existing, rows, tmp_dir=self.data_dir) as (counts, merged):
+                if not counts['received']:
+                    return {'inserted': 0, 'updated': 0}
+                catalog.replace_all(merged)
+        self._notify_products(None)
+        return {'inserted': counts['inserted'], 'updated': counts['received'] - counts['inserted']}
+
+    def import_from(self, source):
+        """
+        Build products.bin from the CSV backend's products (migrate.py --to mmap).
+        Everything else already is the CSV backend's, so it stays where it is.
+        """
+        if not isinstance(source, CsvBackend) or os.path.abspath(source.data_dir) != os.path.abspath(self.data_dir):
+            raise ValueError("the mmap backend can only be built from the CSV data in the same directory")
+        with file_lock(self.catalog_file):
+            rows = ([r[k] for k in PRODUCT_FIELDS] for r in source.iter_products())
+            os.replace(write_catalog(self.catalog_file, rows), self.catalog_file)
+        self.catalog.invalidate()
+        self._notify_products(None)
+        return {'products': len(self.list_products())}
+
+    def compact(self):
+        self.catalog.compact()
+
+
+# ------------------- CONVERSION ------------------- #
+def csv_values(data_dir):
+    """The CSV backend's products (journal included in journal mode) as value lists."""
+    return ([r[k] for k in PRODUCT_FIELDS] for r in CsvBackend(data_dir).iter_products())
+
+
+def build(data_dir):
+    """products.csv -> products.bin, replacing it. Returns the number of products."""
+    return MmapBackend(data_dir).import_from(CsvBackend(data_dir))['products']
+
+
+def export(data_dir):
+    """products.bin -> products.csv, replacing it. Returns the number of products."""
+    backend = MmapBackend(data_dir)
+    with backend.catalog.writing() as catalog:
+        rows = catalog.rows()
+        atomic_write_csv(backend.products_file, PRODUCT_FIELDS, rows)
+        return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['build', 'export'])
+    parser.add_argument('--data-dir', default=storage.DATA_DIR)
+    args = parser.parse_args()
+    try:
+        if args.command == 'build':
+            print(f"✅ {build(args.data_dir)} products written to products.bin")
+        else:
+            print(f"✅ {export(args.data_dir)} products written to products.csv")
+    except ValueError as exc:
+        raise SystemExit(f"❌ {exc}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+# src/orders.py
+"""
+Headless order processing.
+
+    python src/orders.py batch orders.jsonl [--workers 8]
+
+place_order(customer_id, lines) is the single way an order is placed; the
+console checkout and the batch runner both call it. It prices the lines from
+the catalog, takes the stock in one atomic adjustment, logs the sale, issues
+the bill and updates the demand rates (demand.py). It prints nothing and
+returns the whole order as a dict.
+Units held by open carts (see reservations.py) are not sold to anyone else.
+The console holds each cart line with hold_line() and passes its cart_id,
+so the order may use what its own cart holds.
+
+A batch file holds one order per line (JSON lines):
+
+    {"customer_id": "C001", "lines": [["P001", 2], {"product_id": "P002", "qty": 1}]}
+
+Orders run on a thread pool with at most a few orders queued per worker, so
+a file of any size is read as it is processed. Failed orders are skipped
+and written to <file>.failures.csv with their line number and the reason.
+"""
+import argparse
+import concurrent.futures
+import csv
+import datetime
+import json
+import os
+import sys
+import threading
+import time
+from products import find_product, adjust_stock, get_backend, StockError
+from billing import render_bill, queue_bill, wait_for_bills
+from sales import append_sale
+from accounts import customer_exists
+from ids import new_order_id
+import reservations
+from demand import record_sale
+from product_feed import read_feed
+from instrument import timed
+from service import exposed
+
+DEFAULT_WORKERS = 4
+QUEUED_PER_WORKER = 2
+MAX_REPORTED_ERRORS = 20
+FAILURE_FIELDS = ['line', 'customer_id', 'error', 'order']
+
+
+class OrderError(ValueError):
+    """Raised when an order cannot be placed. Nothing has been written."""
+
+
+# ------------------- ORDER LINES ------------------- #
+def normalize_lines(lines):
+    """
+    Accept (product_id, qty) pairs or {'product_id', 'qty'} dicts and return
+    {product_id: qty} in first-seen order, with repeated products added up.
+    """
+    if not lines or isinstance(lines, (str, dict)):
+        raise OrderError("an order needs at least one (product_id, qty) line")
+    merged = {}
+    for line in lines:
+        if isinstance(line, dict):
+            pid, qty = line.get('product_id'), line.get('qty')
+        elif isinstance(line, (list, tuple)) and len(line) == 2:
+            pid, qty = line
+        else:
+            raise OrderError(f"bad order line {line!r}")
+        pid = str(pid or '').strip()
+        if not pid:
+            raise OrderError(f"order line {line!r} has no product_id")
+        if isinstance(qty, str) and qty.strip().isdigit():
+            qty = int(qty)
+        if isinstance(qty, bool) or not isinstance(qty, int) or qty <= 0:
+            raise OrderError(f"{pid}: quantity must be a whole number above zero, got {qty!r}")
+        merged[pid] = merged.get(pid, 0) + qty
+    return merged
+
+
+def price_lines(lines):
+    """Order items [{'product_id', 'name', 'price', 'qty'}] priced from the catalog."""
+    items, missing = [], []
+    for pid, qty in normalize_lines(lines).items():
+        product = find_product(pid)
+        if product is None:
+            missing.append(pid)
+            continue
+        items.append({'product_id': pid, 'name': product['name'], 'price': product['price'], 'qty': qty})
+    if missing:
+        raise OrderError(f"product not found: {', '.join(missing)}")
+    return items
+
+
+def _stock(product):
+    return int(float(product.get('stock') or 0))
+
+
+@exposed('available_to_sell')
+def available_to_sell(pid, cart_id=None):
+    """Stock minus the units held by open carts (other than `cart_id`); None for an unknown product."""
+    product = find_product(pid)
+    if product is None:
+        return None
+    return _stock(product) - reservations.watch(get_backend()).ledger().held_units(pid, cart_id)
+
+
+@exposed('quote')
+def quote(lines, cart_id=None):
+    """
+    Like price_lines, but also fails if a line is more than is available to
+    sell right now (stock not held by other carts). Advisory only:
+    place_order checks again when it takes the stock.
+    """
+    items = price_lines(lines)
+    short = []
+    for it in items:
+        available = available_to_sell(it['product_id'], cart_id)
+        if available < it['qty']:
+            short.append(f"{it['product_id']}: only {available} available, {it['qty']} requested")
+    if short:
+        raise OrderError("; ".join(short))
+    return items
+
+
+# ------------------- CART HOLDS ------------------- #
+@exposed('hold_line', writes=True)
+def hold_line(cart_id, pid, qty, seconds=None):
+    """
+    Hold `qty` units of a product for a cart, replacing the cart's earlier
+    hold on it; qty 0 releases it. The hold lasts `seconds` (default
+    reservations.HOLD_SECONDS). Returns the priced item with its 'expires'
+    time, or None once released. Raises OrderError if that many units are
+    not available to sell.
+    """
+    monitor = reservations.watch(get_backend())
+    if str(qty).strip() == '0':
+        with monitor.locked():
+            monitor.put([(cart_id, str(pid).strip(), 0)])
+        return None
+    item, = price_lines([(pid, qty)])
+    with monitor.locked() as ledger:
+        available = _stock(find_product(item['product_id'])) - ledger.held_units(item['product_id'], cart_id)
+        if item['qty'] > available:
+            raise OrderError(f"{item['product_id']}: only {max(available, 0)} available, {item['qty']} requested")
+        item['expires'] = monitor.put([(cart_id, item['product_id'], item['qty'])], seconds)
+    return item
+
+
+@exposed('release_cart', writes=True)
+def release_cart(cart_id):
+    """Give back everything a cart holds (e.g. the customer left without checking out)."""
+    monitor = reservations.watch(get_backend())
+    with monitor.locked():
+        monitor.release_cart(cart_id)
+
+
+@exposed('cart_holds')
+def cart_holds(cart_id):
+    """{product_id: qty} currently held for a cart (expired holds are gone)."""
+    return reservations.watch(get_backend()).ledger().cart(cart_id)
+
+
+def order_total(items):
+    return round(sum(float(it['price']) * it['qty'] for it in items), 2)
+
+
+# ------------------- PLACE ORDER ------------------- #
+@exposed('place_order', writes=True)
+@timed('orders.place_order')
+def place_order(customer_id, lines=None, cart_id=None):
+    """
+    Place one order for `customer_id`. Returns a dict with the order
+    ('order_id', 'customer_id', 'date', 'items', 'total'), the issued 'bill'
+    (see billing.render_bill), 'stock_changes' (product_id -> delta) and
+    'stock' (product_id -> new stock). Raises OrderError if the customer or a
+    product is unknown, a line is malformed, there is not enough stock or
+    the sale cannot be logged; in that case no stock is taken (it is put
+    back if the log fails) and nothing is billed.
+    The bill is rendered before the stock is taken and queued for the
+    archive only once the sale is logged, so a logged sale is the point of
+    no return: every unit taken is explained by a sale row.
+    With `cart_id`, units that cart holds count as available to this order
+    and its holds are released once the sale is logged; without `lines`,
+    the order is whatever the cart holds.
+    The holds lock is taken only to check lines whose products other carts
+    hold, and to release the cart. The stock itself is taken by
+    adjust_stock, which never oversells, so orders for products nobody
+    holds run in parallel across terminals.
+    """
+    customer_id = str(customer_id or '').strip()
+    if not customer_id or not customer_exists(customer_id):
+        raise OrderError(f"unknown customer {customer_id!r}")
+    monitor = reservations.watch(get_backend())
+    ledger = monitor.ledger()
+    items = price_lines(list(ledger.cart(cart_id).items()) if lines is None and cart_id else lines)
+    if any(ledger.held_units(it['product_id'], cart_id) for it in items):
+        # other carts hold some of these products: check what they leave for this order under the holds lock
+        with monitor.locked() as ledger:
+            short = []
+            for it in items:
+                held = ledger.held_units(it['product_id'], cart_id)
+                available = _stock(find_product(it['product_id'])) - held if held else None
+                if available is not None and available < it['qty']:
+                    short.append(f"{it['product_id']}: only {max(available, 0)} available "
+                                 f"({held} held in other carts), {it['qty']} requested")
+        if short:
+            raise OrderError("stock unchanged: " + "; ".join(short))
+    total = order_total(items)
+    order_id = new_order_id()
+    today = datetime.date.today()
+    bill = render_bill(order_id, items, total, user_id=customer_id)
+    changes = {it['product_id']: -it['qty'] for it in items}
+    try:
+        stock = adjust_stock(changes)   # refuses, atomically, to take more than is in stock
+    except StockError as exc:
+        raise OrderError(f"stock unchanged: {exc}") from exc
+
+    try:
+        append_sale(order_id, customer_id, today, total, items)
+    except Exception as exc:
+        adjust_stock({pid: -delta for pid, delta in changes.items()})   # nothing records this order
+        raise OrderError(f"stock unchanged: the sale could not be logged ({exc})") from exc
+    if cart_id and monitor.ledger().cart(cart_id):
+        with monitor.locked():
+            monitor.release_cart(cart_id)
+    queue_bill(bill, items, total)
+    record_sale(today, items)
+    return {'order_id': order_id, 'customer_id': customer_id, 'date': today, 'items': items,
+            'total': total, 'bill': bill, 'stock_changes': changes, 'stock': stock}
+
+
+# ------------------- BATCH ------------------- #
+def _place_raw(raw):
+    if not isinstance(raw, dict):
+        raise OrderError("not an object")
+    if '__error__' in raw:
+        raise OrderError(raw['__error__'])
+    return place_order(raw.get('customer_id'), raw.get('lines'))
+
+
+def run_batch(path, workers=DEFAULT_WORKERS, failures_path=None):
+    """
+    Place every order in a JSON-lines file on `workers` threads.
+    Returns counts (read, placed, failed), revenue, the first few errors as
+    (line, reason), the failures file (if any), elapsed seconds and orders/sec.
+    """
+    failures_path = failures_path or path + '.failures.csv'
+    result = {'read': 0, 'placed': 0, 'failed': 0, 'revenue': 0.0, 'errors': [], 'failures_file': None}
+    if os.path.exists(failures_path):
+        os.remove(failures_path)   # left over from an earlier run of the same file
+    lock = threading.Lock()
+    slots = threading.BoundedSemaphore(workers * QUEUED_PER_WORKER)
+    failures = {'file': None, 'writer': None}
+
+    def fail(line_no, raw, reason):
+        result['failed'] += 1
+        if len(result['errors']) < MAX_REPORTED_ERRORS:
+            result['errors'].append((line_no, reason))
+        if failures['writer'] is None:
+            failures['file'] = open(failures_path, 'w', newline='', encoding='utf-8')
+            failures['writer'] = csv.DictWriter(failures['file'], fieldnames=FAILURE_FIELDS)
+            failures['writer'].writeheader()
+        if isinstance(raw, dict) and '__error__' in raw:
+            raw = raw['values']   # what was actually in the file
+        failures['writer'].writerow({'line': line_no, 'error': reason,
+                                     'customer_id': raw.get('customer_id', '') if isinstance(raw, dict) else '',
+                                     'order': json.dumps(raw, ensure_ascii=False, default=str)})
+
+    def done(line_no, raw, future):
+        slots.release()
+        exc = future.exception()
+        with lock:
+            if exc is None:
+                result['placed'] += 1
+                result['revenue'] += future.result()['total']
+            elif isinstance(exc, OrderError):
+                fail(line_no, raw, str(exc))
+            else:
+                fail(line_no, raw, f"{type(exc).__name__}: {exc}")
+
+    started = time.perf_counter()
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='order') as pool:
+            for line_no, raw in read_feed(path, fmt='jsonl'):
+                result['read'] += 1
+                slots.acquire()
+                future = pool.submit(_place_raw, raw)
+                future.add_done_callback(lambda f, n=line_no, r=raw: done(n, r, f))
+        wait_for_bills()
+    finally:
+        if failures['file'] is not None:
+            failures['file'].close()
+            result['failures_file'] = failures_path
+    seconds = time.perf_counter() - started
+    result['revenue'] = round(result['revenue'], 2)
+    result['seconds'] = round(seconds, 3)
+    result['orders_per_sec'] = round(result['placed'] / seconds, 1) if seconds else 0.0
+    return result
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='python src/orders.py', description="Place orders without the console menu.")
+    commands = parser.add_subparsers(dest='command')
+    batch = commands.add_parser('batch', help="place every order in a JSON-lines file")
+    batch.add_argument('file')
+    batch.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="orders placed at once")
+    args = parser.parse_args(argv)
+    if args.command != 'batch':
+        parser.print_help()
+        return 2
+
+    result = run_batch(args.file, workers=max(1, args.workers))
+    print(f"✅ Placed {result['placed']} of {result['read']} orders in {result['seconds']}s "
+          f"({result['orders_per_sec']} orders/sec, ₹{result['revenue']})")
+    if result['failed']:
+        print(f"⚠️ {result['failed']} orders failed, see {result['failures_file']}")
+        for line_no, reason in result['errors']:
+            print(f"   line {line_no}: {reason}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
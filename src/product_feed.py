@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# src/product_feed.py
+"""
+Bulk product import/export for supplier feeds.
+
+    python src/product_feed.py import feed.csv       # or feed.jsonl
+    python src/product_feed.py export products.jsonl
+
+Feeds are CSV with a product_id,name,price,stock header, or JSON lines with
+one object per product. The format is picked from the file extension.
+Rows are streamed and validated one at a time. Good rows are upserted by
+product_id with a single write of the catalog. Bad rows are skipped and
+written to <feed>.rejects.csv with their line number and the reason.
+"""
+import csv
+import json
+import math
+import os
+import sys
+import time
+from storage import get_backend, write_csv_temp, field_limit_error
+from products import FIELDS
+
+JSONL_EXTENSIONS = ('.jsonl', '.ndjson', '.json')
+MAX_REPORTED_ERRORS = 20
+REJECT_FIELDS = ['line', 'error', 'row']
+_FIELD_SET = frozenset(FIELDS)
+
+
+def feed_format(path, fmt=None):
+    if fmt:
+        return fmt
+    return 'jsonl' if path.lower().endswith(JSONL_EXTENSIONS) else 'csv'
+
+
+# ------------------- READ & VALIDATE ------------------- #
+def read_feed(path, fmt=None):
+    """Yield (line number, raw row) from a CSV or JSON-lines feed without loading it whole."""
+    with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+        if feed_format(path, fmt) == 'csv':
+            reader = csv.reader(f)
+            header = [h.strip() for h in next(reader, [])]
+            for values in reader:
+                if len(values) == len(header):
+                    yield reader.line_num, dict(zip(header, values))
+                elif values:
+                    yield reader.line_num, {'__error__': f"expected {len(header)} values, got {len(values)}",
+                                            'values': values}
+            return
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                row = {'__error__': f"invalid JSON: {exc}", 'values': line.rstrip('\r\n')}
+            yield line_no, row
+
+
+def validate_product(raw, limits=None):
+    """
+    Check one feed row against products.FIELDS and the catalog's field
+    `limits` (see Backend.field_limits). Returns (clean row of strings,
+    None) or (None, reason).
+    """
+    if not isinstance(raw, dict):
+        return None, "not an object"
+    if raw.keys() != _FIELD_SET:
+        if '__error__' in raw:
+            return None, raw['__error__']
+        extra = [str(k) for k in raw if k not in _FIELD_SET]
+        if extra:
+            return None, f"unknown field(s): {', '.join(extra)}"
+        return None, f"missing {', '.join(k for k in FIELDS if k not in raw)}"
+
+    row = {k: str(raw[k]).strip() for k in FIELDS}
+    blank = [k for k in FIELDS if not row[k]]
+    if blank:
+        return None, f"missing {', '.join(blank)}"
+    try:
+        price = float(row['price'])
+    except ValueError:
+        return None, f"price {row['price']!r} is not a number"
+    if not 0 <= price < math.inf:
+        return None, f"price {row['price']!r} must be zero or more"
+    stock = row['stock']
+    if not stock.isdigit():
+        try:
+            value = float(stock)
+        except ValueError:
+            return None, f"stock {stock!r} is not a number"
+        if not value.is_integer() or value < 0:
+            return None, f"stock {stock!r} must be a whole number, zero or more"
+        stock = value
+    row['stock'] = str(int(stock))
+    reason = field_limit_error(row, limits or {})
+    if reason:
+        return None, reason
+    return row, None
+
+
+# ------------------- IMPORT ------------------- #
+def import_feed(path, fmt=None, rejects_path=None):
+    """
+    Upsert every valid row of a feed into the catalog.
+    Returns counts (read, accepted, rejected, inserted, updated), the first
+    few errors as (line, reason), the rejects file (if any) and elapsed seconds.
+    """
+    rejects_path = rejects_path or path + '.rejects.csv'
+    result = {'read': 0, 'accepted': 0, 'rejected': 0, 'errors': [], 'rejects_file': None}
+    started = time.perf_counter()
+    rejects = {'file': None, 'writer': None}
+    if os.path.exists(rejects_path):
+        os.remove(rejects_path)   # left over from an earlier run of the same feed
+
+    def reject(line_no, raw, reason):
+        result['rejected'] += 1
+        if len(result['errors']) < MAX_REPORTED_ERRORS:
+            result['errors'].append((line_no, reason))
+        if rejects['writer'] is None:
+            rejects['file'] = open(rejects_path, 'w', newline='', encoding='utf-8')
+            rejects['writer'] = csv.DictWriter(rejects['file'], fieldnames=REJECT_FIELDS)
+            rejects['writer'].writeheader()
+        if isinstance(raw, dict) and '__error__' in raw:
+            raw = raw['values']   # what was actually in the feed
+        rejects['writer'].writerow({'line': line_no, 'error': reason,
+                                    'row': json.dumps(raw, ensure_ascii=False, default=str)})
+
+    backend = get_backend()
+    limits = backend.field_limits()
+
+    def accepted_rows():
+        for line_no, raw in read_feed(path, fmt):
+            result['read'] += 1
+            row, reason = validate_product(raw, limits)
+            if reason:
+                reject(line_no, raw, reason)
+                continue
+            result['accepted'] += 1
+            yield row
+
+    try:
+        result.update(backend.import_products(accepted_rows()))
+    finally:
+        if rejects['file'] is not None:
+            rejects['file'].close()
+            result['rejects_file'] = rejects_path
+    result['seconds'] = round(time.perf_counter() - started, 3)
+    return result
+
+
+# ------------------- EXPORT ------------------- #
+def export_feed(path, fmt=None):
+    """Write the whole catalog to a CSV or JSON-lines file, row by row. Returns the row count."""
+    count = [0]
+
+    def rows():
+        for row in get_backend().iter_products():
+            count[0] += 1
+            yield {k: row.get(k, '') for k in FIELDS}
+
+    if feed_format(path, fmt) == 'csv':
+        tmp = write_csv_temp(path, FIELDS, rows())
+    else:
+        dirpath = os.path.dirname(path)
+        if dirpath:
+            os.makedirs(dirpath, exist_ok=True)
+        tmp = f"{path}.tmp{os.getpid()}"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            for row in rows():
+                f.write(json.dumps(row, ensure_ascii=False) + '\n')
+    os.replace(tmp, path)
+    return count[0]
+
+
+def main(argv):
+    if len(argv) != 2 or argv[0] not in ('import', 'export'):
+        print("usage: python src/product_feed.py import|export FILE(.csv|.jsonl)")
+        return 2
+    command, path = argv
+    if command == 'export':
+        print(f"✅ Exported {export_feed(path)} products to {path}")
+        return 0
+    result = import_feed(path)
+    print(f"✅ Imported {result['accepted']} of {result['read']} rows in {result['seconds']}s "
+          f"({result['inserted']} new, {result['updated']} updated)")
+    if result['rejected']:
+        print(f"⚠️ {result['rejected']} rows rejected, see {result['rejects_file']}")
+        for line_no, reason in result['errors']:
+            print(f"   line {line_no}: {reason}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# src/product_table.py
+"""
+Column-oriented, in-memory product store used by the CSV catalog cache.
+
+Instead of one dict of four strings per product, products are kept column
+by column:
+
+    ids      list of product_id strings (+ a dict index to their position)
+    names    list of interned name strings (repeated names share one object)
+    cents    array('q') of prices as fixed-point integers (hundredths)
+    places   array('b') of decimal places the price was written with
+    stock    array('q') of stock levels
+
+so a million products cost tens of MB rather than hundreds. Rows are still
+handed out as plain dicts of strings, built on demand, and write back exactly
+as they were read ("5", "5.0" and "5.00" all round-trip). Values that are not
+plain numbers (a blank stock, a price like "1.999") are kept verbatim in a
+small side table.
+"""
+import array
+import sys
+from collections.abc import Sequence
+from storage import PRODUCT_FIELDS
+
+_TEXT = -1   # `places` marker: the price is only held as text
+
+
+def _plain_int(text, max_digits):
+    """True for ASCII digits without leading zeros that fit comfortably in 64 bits."""
+    return (text.isdigit() and text.isascii() and len(text) <= max_digits
+            and (text[0] != '0' or text == '0'))
+
+
+def parse_price(text):
+    """
+    '12.5' -> (1250, 1). None unless the text is a plain non-negative amount
+    with at most 2 decimals that format_price would write back identically.
+    """
+    whole, dot, frac = text.partition('.')
+    if not _plain_int(whole, 15) or len(frac) > 2 or (dot and not (frac.isdigit() and frac.isascii())):
+        return None
+    return int(whole) * 100 + int(frac.ljust(2, '0')), len(frac)
+
+
+def format_price(cents, places):
+    if places == 0:
+        return str(cents // 100)
+    text = f"{cents // 100}.{cents % 100:02d}"
+    return text[:-1] if places == 1 else text
+
+
+class ProductTable:
+    """Products in column arrays, in file order, indexed by product_id."""
+
+    def __init__(self):
+        self.ids = []
+        self.names = []
+        self.cents = array.array('q')
+        self.places = array.array('b')
+        self.stock = array.array('q')
+        self.index = {}
+        self._price_text = {}   # position -> price string that is not a plain amount
+        self._stock_text = {}   # position -> stock string that is not a plain integer
+
+    @classmethod
+    def from_values(cls, rows):
+        """Build from value lists in PRODUCT_FIELDS order (e.g. storage.iter_csv_values)."""
+        table = cls()
+        for values in rows:
+            table.upsert_values(values)
+        return table
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build from dict rows."""
+        return cls.from_values([r.get(k, '') for k in PRODUCT_FIELDS] for r in rows)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, pid):
+        return pid in self.index
+
+    # ------------------- WRITE ------------------- #
+    def upsert_values(self, values):
+        if len(values) != 4:
+            values = (list(values) + [''] * 4)[:4]
+        pid, name, price, stock = values
+        name, price, stock = sys.intern(name or ''), price or '', stock or ''
+        parsed = parse_price(price)
+        cents, places = parsed if parsed is not None else (0, _TEXT)
+        plain_stock = _plain_int(stock, 18)
+        count = int(stock) if plain_stock else 0
+
+        pos = self.index.get(pid)
+        if pos is None:
+            pos = self.index[pid] = len(self.ids)
+            self.ids.append(pid)
+            self.names.append(name)
+            self.cents.append(cents)
+            self.places.append(places)
+            self.stock.append(count)
+        else:
+            self.names[pos], self.cents[pos], self.places[pos], self.stock[pos] = name, cents, places, count
+            self._price_text.pop(pos, None)
+            self._stock_text.pop(pos, None)
+        if parsed is None:
+            self._price_text[pos] = price
+        if not plain_stock:
+            self._stock_text[pos] = stock
+
+    def upsert(self, row):
+        self.upsert_values([row.get(k, '') for k in PRODUCT_FIELDS])
+
+    def without(self, pids):
+        """A new table minus `pids` (deletes rebuild, so open views keep their snapshot)."""
+        gone = set(pids)
+        return ProductTable.from_values(v for v in self.iter_values() if v[0] not in gone)
+
+    # ------------------- READ ------------------- #
+    def price_text(self, pos):
+        places = self.places[pos]
+        if places == _TEXT:
+            return self._price_text[pos]
+        return format_price(self.cents[pos], places)
+
+    def stock_text(self, pos):
+        text = self._stock_text.get(pos)
+        return str(self.stock[pos]) if text is None else text
+
+    def values(self, pos):
+        return [self.ids[pos], self.names[pos], self.price_text(pos), self.stock_text(pos)]
+
+    def row(self, pos, stock=None, stock_text=None):
+        """One product as a dict; a ProductRows snapshot passes its own stock column."""
+        places = self.places[pos]
+        if places == 2:   # the common case, inlined: lookups build one of these per call
+            whole, frac = divmod(self.cents[pos], 100)
+            price = f"{whole}.{frac:02d}"
+        elif places == _TEXT:
+            price = self._price_text[pos]
+        else:
+            price = format_price(self.cents[pos], places)
+        if stock is None:
+            stock, stock_text = self.stock, self._stock_text
+        text = stock_text.get(pos) if stock_text else None
+        return {'product_id': self.ids[pos], 'name': self.names[pos], 'price': price,
+                'stock': str(stock[pos]) if text is None else text}
+
+    def get(self, pid):
+        pos = self.index.get(pid)
+        return self.row(pos) if pos is not None else None
+
+    def iter_values(self):
+        for pos in range(len(self.ids)):
+            yield self.values(pos)
+
+    def stock_of(self, pid):
+        """Stock as an int without building a row (None for an unknown product)."""
+        pos = self.index.get(pid)
+        if pos is None:
+            return None
+        text = self._stock_text.get(pos)
+        if text is None:
+            return self.stock[pos]
+        try:
+            return int(float(text or 0))
+        except ValueError:
+            return 0
+
+    def nbytes(self):
+        """Approximate memory held by the table, including the strings."""
+        size = sum(sys.getsizeof(c) for c in (self.ids, self.names, self.cents, self.places,
+                                                self.stock, self.index))
+        size += sum(sys.getsizeof(s) for s in self.ids)
+        size += sum(sys.getsizeof(s) for s in {id(n): n for n in self.names}.values())
+        return size
+
+
+class ProductRows(Sequence):
+    """
+    Read-only list-like view of a ProductTable: len(), indexing, slicing and
+    iteration all work, and each row is built as a fresh dict when it is
+    touched, so listing the catalog never copies the rows.
+
+    The row count and the stock column are copied when the view is made
+    (under a millisecond at a million products), so checkouts that update
+    stock in place, or add products, after that do not show through. Names
+    and prices are read live: an admin's edit to one made while the view is
+    open does show. Deletes replace the whole table, so they never do.
+    """
+
+    def __init__(self, table):
+        self._table = table
+        self._len = len(table)
+        self._stock = array.array('q', table.stock)
+        self._stock_text = dict(table._stock_text)
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._table.row(pos, self._stock, self._stock_text) for pos in range(self._len)[i]]
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError('product index out of range')
+        return self._table.row(i, self._stock, self._stock_text)
+
+    def __iter__(self):
+        table, stock, stock_text = self._table, self._stock, self._stock_text
+        for pos in range(self._len):
+            yield table.row(pos, stock, stock_text)
+
+    def __repr__(self):
+        return f"<ProductRows: {len(self)} products>"
@@ -1,34 +1,164 @@
 #!/usr/bin/env python3
 # src/products.py
-import os
-from storage import read_csv, write_csv
+from storage import StockError, PRODUCT_FIELDS
+import storage
+import low_stock
+import search
+from instrument import timed
+from service import exposed
 
-BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-DATA_DIR = os.path.join(BASE_DIR, 'data')
-PRODUCTS_FILE = os.path.join(DATA_DIR, 'products.csv')
-FIELDS = ['product_id','name','price','stock']
+FIELDS = PRODUCT_FIELDS
 
+__all__ = ['FIELDS', 'StockError', 'list_products', 'find_product', 'add_product', 'save_product',
+           'remove_product', 'update_stock', 'adjust_stock', 'field_limits', 'catalog_stats', 'invalidate_catalog',
+           'compact_journal', 'low_stock_items', 'invalid_stock_ids', 'reorder_level', 'set_reorder_level',
+           'recent_low_stock_events', 'search_products', 'iter_search_results']
 
+
+def get_backend():
+    """The storage backend, with the low-stock and name-search indexes attached so every write keeps them current."""
+    backend = storage.get_backend()
+    low_stock.watch(backend)
+    search.watch(backend)
+    return backend
+
+
+@exposed('list_products')
+@timed('products.list_products')
 def list_products():
-    return read_csv(PRODUCTS_FILE)
+    return get_backend().list_products()
 
 
+@exposed('find_product')
+@timed('products.find_product')
 def find_product(pid):
-    for p in list_products():
-        if p.get('product_id') == pid:
-            return p
-    return None
+    return get_backend().get_product(pid)
 
 
+@exposed('add_product', writes=True)
+@timed('products.add_product')
 def add_product(product):
-    rows = list_products()
-    rows.append(product)
-    write_csv(PRODUCTS_FILE, FIELDS, rows)
+    get_backend().upsert_products([product])
+
 
+@exposed('save_product', writes=True)
+@timed('products.save_product')
+def save_product(product):
+    """Insert or replace a product row, matched on product_id."""
+    get_backend().upsert_products([product])
 
+
+@exposed('remove_product', writes=True)
+@timed('products.remove_product')
+def remove_product(pid):
+    """Delete a product. Returns False if it did not exist."""
+    return get_backend().delete_product(pid)
+
+
+@exposed('update_stock', writes=True)
+@timed('products.update_stock')
 def update_stock(pid, new_stock):
-    rows = list_products()
-    for r in rows:
-        if r.get('product_id') == pid:
-            r['stock'] = str(new_stock)
-    write_csv(PRODUCTS_FILE, FIELDS, rows)
+    get_backend().set_stock(pid, new_stock)
+
+
+@exposed('adjust_stock', writes=True)
+@timed('products.adjust_stock')
+def adjust_stock(changes):
+    """
+    Apply several stock changes as one atomic update.
+    `changes` maps product_id -> signed quantity delta (negative for a sale).
+    Every line is validated before anything is written, so either the whole
+    batch is applied or StockError is raised and the catalog is untouched.
+    Concurrent terminals never overwrite each other's changes.
+    Returns a dict of product_id -> new stock.
+    """
+    if not changes:
+        return {}
+    return get_backend().adjust_stock(changes)
+
+
+@exposed('field_limits')
+def field_limits():
+    """Most UTF-8 bytes each product field can hold in this catalog ({} = no limit)."""
+    return get_backend().field_limits()
+
+
+@timed('products.catalog_stats')
+def catalog_stats():
+    """Cache hit/miss counters (CSV backend) and product count."""
+    return get_backend().catalog_stats()
+
+
+@timed('products.invalidate_catalog')
+def invalidate_catalog():
+    get_backend().invalidate()
+
+
+@timed('products.compact_journal')
+def compact_journal():
+    """Fold any journalled changes into products.csv (no-op outside journal mode)."""
+    get_backend().compact()
+
+
+# ------------------- LOW STOCK ------------------- #
+@exposed('low_stock_items')
+@timed('products.low_stock_items')
+def low_stock_items(threshold=None):
+    """
+    Products running low, lowest first, read from the low-stock index.
+    With a threshold: [(product_id, stock)] for stock < threshold.
+    Without: [(product_id, stock, reorder level)] for stock below each product's own reorder level.
+    """
+    index = low_stock.watch(get_backend()).index()
+    return index.below(threshold) if threshold is not None else index.below_reorder_level()
+
+
+@exposed('invalid_stock_ids')
+@timed('products.invalid_stock_ids')
+def invalid_stock_ids():
+    """Products left out of the low-stock index because their stock could not be parsed."""
+    return list(low_stock.watch(get_backend()).index().invalid)
+
+
+@exposed('reorder_level')
+@timed('products.reorder_level')
+def reorder_level(pid):
+    return low_stock.watch(get_backend()).levels().get(pid, low_stock.DEFAULT_REORDER_LEVEL)
+
+
+@exposed('set_reorder_level', writes=True)
+@timed('products.set_reorder_level')
+def set_reorder_level(pid, level):
+    """Set a product's reorder level (None restores the default)."""
+    low_stock.watch(get_backend()).set_level(pid, level)
+
+
+@exposed('recent_low_stock_events')
+@timed('products.recent_low_stock_events')
+def recent_low_stock_events(count=10):
+    return low_stock.watch(get_backend()).recent_events(count)
+
+
+# ------------------- NAME SEARCH ------------------- #
+@exposed('search_products')
+@timed('products.search_products')
+def search_products(query, offset=0, limit=search.PAGE_SIZE):
+    """
+    Products whose name has words starting with each word of `query` (or
+    whose ID is `query`), best match first. Returns (total matches,
+    [product rows]) for the `limit` results after the first `offset`.
+    """
+    backend = get_backend()
+    total, pids = search.watch(backend).search(query, offset, limit)
+    rows = (backend.get_product(pid) for pid in pids)
+    return total, [row for row in rows if row is not None]
+
+
+def iter_search_results(query, offset=0, page_size=search.PAGE_SIZE):
+    """Every match for `query` from `offset` on, best first, fetched a page at a time."""
+    while True:
+        total, rows = search_products(query, offset, page_size)
+        yield from rows
+        offset += page_size
+        if offset >= total:
+            return
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# src/reports.py
+"""
+Streaming report pipeline.
+
+A sales report's figures come from the daily rollups (sales.summarize), so
+they cost one row per day. Its order list is a single generator stream,
+so only the row being written is in memory, however long the date range:
+
+    iter_sales -> write_report_csv
+
+The backend already selects the rows by comparing ISO date strings, so
+rows are written as they arrive, with no per-row date parsing or second
+filter. The TOTAL SALES row (from the rollups) is appended once the stream
+is exhausted. The console then pages through the finished file.
+"""
+import csv
+import datetime
+import os
+from storage import SALES_FIELDS
+from sales import iter_sales, summarize
+
+PAGE_SIZE = 20
+
+
+# ------------------- PIPELINE ------------------- #
+def write_report_csv(rows, report_file, total):
+    """
+    Write `rows` to `report_file` as they arrive, then the TOTAL SALES row.
+    The file is only created once there is a row to write. Returns the
+    number of rows written.
+    """
+    f = None
+    count = 0
+    try:
+        for row in rows:
+            if f is None:
+                os.makedirs(os.path.dirname(report_file) or '.', exist_ok=True)
+                f = open(report_file, 'w', newline='', encoding='utf-8')
+                writer = csv.DictWriter(f, fieldnames=SALES_FIELDS, extrasaction='ignore')
+                writer.writeheader()
+            writer.writerow(row)
+            count += 1
+        if f is not None:
+            writer.writerow({})
+            writer.writerow({'order_id': 'TOTAL SALES', 'total': total})
+    finally:
+        if f is not None:
+            f.close()
+    return count
+
+
+def sales_report_csv(start_date, end_date, report_file, summary=None):
+    """
+    Write a date range's orders to `report_file`, totalled from the rollups.
+    Returns `summary` (sales.summarize for the range, computed if not given)
+    with 'written': the rows in the file (0: no file was written).
+    """
+    summary = summary if summary is not None else summarize(start_date, end_date)
+    summary['written'] = write_report_csv(iter_sales(start_date, end_date), report_file, summary['revenue'])
+    return summary
+
+
+# ------------------- CONSOLE VIEW ------------------- #
+def iter_report_rows(report_file):
+    """Read a written report back lazily, without its summary rows."""
+    with open(report_file, 'r', newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            if not row.get('order_id') or row['order_id'] == 'TOTAL SALES':
+                continue
+            yield row
+
+
+def paginate(rows, format_row, page_size=PAGE_SIZE, prompt="-- Enter for more, q to stop -- "):
+    """Print rows a page at a time, asking before each further page."""
+    count = 0
+    for row in rows:
+        if count and count % page_size == 0 and input(prompt).strip().lower() == 'q':
+            return count
+        print(format_row(row))
+        count += 1
+    return count
+
+
+def report_filename(folder, prefix='report'):
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.join(folder, f"{prefix}_{timestamp}.csv")
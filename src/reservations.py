@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# src/reservations.py
+"""
+Stock holds for open carts: adding to a cart holds the units for
+HOLD_SECONDS (INVENTORY_HOLD_SECONDS, default 15 minutes), so another
+terminal cannot sell them in the meantime. Changing the cart moves the
+hold, and checkout turns the cart's holds into the sale.
+
+The ledger keeps the units held per product in a dict, so available to
+sell (stock minus held) is one lookup. Expiry is lazy: holds sit in a heap
+ordered by expiry time, and each look at the ledger pops the ones whose
+time is up. Renewed or released holds leave their old heap entry behind,
+which is skipped when it comes up.
+
+Holds are stored by the backend (holds.csv, or the holds table), so every
+terminal sees them. Changes, and the checks that decide them, happen under
+backend.holds_lock(). Checkout takes that lock only for products some other
+cart holds (see orders.place_order).
+Like the low-stock index, the ledger is kept current from its own writes
+and rebuilt only when holds_version() shows another terminal changed the
+holds.
+"""
+import contextlib
+import heapq
+import os
+import threading
+import time
+
+HOLD_SECONDS = int(os.environ.get('INVENTORY_HOLD_SECONDS', '0')) or 15 * 60
+PURGE_EVERY = 1000   # hold writes between clearing released / expired rows out of storage
+
+_monitors = {}
+
+
+def hold_id(cart_id, pid):
+    return f"{cart_id}:{pid}"
+
+
+class HoldLedger:
+    """Live holds by cart, units held per product and the expiry queue."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.version = None
+        self.held = {}       # product_id -> units held
+        self.carts = {}      # cart_id -> {product_id: (qty, expires)}
+        self._expiry = []    # heap of (expires, cart_id, product_id), stale entries included
+
+    def rebuild(self):
+        self.version = self.backend.holds_version()
+        self.held, self.carts, self._expiry = {}, {}, []
+        for row in self.backend.list_holds():
+            self.apply(row['cart_id'], row['product_id'], int(row['qty']), float(row['expires']))
+        self.expire()
+
+    def apply(self, cart_id, pid, qty, expires):
+        """Set one cart's hold on a product (qty 0 releases it)."""
+        lines = self.carts.get(cart_id)
+        old = lines.pop(pid, None) if lines else None
+        if old is not None:
+            left = self.held[pid] - old[0]
+            if left:
+                self.held[pid] = left
+            else:
+                del self.held[pid]
+            if not lines:
+                del self.carts[cart_id]
+        if qty > 0:
+            self.carts.setdefault(cart_id, {})[pid] = (qty, expires)
+            self.held[pid] = self.held.get(pid, 0) + qty
+            heapq.heappush(self._expiry, (expires, cart_id, pid))
+
+    def expire(self, now=None):
+        """Release every hold whose time is up, oldest first."""
+        now = time.time() if now is None else now
+        expiry = self._expiry
+        while expiry and expiry[0][0] <= now:
+            expires, cart_id, pid = heapq.heappop(expiry)
+            line = self.carts.get(cart_id, {}).get(pid)
+            if line is not None and line[1] == expires:   # else renewed or released since
+                self.apply(cart_id, pid, 0, 0)
+        if len(expiry) > 2 * len(self.held) + 1000:
+            # mostly stale entries from renewed holds: start the queue again from the live ones
+            self._expiry = [(exp, cid, pid) for cid, lines in self.carts.items() for pid, (_, exp) in lines.items()]
+            heapq.heapify(self._expiry)
+
+    def held_units(self, pid, cart_id=None):
+        """Units of `pid` held, not counting those held by `cart_id`."""
+        held = self.held.get(pid, 0)
+        if cart_id is not None and held:
+            held -= self.carts.get(cart_id, {}).get(pid, (0, 0))[0]
+        return held
+
+    def cart(self, cart_id):
+        """{product_id: qty} held by one cart."""
+        return {pid: qty for pid, (qty, _) in self.carts.get(cart_id, {}).items()}
+
+
+class ReservationMonitor:
+    """Owns the HoldLedger for one backend and writes hold changes through to it."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.RLock()
+        self._ledger = None
+        self._writes = 0
+
+    def ledger(self):
+        """The ledger, rebuilt if another terminal changed the holds, with expired holds released."""
+        with self._lock:
+            ledger = self._ledger
+            if ledger is None or ledger.version is None or ledger.version != self.backend.holds_version():
+                self._ledger = ledger = HoldLedger(self.backend)
+                ledger.rebuild()
+            else:
+                ledger.expire()
+            return ledger
+
+    @contextlib.contextmanager
+    def locked(self):
+        """Hold the holds lock (this process and every other terminal) and yield the current ledger."""
+        with self._lock, self.backend.holds_lock():
+            yield self.ledger()
+
+    def put(self, lines, seconds=None):
+        """
+        Set holds, [(cart_id, product_id, qty)], each for `seconds`; qty 0
+        releases. Call inside locked(). Returns the new expiry time.
+        """
+        expires = round(time.time() + (seconds or HOLD_SECONDS), 3)
+        rows = [{'hold_id': hold_id(cart_id, pid), 'cart_id': cart_id, 'product_id': pid,
+                 'qty': qty, 'expires': expires} for cart_id, pid, qty in lines]
+        if not rows:
+            return expires
+        ledger = self._ledger
+        self.backend.put_holds(rows)
+        for cart_id, pid, qty in lines:
+            ledger.apply(cart_id, pid, qty, expires)
+        self._writes += len(rows)
+        if self._writes >= PURGE_EVERY:
+            self._writes = 0
+            self.backend.purge_holds(time.time())
+        # nobody else can write holds while we hold the lock, so the ledger is current as of now
+        ledger.version = self.backend.holds_version()
+        return expires
+
+    def release_cart(self, cart_id):
+        """Release every hold of a cart. Call inside locked()."""
+        self.put([(cart_id, pid, 0) for pid in self._ledger.cart(cart_id)])
+
+
+def watch(backend):
+    """The reservation monitor for `backend`, created on first use."""
+    monitor = _monitors.get(id(backend))
+    if monitor is None or monitor.backend is not backend:
+        monitor = _monitors[id(backend)] = ReservationMonitor(backend)
+    return monitor
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# src/sales.py
+import sys
+from storage import get_backend, SALES_FIELDS, LINE_ITEM_FIELDS
+from csv_backend import parse_sale_date
+from ids import ORDER_PREFIX, id_bounds, is_sortable_id
+from instrument import timed
+
+__all__ = ['SALES_FIELDS', 'LINE_ITEM_FIELDS', 'parse_sale_date', 'append_sale', 'iter_sales',
+           'iter_sales_between', 'iter_line_items', 'daily_totals', 'summarize', 'rebuild_rollups']
+
+
+@timed('sales.append_sale')
+def append_sale(order_id, customer_id, sale_date, total, items=None):
+    """
+    Record one order in the sales log and fold it into the daily rollups.
+    Its `items` (product_id, qty, price) also go to the line-item fact log.
+    """
+    get_backend().append_sale(order_id, customer_id, sale_date, total, items)
+
+
+@timed('sales.iter_sales')
+def iter_sales(start_date, end_date):
+    """Yield sales rows dated start_date..end_date (inclusive), touching only the data in range."""
+    return get_backend().iter_sales(start_date, end_date)
+
+
+@timed('sales.iter_line_items')
+def iter_line_items(start_date, end_date):
+    """Yield line items dated start_date..end_date as value lists in LINE_ITEM_FIELDS order."""
+    return get_backend().iter_line_items(start_date, end_date)
+
+
+def iter_sales_between(start, end):
+    """
+    Sales placed between two datetimes. Whole days are selected through the
+    date index first; within them, the time sortable order IDs are compared
+    as plain strings, so no per-row timestamp parsing is needed. Older orders
+    without a sortable ID are kept whenever their day is in range.
+    """
+    lo, hi = id_bounds(start, end, ORDER_PREFIX)
+    for row in iter_sales(start.date(), end.date()):
+        order_id = row.get('order_id', '')
+        if not is_sortable_id(order_id, ORDER_PREFIX) or lo <= order_id <= hi:
+            yield row
+
+
+@timed('sales.daily_totals')
+def daily_totals(start_date, end_date):
+    """
+    Per-day totals for start_date..end_date (inclusive), read from the rollups,
+    so the cost follows the number of days rather than the number of orders.
+    Returns a list of {'date', 'orders', 'revenue', 'customer_ids'} sorted by date.
+    """
+    return get_backend().daily_totals(start_date, end_date)
+
+
+def rebuild_rollups():
+    """Recompute the daily rollups from the raw sales rows."""
+    get_backend().rebuild_rollups()
+
+
+def summarize(start_date, end_date):
+    """Order count, revenue and distinct customers for a date range."""
+    days = daily_totals(start_date, end_date)
+    customers = set()
+    for d in days:
+        customers |= d['customer_ids']
+    return {
+        'orders': sum(d['orders'] for d in days),
+        'revenue': round(sum(d['revenue'] for d in days), 2),
+        'customers': len(customers),
+        'days': days,
+    }
+
+
+if __name__ == '__main__':
+    backend = get_backend()
+    if sys.argv[1:] == ['migrate'] and backend.name == 'csv':
+        print(f"Migrated {backend.sales.migrate_legacy_log()} sales rows into {backend.sales.sales_dir}")
+    elif sys.argv[1:] == ['rebuild-rollups']:
+        rebuild_rollups()
+        print(f"Rebuilt daily rollups ({backend.name} backend)")
+    else:
+        print("usage: python src/sales.py [migrate | rebuild-rollups]")
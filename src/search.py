@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# src/search.py
+"""
+Product name search: an inverted index from name words to product IDs, with
+prefix lookup over a sorted word list.
+
+A query is split into words the same way names are ("env pack" -> env,
+pack). A product matches when every query word is the start of one of its
+name words, so results narrow as the cashier types. The words starting
+with a prefix are one bisect and a contiguous slice of the sorted word
+list. The matches for each query word are then intersected, smallest set
+first, which touches only the products that actually match.
+
+Ranking, best first: an exact product ID, then names with more whole-word
+(not just prefix) matches, then shorter names, then by name. The tiers are
+set operations and each product's sort key is kept in the index, so only
+the requested page is ever sorted.
+
+Like the low-stock index, it is kept current from the backend's product-change
+notifications, and rebuilt only when names_version() shows another terminal
+changed the products behind its back. On the mmap backend that version
+ignores in-place stock writes, so other terminals' sales never cause a rebuild.
+"""
+import bisect
+import collections
+import heapq
+import re
+import threading
+
+PAGE_SIZE = 20
+_WORD = re.compile(r'\w+')
+
+_monitors = {}
+
+
+def tokenize(text):
+    """Lower-cased words of `text`, in order."""
+    return _WORD.findall(str(text or '').lower())
+
+
+class NameIndex:
+    """Product IDs by name word, plus the sorted word list for prefix lookup."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.version = None
+        self.names = {}        # product_id -> name
+        self._order = {}       # product_id -> (name length, lower-cased name, product_id) for ranking
+        self._words = {}       # product_id -> set of its name words
+        self._postings = {}    # word -> set of product_ids
+        self._vocabulary = []  # sorted words with at least one product
+
+    def rebuild(self):
+        self.version = self.backend.names_version()
+        self.names, self._order, self._words, self._postings = {}, {}, {}, {}
+        for row in self.backend.list_products():
+            self._insert(row['product_id'], row.get('name', ''), sort=False)
+        self._vocabulary = sorted(self._postings)
+
+    def _insert(self, pid, name, sort=True):
+        words = set(tokenize(name))
+        self.names[pid] = name
+        self._order[pid] = (len(name), name.lower(), pid)
+        self._words[pid] = words
+        for word in words:
+            posting = self._postings.get(word)
+            if posting is None:
+                posting = self._postings[word] = set()
+                if sort:
+                    bisect.insort(self._vocabulary, word)
+            posting.add(pid)
+
+    def _remove(self, pid):
+        self.names.pop(pid, None)
+        self._order.pop(pid, None)
+        for word in self._words.pop(pid, ()):
+            posting = self._postings[word]
+            posting.discard(pid)
+            if not posting:
+                del self._postings[word]
+                i = bisect.bisect_left(self._vocabulary, word)
+                if i < len(self._vocabulary) and self._vocabulary[i] == word:
+                    del self._vocabulary[i]
+
+    def update(self, pid, row):
+        """Re-index one product from its new row (None = deleted)."""
+        if row is None:
+            self._remove(pid)
+        elif self.names.get(pid) != row.get('name', ''):
+            self._remove(pid)
+            self._insert(pid, row.get('name', ''))
+
+    def words_starting(self, prefix):
+        """Indexed words beginning with `prefix`, in order."""
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        end = bisect.bisect_left(self._vocabulary, prefix + '\U0010ffff', start)
+        return self._vocabulary[start:end]
+
+    def _matching(self, word):
+        postings = [self._postings[w] for w in self.words_starting(word)]
+        if len(postings) == 1:
+            return postings[0]
+        return set().union(*postings)
+
+    def matches(self, query):
+        """Set of product IDs whose name has a word starting with each query word."""
+        words = tokenize(query)
+        if not words:
+            return set()
+        # cheapest word first: its candidates bound every later intersection
+        sizes = sorted(words, key=lambda w: sum(len(self._postings[t]) for t in self.words_starting(w)))
+        found = set(self._matching(sizes[0]))
+        for word in sizes[1:]:
+            if not found:
+                break
+            found &= self._matching(word)
+        return found
+
+    def _page(self, pids, offset, limit):
+        """One page of `pids` ordered by (name length, name, product ID)."""
+        wanted = offset + limit
+        if wanted * 4 < len(pids):
+            ranked = heapq.nsmallest(wanted, pids, key=self._order.__getitem__)
+        else:
+            ranked = sorted(pids, key=self._order.__getitem__)
+        return ranked[offset:wanted]
+
+    def search(self, query, offset=0, limit=PAGE_SIZE):
+        """(total matches, [product_id] for one page of the ranked results)."""
+        query = str(query or '').strip()
+        found = self.matches(query)
+        exact_id = query if query in self.names else None
+        found.discard(exact_id)
+        total = len(found) + (exact_id is not None)
+
+        # tiers by how many query words are whole name words, worked out with set operations
+        whole = collections.Counter()
+        for word in set(tokenize(query)):
+            whole.update(found & self._postings.get(word, set()))
+        tiers = collections.defaultdict(list)
+        for pid, count in whole.items():
+            tiers[count].append(pid)
+        tiers[0] = found.difference(whole)
+
+        page = [exact_id] if exact_id is not None and offset == 0 else []
+        offset = max(0, offset - (exact_id is not None))
+        for count in sorted(tiers, reverse=True):
+            if len(page) >= limit:
+                break
+            tier = tiers[count]
+            if offset >= len(tier):
+                offset -= len(tier)
+                continue
+            page += self._page(tier, offset, limit - len(page))
+            offset = 0
+        return total, page
+
+
+class SearchMonitor:
+    """Watches one backend and keeps its NameIndex current."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.RLock()
+        self._index = None
+        backend.subscribe_products(self._on_change)
+
+    def index(self):
+        """The name index, rebuilt if it is missing or another terminal changed the products since."""
+        with self._lock:
+            index = self._index
+            if index is None or index.version is None or index.version != self.backend.names_version():
+                self._index = index = NameIndex(self.backend)
+                index.rebuild()
+            return index
+
+    def search(self, query, offset=0, limit=PAGE_SIZE):
+        with self._lock:
+            return self.index().search(query, offset, limit)
+
+    def _on_change(self, changes, before, after):
+        with self._lock:
+            index = self._index
+            if index is None:
+                return
+            if changes is None or before is None or index.version != self.backend.names_version(before):
+                self._index = None   # bulk change or missed writes: rebuild on next use
+                return
+            for pid, _, new in changes:
+                index.update(pid, new)
+            index.version = self.backend.names_version(after)
+
+
+def watch(backend):
+    """The search monitor for `backend`, created (and subscribed) on first use."""
+    monitor = _monitors.get(id(backend))
+    if monitor is None or monitor.backend is not backend:
+        monitor = _monitors[id(backend)] = SearchMonitor(backend)
+    return monitor
@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+# src/service.py
+"""
+Long-running local inventory service: one process keeps the catalog, the
+search and low-stock indexes and the accounts in memory, and serves many
+terminals at once.
+
+    python src/service.py                      # listens on <data dir>/inventory.sock
+    python src/service.py --listen 127.0.0.1:8765
+    python src/main.py --service               # console as a client (or INVENTORY_SERVICE=ADDRESS)
+
+Functions marked @exposed('name') are the service's operations: product
+lookups and search, cart quotes, checkout (orders.place_order), stock and
+product edits, and customer accounts. In a client process the decorator
+swaps each one for a call to the service, so the console code is the same
+either way. Like instrument.py, this happens at import time, so the client
+is configured (INVENTORY_SERVICE, or configure() / the main.py flag) before
+the app modules are imported.
+
+Reads (and logins) run side by side on a small thread pool. Every other
+operation that writes goes through one queue and one writer thread, in
+arrival order, so clients never race each other for the files. Reports, imports and bill lookups in a
+client still read and write the data directory directly. The service sees
+those changes through products_version(), the same way the terminals do.
+
+The service has no sessions: any caller may run any operation, product
+and stock edits included. The Unix socket is created owner-only (0600), so
+that caller is the account that started the service. TCP is only used
+when --listen asks for it, and is open to every local user.
+
+The wire format is one JSON object per line, over a Unix socket (ADDRESS is
+a path) or TCP (ADDRESS is host:port). Results are plain JSON: row views
+go as lists and dicts, dates as ISO text, and any other type is an error.
+
+    -> {"id": 1, "op": "find_product", "args": ["P001"], "kwargs": {}}
+    <- {"id": 1, "result": {"product_id": "P001", ...}}
+    <- {"id": 2, "error": "product not found: P9", "type": "OrderError"}
+"""
+import argparse
+import asyncio
+import builtins
+import concurrent.futures
+import datetime
+import functools
+import itertools
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from collections.abc import Mapping, Sequence
+
+SOCKET_NAME = 'inventory.sock'
+READ_THREADS = 4
+MAX_MESSAGE = 64 * 1024 * 1024   # a full product list fits in one line
+
+OPS = {}        # op name -> (function, writes)
+CLIENT = None   # set in client processes: exposed functions call the service instead
+
+
+class ServiceError(RuntimeError):
+    """The service could not be reached, or an operation failed in a way the client has no class for."""
+
+
+# ------------------- OPERATIONS ------------------- #
+def exposed(name, writes=False):
+    """
+    Decorator: make the function a service operation called `name`.
+    Operations that change data must say writes=True so they go through the
+    single writer. In a client process the function is replaced by a call
+    to the service; otherwise it is returned untouched.
+    """
+    def decorate(fn):
+        OPS[name] = (fn, writes)
+        if CLIENT is None:
+            return fn
+
+        @functools.wraps(fn)
+        def remote(*args, **kwargs):
+            return CLIENT.call(name, *args, _errors=sys.modules.get(fn.__module__), **kwargs)
+        return remote
+    return decorate
+
+
+def default_address():
+    """<data dir>/inventory.sock. TCP is only ever used when an address asks for it."""
+    import storage
+    return os.path.join(storage.DATA_DIR, SOCKET_NAME)
+
+
+def parse_address(address):
+    """('unix', path) or ('tcp', (host, port)). host:port and :port are TCP; anything else is a socket path."""
+    address = address or default_address()
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit() and os.sep not in address:
+        return 'tcp', (host or '127.0.0.1', int(port))
+    return 'unix', address
+
+
+def _plain(value):
+    """JSON form of the non-JSON types operations return: row views as lists/dicts, dates as ISO text."""
+    if isinstance(value, Mapping):
+        return dict(value)
+    if isinstance(value, Sequence) and not isinstance(value, (str, bytes)):
+        return list(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} cannot be sent to a client")
+
+
+def _encode(message):
+    return (json.dumps(message, ensure_ascii=False, default=_plain) + "\n").encode('utf-8')
+
+
+# ------------------- CLIENT ------------------- #
+class Client:
+    """
+    Blocking connection to the service, safe to share between threads (one
+    call on the wire at a time). If the service restarted, a read is retried
+    once on a new connection; a write is not, since it may have been applied.
+    """
+
+    def __init__(self, address=None, timeout=60.0):
+        self.address = address or default_address()
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._sock = None
+        self._file = None
+
+    def _connect(self):
+        kind, where = parse_address(self.address)
+        if kind == 'unix' and not hasattr(socket, 'AF_UNIX'):
+            raise ServiceError(f"no Unix sockets here: give the service's host:port instead of {self.address}")
+        try:
+            if kind == 'unix':
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.settimeout(self.timeout)
+                sock.connect(where)
+            else:
+                sock = socket.create_connection(where, timeout=self.timeout)
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError as exc:
+            raise ServiceError(f"cannot reach the inventory service at {self.address}: {exc}") from exc
+        self._sock, self._file = sock, sock.makefile('rb')
+
+    def close(self):
+        with self._lock:
+            if self._sock is not None:
+                self._file.close()
+                self._sock.close()
+                self._sock = self._file = None
+
+    def _roundtrip(self, data):
+        if self._sock is None:
+            self._connect()
+        self._sock.sendall(data)
+        line = self._file.readline()
+        if not line:
+            raise ConnectionResetError("service closed the connection")
+        return json.loads(line)
+
+    def call(self, op, *args, _errors=None, **kwargs):
+        """
+        Run `op` on the service and return its result. An error is raised
+        again as the class of the same name in the `_errors` module (e.g.
+        OrderError from orders) or builtins if there is one, else ServiceError.
+        """
+        with self._lock:
+            data = _encode({'id': next(self._ids), 'op': op, 'args': args, 'kwargs': kwargs})
+            retries = 0 if OPS.get(op, (None, True))[1] else 1
+            while True:
+                try:
+                    reply = self._roundtrip(data)
+                    break
+                except OSError as exc:
+                    self._sock = self._file = None
+                    if isinstance(exc, ConnectionError) and retries:
+                        retries -= 1   # service restarted since the last call: reconnect
+                        continue
+                    raise ServiceError(f"lost the inventory service at {self.address} during {op}: {exc}") from exc
+        if 'error' not in reply:
+            return reply.get('result')
+        cls = getattr(_errors, reply.get('type', ''), None) or getattr(builtins, reply.get('type', ''), None)
+        if not (isinstance(cls, type) and issubclass(cls, Exception)):
+            cls = ServiceError
+        raise cls(reply['error'])
+
+
+# ------------------- SERVER ------------------- #
+class Service:
+    """Serves OPS to any number of connections: reads on a thread pool, writes through one writer."""
+
+    def __init__(self, address=None):
+        self.address = address or default_address()
+        self.stats = {'connections': 0, 'requests': 0, 'reads': 0, 'writes': 0, 'errors': 0}
+        self._readers = concurrent.futures.ThreadPoolExecutor(READ_THREADS, thread_name_prefix='service-read')
+        self._writer = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix='service-write')
+        self._writes = None
+        self._server = None
+        self._stop = self._loop = None
+
+    # ---- operations ----
+    def _ops(self):
+        ops = dict(OPS)
+        ops['ping'] = (lambda: {'pid': os.getpid(), 'address': self.address}, False)
+        ops['stats'] = (lambda: dict(self.stats, queued_writes=self._writes.qsize()), False)
+        return ops
+
+    async def _run_writes(self):
+        """The single writer: apply queued writes one at a time, in arrival order."""
+        loop = asyncio.get_running_loop()
+        while True:
+            fn, args, kwargs, future = await self._writes.get()
+            try:
+                result = await loop.run_in_executor(self._writer, functools.partial(fn, *args, **kwargs))
+            except Exception as exc:
+                if not future.cancelled():
+                    future.set_exception(exc)
+            else:
+                if not future.cancelled():
+                    future.set_result(result)
+            finally:
+                self._writes.task_done()
+
+    async def _dispatch(self, ops, request):
+        fn, writes = ops[request['op']]
+        args, kwargs = request.get('args') or [], request.get('kwargs') or {}
+        if writes:
+            self.stats['writes'] += 1
+            future = asyncio.get_running_loop().create_future()
+            await self._writes.put((fn, args, kwargs, future))
+            return await future
+        self.stats['reads'] += 1
+        return await asyncio.get_running_loop().run_in_executor(self._readers, functools.partial(fn, *args, **kwargs))
+
+    async def _answer(self, ops, line, writer, send_lock):
+        request = None
+        try:
+            request = json.loads(line)
+            if request.get('op') not in ops:
+                raise LookupError(f"unknown operation {request.get('op')!r}")
+            data = _encode({'id': request.get('id'), 'result': await self._dispatch(ops, request)})
+        except Exception as exc:
+            self.stats['errors'] += 1
+            data = _encode({'id': request.get('id') if isinstance(request, dict) else None,
+                            'error': str(exc), 'type': type(exc).__name__})
+        async with send_lock:
+            writer.write(data)
+            await writer.drain()
+
+    async def _serve_connection(self, reader, writer):
+        self.stats['connections'] += 1
+        ops = self._ops()
+        send_lock = asyncio.Lock()
+        pending = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self.stats['requests'] += 1
+                # each request is its own task, so a slow write does not hold up this client's reads
+                task = asyncio.create_task(self._answer(ops, line, writer, send_lock))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _listen(self):
+        kind, where = parse_address(self.address)
+        if kind == 'unix':
+            if os.path.exists(where):
+                try:
+                    Client(where, timeout=1.0).call('ping')
+                except ServiceError:
+                    os.remove(where)   # left behind by a service that did not shut down cleanly
+                else:
+                    raise ServiceError(f"an inventory service is already listening on {where}")
+            if not hasattr(socket, 'AF_UNIX'):
+                raise ServiceError("no Unix sockets here: listen on TCP with --listen 127.0.0.1:PORT")
+            umask = os.umask(0o177)   # owner-only from the moment the socket exists
+            try:
+                server = await asyncio.start_unix_server(self._serve_connection, where, limit=MAX_MESSAGE)
+            finally:
+                os.umask(umask)
+            os.chmod(where, 0o600)
+            return server
+        return await asyncio.start_server(self._serve_connection, *where, limit=MAX_MESSAGE)
+
+    def stop(self):
+        """Make serve() shut down as it does on SIGTERM; safe to call from any thread."""
+        self._loop.call_soon_threadsafe(self._stop.set)
+
+    async def serve(self, ready=None):
+        """Listen until SIGINT/SIGTERM, then finish queued writes and bills."""
+        self._writes = asyncio.Queue()
+        writer_task = asyncio.create_task(self._run_writes())
+        self._server = await self._listen()
+        stop = self._stop = asyncio.Event()
+        loop = self._loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass   # Windows, or not the main thread: Ctrl+C still ends asyncio.run
+        if ready is not None:
+            ready()
+        try:
+            await stop.wait()
+        finally:
+            self._server.close()
+            await self._server.wait_closed()
+            await self._writes.join()
+            writer_task.cancel()
+            self._readers.shutdown(wait=True)
+            self._writer.shutdown(wait=True)
+            kind, where = parse_address(self.address)
+            if kind == 'unix' and os.path.exists(where):
+                os.remove(where)
+
+
+def warm_up():
+    """Load the catalog, indexes and accounts before the first client arrives. Returns what was loaded."""
+    import products   # registers the exposed operations
+    import orders     # noqa: F401
+    import accounts   # noqa: F401
+    import search
+    backend = products.get_backend()
+    loaded = {'products': len(products.list_products()), 'customers': len(backend.list_customers())}
+    search.watch(backend).index()
+    loaded['low_stock'] = len(products.low_stock_items())
+    return loaded
+
+
+# ------------------- CLIENT SETUP ------------------- #
+def configure(address=None, check=True):
+    """
+    Make this process a client of the service. Only functions imported after
+    this call are redirected. With check, raises ServiceError now if the
+    service cannot be reached, rather than at the first menu choice.
+    """
+    global CLIENT
+    CLIENT = Client(address)
+    if check:
+        CLIENT.call('ping')
+    return CLIENT
+
+
+def configure_from_args(argv):
+    """Handle --service [ADDRESS]; returns the other arguments."""
+    rest, address, wanted = [], None, False
+    args = list(argv)
+    while args:
+        arg = args.pop(0)
+        if arg == '--service':
+            wanted = True
+            if args and not args[0].startswith('-'):
+                address = args.pop(0)
+        elif arg.startswith('--service='):
+            wanted, address = True, arg.split('=', 1)[1]
+        else:
+            rest.append(arg)
+    if wanted:
+        configure(address, check=False)
+    return rest
+
+
+def _configure_from_env():
+    address = os.environ.get('INVENTORY_SERVICE', '').strip()
+    if address and address.lower() not in ('0', 'off'):
+        configure(None if address.lower() in ('1', 'on') else address, check=False)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='python src/service.py', description="Run the local inventory service.")
+    parser.add_argument('--listen', metavar='ADDRESS',
+                        help=f"socket path or host:port (default: <data dir>/{SOCKET_NAME})")
+    parser.add_argument('--store', help="serve one store's data (see src/stores.py; default: INVENTORY_STORE)")
+    args = parser.parse_args(argv)
+    import stores
+    try:
+        stores.configure_from_args(['--store', args.store] if args.store else [])
+    except ValueError as exc:
+        print(f"❌ {exc}")
+        return 1
+
+    t0 = time.perf_counter()
+    loaded = warm_up()
+    service = Service(args.listen)
+    ready = lambda: print(f"✅ Inventory service on {service.address} ({loaded['products']} products, "  # noqa: E731
+                          f"{loaded['customers']} customers loaded in {time.perf_counter() - t0:.2f}s)", flush=True)
+    try:
+        asyncio.run(service.serve(ready))
+    except ServiceError as exc:
+        print(f"❌ {exc}")
+        return 1
+    except KeyboardInterrupt:
+        pass
+    import billing
+    billing.wait_for_bills()
+    print(f"👋 Stopped after {service.stats['requests']} requests "
+          f"({service.stats['reads']} reads, {service.stats['writes']} writes, {service.stats['errors']} errors)")
+    return 0
+
+
+if __name__ == '__main__':
+    os.environ.pop('INVENTORY_SERVICE', None)   # the service is never a client of itself
+    import service   # the copy the app modules register their operations with, not this __main__ one
+    sys.exit(service.main(sys.argv[1:]))
+else:
+    _configure_from_env()
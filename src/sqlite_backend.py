@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+# src/sqlite_backend.py
+import datetime
+import os
+import sqlite3
+import threading
+from storage import Backend, StockError, LINE_ITEM_FIELDS, HOLD_FIELDS, line_item_rows
+
+DB_NAME = 'inventory.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    product_id TEXT PRIMARY KEY,
+    name       TEXT NOT NULL DEFAULT '',
+    price      TEXT NOT NULL DEFAULT '',
+    stock      INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS customers (
+    customer_id TEXT PRIMARY KEY,
+    name        TEXT NOT NULL DEFAULT '',
+    password    TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS admins (
+    username TEXT PRIMARY KEY,
+    password TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS reorder_levels (
+    product_id    TEXT PRIMARY KEY,
+    reorder_level INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS holds (
+    hold_id    TEXT PRIMARY KEY,
+    cart_id    TEXT NOT NULL,
+    product_id TEXT NOT NULL,
+    qty        INTEGER NOT NULL,
+    expires    REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sales (
+    order_id    TEXT NOT NULL,
+    customer_id TEXT NOT NULL,
+    date        TEXT NOT NULL,
+    total       REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sales_date ON sales(date);
+CREATE INDEX IF NOT EXISTS sales_customer ON sales(customer_id);
+CREATE INDEX IF NOT EXISTS sales_order ON sales(order_id);
+CREATE TABLE IF NOT EXISTS line_items (
+    order_id    TEXT NOT NULL,
+    customer_id TEXT NOT NULL,
+    product_id  TEXT NOT NULL,
+    qty         INTEGER NOT NULL,
+    unit_price  TEXT NOT NULL,
+    date        TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS line_items_date ON line_items(date);
+CREATE TABLE IF NOT EXISTS sales_daily (
+    date    TEXT PRIMARY KEY,
+    orders  INTEGER NOT NULL,
+    revenue REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sales_daily_customers (
+    date        TEXT NOT NULL,
+    customer_id TEXT NOT NULL,
+    PRIMARY KEY (date, customer_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS versions (
+    name    TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+"""
+
+BUMP_VERSION = ("INSERT INTO versions (name, version) VALUES (?, 1) "
+                "ON CONFLICT(name) DO UPDATE SET version = version + 1")
+UPSERT_PRODUCT = ("INSERT INTO products (product_id, name, price, stock) VALUES (?, ?, ?, ?) "
+                  "ON CONFLICT(product_id) DO UPDATE SET name = excluded.name, price = excluded.price, "
+                  "stock = excluded.stock")
+
+
+def _product_row(r):
+    return {'product_id': r[0], 'name': r[1], 'price': r[2], 'stock': str(r[3])}
+
+
+def _stock_int(value):
+    return int(float(value or 0))
+
+
+class SqliteBackend(Backend):
+    """
+    Everything in one SQLite database (data/inventory.db) in WAL mode, so
+    readers never block the single writer and each update touches only the
+    rows and index pages involved.
+    """
+    name = 'sqlite'
+
+    def __init__(self, data_dir):
+        super().__init__(data_dir)
+        self.path = os.path.join(data_dir, DB_NAME)
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        """One connection per thread (and per process after a fork)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(self.data_dir, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    class _Tx:
+        def __init__(self, conn):
+            self.conn = conn
+
+        def __enter__(self):
+            self.conn.execute("BEGIN IMMEDIATE")
+            return self.conn
+
+        def __exit__(self, exc_type, exc, tb):
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+            return False
+
+    def _tx(self):
+        """Write transaction; BEGIN IMMEDIATE takes the write lock up front so checks and updates can't race."""
+        return self._Tx(self._conn())
+
+    # Versions are counters in the database, bumped in the same transaction as
+    # the change, so every thread's connection and every process reads the same
+    # token, and sales or holds commits do not move the products version.
+    def _version(self, name, db=None):
+        r = (db or self._conn()).execute("SELECT version FROM versions WHERE name = ?", (name,)).fetchone()
+        return r[0] if r else 0
+
+    def _bump(self, db, name):
+        """Count one change to `name` inside the write transaction `db`; returns the new version."""
+        db.execute(BUMP_VERSION, (name,))
+        return self._version(name, db)
+
+    # ------------------- PRODUCTS ------------------- #
+    def products_version(self):
+        return self._version('products')
+
+    def _old_products(self, db, pids):
+        rows = {}
+        for pid in pids:
+            r = db.execute("SELECT product_id, name, price, stock FROM products WHERE product_id = ?",
+                           (pid,)).fetchone()
+            rows[pid] = _product_row(r) if r else None
+        return rows
+
+    def list_products(self):
+        cur = self._conn().execute("SELECT product_id, name, price, stock FROM products ORDER BY rowid")
+        return [_product_row(r) for r in cur]
+
+    def get_product(self, pid):
+        r = self._conn().execute(
+            "SELECT product_id, name, price, stock FROM products WHERE product_id = ?", (pid,)).fetchone()
+        return _product_row(r) if r else None
+
+    def upsert_products(self, rows):
+        rows = [dict(r, stock=str(_stock_int(r.get('stock')))) for r in rows]
+        with self._tx() as db:
+            before = self._version('products', db)
+            old = self._old_products(db, [r['product_id'] for r in rows])
+            db.executemany(UPSERT_PRODUCT, ((r['product_id'], r.get('name', ''), r.get('price', ''),
+                                             int(r['stock'])) for r in rows))
+            after = self._bump(db, 'products')
+        self._notify_products([(r['product_id'], old[r['product_id']], r) for r in rows], before, after)
+
+    def import_products(self, rows):
+        """Bulk upsert streamed straight into one transaction."""
+        received = [0]
+
+        def params():
+            for r in rows:
+                received[0] += 1
+                yield (r['product_id'], r.get('name', ''), r.get('price', ''), _stock_int(r.get('stock')))
+
+        with self._tx() as db:
+            before = db.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+            db.executemany(UPSERT_PRODUCT, params())
+            inserted = db.execute("SELECT COUNT(*) FROM products").fetchone()[0] - before
+            self._bump(db, 'products')
+        self._notify_products(None)
+        return {'inserted': inserted, 'updated': received[0] - inserted}
+
+    def iter_products(self):
+        cur = self._conn().execute("SELECT product_id, name, price, stock FROM products ORDER BY rowid")
+        for r in cur:
+            yield _product_row(r)
+
+    def delete_product(self, pid):
+        with self._tx() as db:
+            before = self._version('products', db)
+            old = self._old_products(db, [pid])[pid]
+            if old is None:
+                return False
+            db.execute("DELETE FROM products WHERE product_id = ?", (pid,))
+            after = self._bump(db, 'products')
+        self._notify_products([(pid, old, None)], before, after)
+        return True
+
+    def set_stock(self, pid, stock):
+        with self._tx() as db:
+            before = self._version('products', db)
+            old = self._old_products(db, [pid])[pid]
+            if old is None:
+                return
+            db.execute("UPDATE products SET stock = ? WHERE product_id = ?", (_stock_int(stock), pid))
+            after = self._bump(db, 'products')
+        self._notify_products([(pid, old, dict(old, stock=str(_stock_int(stock))))], before, after)
+
+    def adjust_stock(self, changes):
+        with self._tx() as db:
+            before = self._version('products', db)
+            old = self._old_products(db, changes)
+            new_stock = {}
+            problems = []
+            for pid, delta in changes.items():
+                r = old[pid]
+                if r is None:
+                    problems.append(f"{pid}: product not found")
+                elif int(r['stock']) + delta < 0:
+                    problems.append(f"{pid}: only {r['stock']} in stock, {-delta} requested")
+                else:
+                    new_stock[pid] = int(r['stock']) + delta
+            if problems:
+                raise StockError("; ".join(problems))
+            db.executemany("UPDATE products SET stock = ? WHERE product_id = ?",
+                           ((stock, pid) for pid, stock in new_stock.items()))
+            after = self._bump(db, 'products')
+        self._notify_products([(pid, old[pid], dict(old[pid], stock=str(stock))) for pid, stock in new_stock.items()],
+                              before, after)
+        return new_stock
+
+    def catalog_stats(self):
+        return {'products': self._conn().execute("SELECT COUNT(*) FROM products").fetchone()[0]}
+
+    # ------------------- CUSTOMERS / ADMINS ------------------- #
+    def list_customers(self):
+        cur = self._conn().execute("SELECT customer_id, name, password FROM customers ORDER BY rowid")
+        return [{'customer_id': r[0], 'name': r[1], 'password': r[2]} for r in cur]
+
+    def get_customer(self, cid):
+        r = self._conn().execute(
+            "SELECT customer_id, name, password FROM customers WHERE customer_id = ?", (cid,)).fetchone()
+        return {'customer_id': r[0], 'name': r[1], 'password': r[2]} if r else None
+
+    def add_customer(self, row):
+        with self._tx() as db:
+            cur = db.execute("INSERT OR IGNORE INTO customers (customer_id, name, password) VALUES (?, ?, ?)",
+                             (row['customer_id'], row.get('name', ''), row.get('password', '')))
+            return cur.rowcount > 0
+
+    def update_customer(self, row):
+        with self._tx() as db:
+            db.execute("UPDATE customers SET name = ?, password = ? WHERE customer_id = ?",
+                       (row.get('name', ''), row.get('password', ''), row['customer_id']))
+
+    def list_admins(self):
+        cur = self._conn().execute("SELECT username, password FROM admins ORDER BY rowid")
+        return [{'username': r[0], 'password': r[1]} for r in cur]
+
+    def get_admin(self, username):
+        r = self._conn().execute("SELECT username, password FROM admins WHERE username = ?", (username,)).fetchone()
+        return {'username': r[0], 'password': r[1]} if r else None
+
+    def update_admin(self, row):
+        with self._tx() as db:
+            db.execute("UPDATE admins SET password = ? WHERE username = ?", (row.get('password', ''), row['username']))
+
+    # ------------------- REORDER LEVELS ------------------- #
+    def list_reorder_levels(self):
+        return dict(self._conn().execute("SELECT product_id, reorder_level FROM reorder_levels"))
+
+    def set_reorder_level(self, pid, level):
+        with self._tx() as db:
+            if level is None:
+                db.execute("DELETE FROM reorder_levels WHERE product_id = ?", (pid,))
+            else:
+                db.execute("INSERT OR REPLACE INTO reorder_levels (product_id, reorder_level) VALUES (?, ?)",
+                           (pid, int(level)))
+            self._bump(db, 'reorder_levels')
+
+    def reorder_levels_version(self):
+        return self._version('reorder_levels')
+
+    # ------------------- STOCK HOLDS ------------------- #
+    def list_holds(self):
+        cur = self._conn().execute("SELECT hold_id, cart_id, product_id, qty, expires FROM holds WHERE qty > 0")
+        return [dict(zip(HOLD_FIELDS, r)) for r in cur]
+
+    def put_holds(self, rows):
+        with self._tx() as db:
+            for r in rows:
+                if int(r['qty']) > 0:
+                    db.execute("INSERT OR REPLACE INTO holds (hold_id, cart_id, product_id, qty, expires) "
+                               "VALUES (?, ?, ?, ?, ?)", [r[k] for k in HOLD_FIELDS])
+                else:
+                    db.execute("DELETE FROM holds WHERE hold_id = ?", (r['hold_id'],))
+            self._bump(db, 'holds')
+
+    def holds_version(self):
+        return self._version('holds')
+
+    def purge_holds(self, now):
+        with self._tx() as db:
+            if db.execute("DELETE FROM holds WHERE expires <= ?", (now,)).rowcount:
+                self._bump(db, 'holds')
+
+    # ------------------- SALES ------------------- #
+    @staticmethod
+    def _record_sale(db, order_id, customer_id, day, total):
+        db.execute("INSERT INTO sales (order_id, customer_id, date, total) VALUES (?, ?, ?, ?)",
+                   (order_id, customer_id, day, float(total)))
+        db.execute("INSERT INTO sales_daily (date, orders, revenue) VALUES (?, 1, ?) "
+                   "ON CONFLICT(date) DO UPDATE SET orders = orders + 1, revenue = revenue + excluded.revenue",
+                   (day, float(total)))
+        db.execute("INSERT OR IGNORE INTO sales_daily_customers (date, customer_id) VALUES (?, ?)",
+                   (day, customer_id))
+
+    @staticmethod
+    def _record_lines(db, values):
+        """Insert line items given as value sequences in LINE_ITEM_FIELDS order."""
+        db.executemany("INSERT INTO line_items (order_id, customer_id, product_id, qty, unit_price, date) "
+                       "VALUES (?, ?, ?, ?, ?, ?)", values)
+
+    def append_sale(self, order_id, customer_id, sale_date, total, items=None):
+        day = sale_date.strftime("%Y-%m-%d")
+        with self._tx() as db:
+            self._record_sale(db, order_id, customer_id, day, total)
+            if items:
+                self._record_lines(db, ([r[k] for k in LINE_ITEM_FIELDS]
+                                        for r in line_item_rows(order_id, customer_id, day, items)))
+
+    def append_line_items(self, order_id, customer_id, sale_date, items):
+        with self._tx() as db:
+            self._record_lines(db, ([r[k] for k in LINE_ITEM_FIELDS]
+                                    for r in line_item_rows(order_id, customer_id, sale_date.strftime("%Y-%m-%d"), items)))
+
+    def iter_line_items(self, start_date, end_date):
+        return self._conn().execute(
+            "SELECT order_id, customer_id, product_id, qty, unit_price, date FROM line_items "
+            "WHERE date BETWEEN ? AND ? ORDER BY rowid",
+            (start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")))
+
+    def iter_sales(self, start_date, end_date):
+        cur = self._conn().execute(
+            "SELECT order_id, customer_id, date, total FROM sales WHERE date BETWEEN ? AND ? ORDER BY rowid",
+            (start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")))
+        for r in cur:
+            yield {'order_id': r[0], 'customer_id': r[1], 'date': r[2], 'total': str(r[3])}
+
+    def daily_totals(self, start_date, end_date):
+        start, end = start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")
+        db = self._conn()
+        days = {r[0]: {'date': r[0], 'orders': r[1], 'revenue': r[2], 'customer_ids': set()}
+                for r in db.execute("SELECT date, orders, revenue FROM sales_daily "
+                                    "WHERE date BETWEEN ? AND ? ORDER BY date", (start, end))}
+        for day, cid in db.execute("SELECT date, customer_id FROM sales_daily_customers "
+                                   "WHERE date BETWEEN ? AND ?", (start, end)):
+            if day in days:
+                days[day]['customer_ids'].add(cid)
+        return list(days.values())
+
+    def rebuild_rollups(self):
+        with self._tx() as db:
+            db.execute("DELETE FROM sales_daily")
+            db.execute("DELETE FROM sales_daily_customers")
+            db.execute("INSERT INTO sales_daily (date, orders, revenue) "
+                       "SELECT date, COUNT(*), SUM(total) FROM sales GROUP BY date")
+            db.execute("INSERT INTO sales_daily_customers (date, customer_id) "
+                       "SELECT DISTINCT date, customer_id FROM sales")
+
+    # ------------------- MIGRATION ------------------- #
+    def import_from(self, source):
+        """
+        Copy everything from another backend into this database in one
+        transaction. Products, customers, admins and reorder levels replace
+        the ones with the same keys; the sales, line items and daily totals
+        replace this database's, so running a migration again does not count
+        any sale twice. Returns row counts per table.
+        """
+        counts = {}
+        with self._tx() as db:
+            for table in ('sales', 'sales_daily', 'sales_daily_customers', 'line_items'):
+                db.execute(f"DELETE FROM {table}")
+
+            products = source.list_products()
+            db.executemany(
+                "INSERT OR REPLACE INTO products (product_id, name, price, stock) VALUES (?, ?, ?, ?)",
+                ((r['product_id'], r.get('name', ''), r.get('price', ''), _stock_int(r.get('stock')))
+                 for r in products))
+            counts['products'] = len(products)
+
+            customers = source.list_customers()
+            db.executemany("INSERT OR REPLACE INTO customers (customer_id, name, password) VALUES (?, ?, ?)",
+                           ((r['customer_id'], r.get('name', ''), r.get('password', '')) for r in customers))
+            counts['customers'] = len(customers)
+
+            admins = source.list_admins()
+            db.executemany("INSERT OR REPLACE INTO admins (username, password) VALUES (?, ?)",
+                           ((r['username'], r.get('password', '')) for r in admins))
+            counts['admins'] = len(admins)
+
+            levels = source.list_reorder_levels()
+            db.executemany("INSERT OR REPLACE INTO reorder_levels (product_id, reorder_level) VALUES (?, ?)",
+                           levels.items())
+            counts['reorder_levels'] = len(levels)
+
+            counts['sales'] = 0
+            for r in source.iter_sales(datetime.date.min, datetime.date.max):
+                try:
+                    total = float(r.get('total') or 0)
+                except ValueError:
+                    continue
+                self._record_sale(db, r['order_id'], r['customer_id'], r['date'], total)
+                counts['sales'] += 1
+
+            self._record_lines(db, source.iter_line_items(datetime.date.min, datetime.date.max))
+            counts['line_items'] = db.execute("SELECT COUNT(*) FROM line_items").fetchone()[0]
+            for name in ('products', 'reorder_levels'):
+                self._bump(db, name)
+        self._notify_products(None)
+        return counts
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
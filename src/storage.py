@@ -1,10 +1,50 @@
 #!/usr/bin/env python3
 # src/storage.py
+import contextlib
 import csv
+import heapq
+import importlib
+import itertools
 import os
+import random
+import tempfile
+import threading
+import time
+from operator import itemgetter
+import instrument
+from instrument import timed, path_size, result_size
+
+try:
+    import fcntl
+except ImportError:   # Windows: fall back to msvcrt byte-range locks
+    fcntl = None
+    import msvcrt
+
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DATA_DIR = os.environ.get('INVENTORY_DATA_DIR') or os.path.join(BASE_DIR, 'data')
+BACKEND = os.environ.get('INVENTORY_BACKEND', 'csv')   # 'csv', 'sqlite' or 'mmap'
+
+# Record layouts shared by every backend
+PRODUCT_FIELDS = ['product_id', 'name', 'price', 'stock']
+CUSTOMER_FIELDS = ['customer_id', 'name', 'password']
+ADMIN_FIELDS = ['username', 'password']
+SALES_FIELDS = ['order_id', 'customer_id', 'date', 'total']
+REORDER_FIELDS = ['product_id', 'reorder_level']
+LINE_ITEM_FIELDS = ['order_id', 'customer_id', 'product_id', 'qty', 'unit_price', 'date']
+HOLD_FIELDS = ['hold_id', 'cart_id', 'product_id', 'qty', 'expires']   # expires: Unix time
+
+
+class ConcurrentModificationError(RuntimeError):
+    """Raised when a file changed between reading it and writing it back."""
+
+
+class StockError(ValueError):
+    """Raised when a stock adjustment cannot be applied (unknown product or not enough stock)."""
 
 
 # ------------------- CSV READ ------------------- #
+@timed('storage.read_csv', read=path_size)
 def read_csv(filename):
     """Read data from a CSV file and return a list of dictionaries."""
     if not os.path.exists(filename):
@@ -14,7 +54,38 @@ def read_csv(filename):
         return list(reader)
 
 
+@timed('storage.iter_csv', read=path_size)
+def iter_csv(filename):
+    """Yield the rows of a CSV file as dictionaries, one at a time."""
+    if not os.path.exists(filename):
+        return
+    with open(filename, 'r', newline='', encoding='utf-8') as f:
+        yield from csv.DictReader(f)
+
+
+@timed('storage.iter_csv_values', read=path_size)
+def iter_csv_values(filename, fieldnames):
+    """
+    Stream a CSV file as lists of values in `fieldnames` order (missing
+    columns read as ''). Much cheaper than building a dict per row, for
+    files too large to load whole.
+    """
+    if not os.path.exists(filename):
+        return
+    with open(filename, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader, None) or []
+        positions = [header.index(k) if k in header else None for k in fieldnames]
+        if positions == list(range(len(fieldnames))):
+            for values in reader:
+                yield values[:len(fieldnames)] + [''] * (len(fieldnames) - len(values))
+            return
+        for values in reader:
+            yield [values[i] if i is not None and i < len(values) else '' for i in positions]
+
+
 # ------------------- CSV WRITE ------------------- #
+@timed('storage.write_csv', written=path_size)
 def write_csv(filename, fieldnames, data):
     """Write a list of dictionaries to a CSV file."""
     dirpath = os.path.dirname(filename)
@@ -27,14 +98,493 @@ def write_csv(filename, fieldnames, data):
 
 
 # ------------------- APPEND SINGLE ROW ------------------- #
+@timed('storage.append_csv')
 def append_csv(filename, fieldnames, row):
     """Append a single dictionary row to an existing CSV file."""
+    append_csv_rows(filename, fieldnames, [row])
+
+
+@timed('storage.append_csv_rows')
+def append_csv_rows(filename, fieldnames, rows):
+    """Append several dictionary rows in one locked write (header added to a new file)."""
     dirpath = os.path.dirname(filename)
     if dirpath:
         os.makedirs(dirpath, exist_ok=True)
-    file_exists = os.path.exists(filename)
-    with open(filename, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        if not file_exists:
+    with file_lock(filename):
+        file_exists = os.path.exists(filename)
+        with open(filename, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            if not file_exists:
+                writer.writeheader()
+            elif not _ends_with_newline(filename):
+                f.write('\n')   # hand-edited files may lack a final newline
+            start = f.tell()
+            writer.writerows(rows)
+            if instrument.ENABLED:
+                instrument.add_bytes('storage.append_csv_rows', written=f.tell() - start)
+
+
+def _ends_with_newline(filename):
+    with open(filename, 'rb') as f:
+        if f.seek(0, os.SEEK_END) == 0:
+            return True
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) in (b'\n', b'\r')
+
+
+# ------------------- ATOMIC CSV WRITE ------------------- #
+@timed('storage.write_csv_temp', written=result_size)
+def write_csv_temp(filename, fieldnames, data, as_lists=False):
+    """
+    Write and fsync a CSV next to `filename`; returns the temp path to rename into place.
+    With `as_lists`, `data` holds value lists in `fieldnames` order instead of dicts.
+    """
+    dirpath = os.path.dirname(filename)
+    if dirpath:
+        os.makedirs(dirpath, exist_ok=True)
+    tmp = f"{filename}.tmp{os.getpid()}.{threading.get_ident()}"
+    with open(tmp, 'w', newline='', encoding='utf-8') as f:
+        if as_lists:
+            writer = csv.writer(f)
+            writer.writerow(fieldnames)
+        else:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
             writer.writeheader()
-        writer.writerow(row)
+        writer.writerows(data)
+        f.flush()
+        os.fsync(f.fileno())
+    return tmp
+
+
+@timed('storage.atomic_write_csv')
+def atomic_write_csv(filename, fieldnames, data):
+    """Write a CSV to a temp file, fsync it and rename it over `filename`,
+    so readers never see a half-written file even if the process dies."""
+    os.replace(write_csv_temp(filename, fieldnames, data), filename)
+
+
+# ------------------- FILE LOCKING ------------------- #
+_held_locks = threading.local()
+
+
+@contextlib.contextmanager
+def file_lock(path, shared=False):
+    """
+    Advisory inter-process lock on `path` (held on a sibling `<path>.lock` file,
+    so the data file itself can be replaced atomically while locked).
+    Re-entrant within a thread: a nested acquire reuses the outer lock and mode.
+    `shared` allows concurrent readers where the platform supports it.
+    """
+    lock_path = path + '.lock'
+    held = _held_locks.__dict__.setdefault('counts', {})
+    if held.get(lock_path):
+        held[lock_path] += 1
+        try:
+            yield
+        finally:
+            held[lock_path] -= 1
+        return
+
+    dirpath = os.path.dirname(lock_path)
+    if dirpath:
+        os.makedirs(dirpath, exist_ok=True)
+    with open(lock_path, 'a+b') as f:
+        waited = time.perf_counter() if instrument.ENABLED else None
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:   # LK_LOCK gives up after ~10s; keep waiting
+                    continue
+        if waited is not None:
+            instrument.observe('storage.file_lock_wait', time.perf_counter() - waited)
+        held[lock_path] = 1
+        try:
+            yield
+        finally:
+            held.pop(lock_path, None)
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# ------------------- VERSION CHECKS ------------------- #
+def file_etag(filename):
+    """Cheap version tag for a file: changes whenever it is rewritten or replaced."""
+    try:
+        st = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+@timed('storage.write_csv_if_unchanged')
+def write_csv_if_unchanged(filename, fieldnames, data, expected_etag, as_lists=False):
+    """
+    Optimistic write: replace `filename` only if its etag still matches the one
+    seen when the data was read. Raises ConcurrentModificationError otherwise.
+    Returns the etag of the newly written file.
+    """
+    tmp = write_csv_temp(filename, fieldnames, data, as_lists)
+    try:
+        with file_lock(filename):
+            if file_etag(filename) != expected_etag:
+                raise ConcurrentModificationError(f"{filename} was modified by another process")
+            os.replace(tmp, filename)
+            return file_etag(filename)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def retry_on_conflict(func, attempts=50, base_delay=0.002):
+    """Call func() until it stops raising ConcurrentModificationError, with jittered backoff."""
+    for attempt in range(attempts):
+        try:
+            return func()
+        except ConcurrentModificationError:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(base_delay * (attempt + 1) * random.uniform(0.5, 1.5))
+
+
+def field_limit_error(row, limits):
+    """Why a product row does not fit `limits` (see Backend.field_limits), or None if it does."""
+    for field, limit in limits.items():
+        size = len(str(row.get(field) or '').encode('utf-8'))
+        if size > limit:
+            return f"{field} is {size} bytes long; this catalog holds at most {limit}"
+    return None
+
+
+def line_item_rows(order_id, customer_id, day, items):
+    """Fact-log rows (LINE_ITEM_FIELDS) for an order's items; `day` is 'YYYY-MM-DD'."""
+    return [{'order_id': order_id, 'customer_id': customer_id, 'product_id': it['product_id'],
+             'qty': int(it['qty']), 'unit_price': it['price'], 'date': day} for it in items]
+
+
+# ------------------- EXTERNAL SORT ------------------- #
+SORT_CHUNK_ROWS = int(os.environ.get('INVENTORY_SORT_CHUNK_ROWS', '0')) or 100000
+
+
+def _spill(chunk, key, tmp_dir):
+    chunk.sort(key=key)
+    fd, path = tempfile.mkstemp(suffix='.csv', dir=tmp_dir)
+    with os.fdopen(fd, 'w', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows(chunk)
+    return path
+
+
+def _merge_runs(paths, key):
+    files = [open(path, newline='', encoding='utf-8') for path in paths]
+    try:
+        yield from heapq.merge(*map(csv.reader, files), key=key)
+    finally:
+        for f in files:
+            f.close()
+
+
+def sort_rows(rows, key, tmp_dir, chunk_rows=None):
+    """
+    Value lists (strings) ordered by key(row), holding at most `chunk_rows`
+    of them in memory: each chunk is sorted and spilled to a CSV run under
+    `tmp_dir`, and the runs are merged as they are read back. `rows` is
+    consumed before this returns.
+    """
+    chunk_rows = chunk_rows or SORT_CHUNK_ROWS
+    runs, chunk = [], []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_rows:
+            runs.append(_spill(chunk, key, tmp_dir))
+            chunk = []
+    if not runs:
+        return iter(sorted(chunk, key=key))
+    if chunk:
+        runs.append(_spill(chunk, key, tmp_dir))
+    return _merge_runs(runs, key)
+
+
+def _join_feed(feed, positions, new_rows, counts):
+    """
+    Walk the feed (sorted by product_id, then feed order) against the
+    catalog's (product_id, position) pairs. Yields [position, *values] for
+    products already in the catalog; new ones go to `new_rows`.
+    """
+    at = next(positions, None)
+    for pid, group in itertools.groupby(feed, key=itemgetter(1)):
+        *_, last = group   # the feed's last row for a product wins
+        while at is not None and at[0] < pid:
+            at = next(positions, None)
+        if at is not None and at[0] == pid:
+            yield [at[1]] + last[1:]
+        else:
+            new_rows.writerow(last[1:])
+            counts['inserted'] += 1
+
+
+@contextlib.contextmanager
+def merge_product_feed(existing, rows, tmp_dir=None):
+    """
+    Upsert a product feed of any size into a catalog in bounded memory.
+    `existing()` yields the catalog's value lists in file order, and is
+    called twice; `rows` are validated product dicts.
+
+    The feed and the catalog's product IDs are sorted into runs on disk and
+    merge-joined. The updates are then re-sorted by catalog position, so
+    one more pass over the catalog can substitute them. New products
+    follow in product_id order. Yields ({'received', 'inserted'}, merged
+    value lists) for the caller to write while it holds its lock.
+    """
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as tmp:
+        counts = {'received': 0, 'inserted': 0}
+        seq = itertools.count()
+        feed = sort_rows(([f"{next(seq):012d}"] + [r.get(k, '') for k in PRODUCT_FIELDS] for r in rows),
+                         key=lambda v: (v[1], v[0]), tmp_dir=tmp)
+        counts['received'] = next(seq)
+        positions = sort_rows(([values[0], f"{pos:012d}"] for pos, values in enumerate(existing())),
+                              key=itemgetter(0), tmp_dir=tmp)
+        new_path = os.path.join(tmp, 'new.csv')
+        with open(new_path, 'w', newline='', encoding='utf-8') as f:
+            updates = sort_rows(_join_feed(feed, positions, csv.writer(f), counts), key=itemgetter(0), tmp_dir=tmp)
+
+        def merged():
+            pending = next(updates, None)
+            for pos, values in enumerate(existing()):
+                if pending is not None and pending[0] == f"{pos:012d}":
+                    yield pending[1:]
+                    pending = next(updates, None)
+                else:
+                    yield values
+            with open(new_path, newline='', encoding='utf-8') as f:
+                yield from csv.reader(f)
+
+        try:
+            yield counts, merged()
+        finally:
+            for runs in (positions, updates):
+                if hasattr(runs, 'close'):
+                    runs.close()   # so the run files can be removed on Windows too
+
+
+# ------------------- BACKEND INTERFACE ------------------- #
+class Backend:
+    """
+    Persistence interface for products, customers, admins and the sales log.
+    Rows are plain dicts of strings laid out as *_FIELDS above, whatever the
+    engine underneath. Select an implementation with INVENTORY_BACKEND.
+    """
+    name = None
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self._product_listeners = []
+
+    # Change notifications
+    def subscribe_products(self, listener):
+        """
+        Call listener(changes, before, after) after each product write made
+        through this instance. `changes` is a list of (product_id, old row,
+        new row), with None for a missing side (insert / delete), or None when
+        everything may have changed (bulk import). `before` and `after` are
+        products_version() tokens around the write.
+        """
+        self._product_listeners.append(listener)
+
+    def _notify_products(self, changes, before=None, after=None):
+        for listener in self._product_listeners:
+            listener(changes, before, after)
+
+    def products_version(self):
+        """
+        Token that changes whenever the products change, including writes by
+        other processes; None if the backend cannot tell.
+        """
+        return None
+
+    def names_version(self, version=None):
+        """
+        Like products_version(), but free to stay put on a write that only
+        changes stock, for indexes of product IDs and names. With `version`
+        (a products_version() token, e.g. one passed to a listener), the
+        names version as of that token. By default it is products_version().
+        """
+        return self.products_version() if version is None else version
+
+    # Products
+    def field_limits(self):
+        """Most UTF-8 bytes each product field can hold, {field: bytes}; {} if there is no limit."""
+        return {}
+
+    def list_products(self):
+        raise NotImplementedError
+
+    def get_product(self, pid):
+        raise NotImplementedError
+
+    def upsert_products(self, rows):
+        """Insert or replace products, matched on product_id."""
+        raise NotImplementedError
+
+    def delete_product(self, pid):
+        """Delete a product. Returns False if it did not exist."""
+        raise NotImplementedError
+
+    def import_products(self, rows):
+        """
+        Upsert a (possibly very large) stream of validated product rows,
+        writing the catalog once. Returns {'inserted': n, 'updated': n}.
+        """
+        rows = list(rows)
+        before = len(self.list_products())
+        self.upsert_products(rows)
+        inserted = len(self.list_products()) - before
+        return {'inserted': inserted, 'updated': len(rows) - inserted}
+
+    def iter_products(self):
+        """Yield every product row (used for exports)."""
+        return iter(self.list_products())
+
+    def set_stock(self, pid, stock):
+        raise NotImplementedError
+
+    def adjust_stock(self, changes):
+        """
+        Apply product_id -> signed delta atomically; raise StockError (and
+        change nothing) if a product is unknown or would go negative.
+        Returns product_id -> new stock.
+        """
+        raise NotImplementedError
+
+    # Customers / admins
+    def list_customers(self):
+        raise NotImplementedError
+
+    def get_customer(self, cid):
+        raise NotImplementedError
+
+    def add_customer(self, row):
+        """Store a new customer. Returns False if the customer_id is already taken."""
+        raise NotImplementedError
+
+    def update_customer(self, row):
+        """Replace an existing customer's name/password, matched on customer_id."""
+        raise NotImplementedError
+
+    def list_admins(self):
+        raise NotImplementedError
+
+    def get_admin(self, username):
+        raise NotImplementedError
+
+    def update_admin(self, row):
+        """Replace an existing admin's password, matched on username."""
+        raise NotImplementedError
+
+    # Reorder levels (per-product low-stock thresholds)
+    def list_reorder_levels(self):
+        """product_id -> reorder level, for products that have one set."""
+        raise NotImplementedError
+
+    def set_reorder_level(self, pid, level):
+        """Set a product's reorder level; None clears it."""
+        raise NotImplementedError
+
+    def reorder_levels_version(self):
+        """Token that changes when any terminal changes a reorder level; None if the backend cannot tell."""
+        return None
+
+    # Stock holds (units reserved by open carts, see reservations.py)
+    def holds_lock(self):
+        """Inter-process lock held while holds are checked and changed, together with any stock they guard."""
+        return file_lock(os.path.join(self.data_dir, 'holds'))
+
+    def list_holds(self):
+        """Holds with qty > 0 as HOLD_FIELDS rows (expired ones may still be among them)."""
+        raise NotImplementedError
+
+    def put_holds(self, rows):
+        """Insert or replace holds, matched on hold_id; a qty of 0 releases one."""
+        raise NotImplementedError
+
+    def holds_version(self):
+        """Token that changes when another terminal changes the holds; None if the backend cannot tell."""
+        return None
+
+    def purge_holds(self, now):
+        """Drop released holds, and those that expired before `now`, from storage."""
+
+    # Sales log
+    def append_sale(self, order_id, customer_id, sale_date, total, items=None):
+        """
+        Record one order. `items` ({'product_id', 'qty', 'price'} dicts) also go
+        to the line-item fact log, one row per line.
+        """
+        raise NotImplementedError
+
+    def append_line_items(self, order_id, customer_id, sale_date, items):
+        """Add line items for an order already in the sales log (e.g. rebuilt from its bill)."""
+        raise NotImplementedError
+
+    def iter_line_items(self, start_date, end_date):
+        """
+        Yield line items dated start_date..end_date inclusive as value sequences
+        in LINE_ITEM_FIELDS order (no dict per row: these scans can be long).
+        """
+        raise NotImplementedError
+
+    def iter_sales(self, start_date, end_date):
+        """Yield sales rows dated start_date..end_date inclusive."""
+        raise NotImplementedError
+
+    def daily_totals(self, start_date, end_date):
+        """Per-day {'date', 'orders', 'revenue', 'customer_ids'} for the range, sorted by date."""
+        raise NotImplementedError
+
+    def rebuild_rollups(self):
+        """Recompute the per-day totals from the raw sales rows."""
+        raise NotImplementedError
+
+    # Optional hooks
+    def catalog_stats(self):
+        return {}
+
+    def invalidate(self):
+        """Forget any cached state so the next read sees the store as it is now."""
+
+    def compact(self):
+        """Fold any pending change log into the main store."""
+
+    def close(self):
+        pass
+
+
+BACKENDS = {
+    'csv': ('csv_backend', 'CsvBackend'),
+    'sqlite': ('sqlite_backend', 'SqliteBackend'),
+    'mmap': ('mmap_backend', 'MmapBackend'),
+}
+_backends = {}
+
+
+def open_backend(name, data_dir):
+    """Create a fresh backend instance (used by get_backend and the migration tool)."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown storage backend {name!r}; choose one of {', '.join(BACKENDS)}")
+    module_name, class_name = BACKENDS[name]
+    return getattr(importlib.import_module(module_name), class_name)(data_dir)
+
+
+def get_backend():
+    """Return the configured backend for the current DATA_DIR (one shared instance each)."""
+    key = (BACKEND, DATA_DIR)
+    backend = _backends.get(key)
+    if backend is None:
+        backend = _backends[key] = open_backend(BACKEND, DATA_DIR)
+    return backend
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# src/stores.py
+"""
+Multi-store chains: one data directory (shard) per store, plus head-office
+reports that read every shard at once.
+
+    python src/stores.py create S01               # new store, with the admin logins of data/
+    python src/stores.py list
+    python src/main.py --store S01                # a console session for one store (or INVENTORY_STORE=S01)
+    python src/stores.py sales [START END] [--workers N]
+    python src/stores.py low-stock [--threshold N] [--workers N]
+
+Store S01 keeps its products, customers, sales, holds and demand rates in
+data/stores/S01/ (INVENTORY_STORES_DIR moves the stores elsewhere), its
+bills in data/stores/S01/bills and its reports in reports/S01/. A session
+picks its store once, before the app modules are imported, so everything
+below storage.get_backend() works on that shard unchanged.
+
+Head-office reports fan out over a process pool, one task per store. Each
+task opens its store's backend and returns a small partial aggregate: sales
+totals, the store's customer IDs and units/revenue per product, or just its
+low-stock products. The parent merges the partials. A customer who shops at
+several stores counts once in the chain total. How much the pool gains
+depends on free cores; benchmarks/bench_stores.py measures it.
+"""
+import argparse
+import concurrent.futures
+import datetime
+import heapq
+import os
+import re
+import shutil
+import sys
+import storage
+from storage import open_backend
+
+STORES_DIR = os.environ.get('INVENTORY_STORES_DIR') or os.path.join(storage.DATA_DIR, 'stores')
+TOP_N = 20
+_STORE_ID = re.compile(r'^[A-Za-z0-9_-]{1,32}$')
+
+CURRENT = None   # the store this session works on (None: plain data/)
+
+
+# ------------------- STORE SELECTION ------------------- #
+def store_dir(store_id):
+    if not _STORE_ID.match(store_id or ''):
+        raise ValueError(f"invalid store ID {store_id!r}: use letters, digits, '-' and '_'")
+    return os.path.join(STORES_DIR, store_id)
+
+
+def list_stores():
+    """Store IDs that have a data directory, sorted."""
+    if not os.path.isdir(STORES_DIR):
+        return []
+    return sorted(name for name in os.listdir(STORES_DIR)
+                  if _STORE_ID.match(name) and os.path.isdir(os.path.join(STORES_DIR, name)))
+
+
+def create_store(store_id, admins_from=None):
+    """Make a store's data directory, copying admin.csv from `admins_from` (default data/). Returns its path."""
+    path = store_dir(store_id)
+    if os.path.isdir(path):
+        raise ValueError(f"store {store_id} already exists")
+    os.makedirs(path)
+    source = os.path.join(admins_from or storage.DATA_DIR, 'admin.csv')
+    if os.path.exists(source):
+        shutil.copyfile(source, os.path.join(path, 'admin.csv'))
+    return path
+
+
+def use_store(store_id):
+    """Point this session's storage (and so its bills, see billing.bills_folder) at one store's shard."""
+    global CURRENT
+    path = store_dir(store_id)
+    if not os.path.isdir(path):
+        raise ValueError(f"unknown store {store_id!r}; create it with: python src/stores.py create {store_id}")
+    CURRENT = store_id
+    storage.DATA_DIR = path
+    return path
+
+
+def reports_folder(base):
+    """Where this session's reports go: `base`, or base/<store> in a store session."""
+    return os.path.join(base, CURRENT) if CURRENT else base
+
+
+def configure_from_args(argv):
+    """Handle --store ID (default: INVENTORY_STORE); returns the other arguments."""
+    rest, store = [], os.environ.get('INVENTORY_STORE', '').strip() or None
+    args = list(argv)
+    while args:
+        arg = args.pop(0)
+        if arg == '--store' and args:
+            store = args.pop(0)
+        elif arg.startswith('--store='):
+            store = arg.split('=', 1)[1]
+        else:
+            rest.append(arg)
+    if store:
+        use_store(store)
+    return rest
+
+
+# ------------------- PER-SHARD WORK ------------------- #
+def shard_sales(task):
+    """One store's partial sales aggregate: totals from the daily rollups, units and revenue per product."""
+    store, data_dir, backend_name, start, end = task
+    backend = open_backend(backend_name, data_dir)
+    try:
+        orders, revenue, customers = 0, 0.0, set()
+        for day in backend.daily_totals(start, end):
+            orders += day['orders']
+            revenue += day['revenue']
+            customers |= day['customer_ids']
+        products = {}   # product_id -> [units, revenue]
+        for _, _, pid, qty, price, _ in backend.iter_line_items(start, end):
+            try:
+                qty = int(qty)
+                amount = qty * float(price)
+            except (TypeError, ValueError):
+                continue
+            totals = products.get(pid)
+            if totals is None:
+                products[pid] = [qty, amount]
+            else:
+                totals[0] += qty
+                totals[1] += amount
+    finally:
+        backend.close()
+    return {'store': store, 'orders': orders, 'revenue': revenue, 'customer_ids': customers,
+            'units': sum(t[0] for t in products.values()), 'products': products}
+
+
+def shard_low_stock(task):
+    """One store's products below `threshold`, or below their own reorder level when it is None."""
+    store, data_dir, backend_name, threshold = task
+    from low_stock import DEFAULT_REORDER_LEVEL
+    backend = open_backend(backend_name, data_dir)
+    try:
+        levels = backend.list_reorder_levels() if threshold is None else {}
+        count, low = 0, []
+        for row in backend.iter_products():
+            count += 1
+            try:
+                stock = int(float(row.get('stock') or 0))
+            except ValueError:
+                continue
+            level = threshold if threshold is not None else levels.get(row['product_id'], DEFAULT_REORDER_LEVEL)
+            if stock < level:
+                low.append((store, row['product_id'], row.get('name', ''), stock, level))
+    finally:
+        backend.close()
+    return {'store': store, 'products': count, 'low': low}
+
+
+def fan_out(work, tasks, workers=None):
+    """work(task) for every task, on a process pool of `workers` (default: one per core); 1 runs them here."""
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) < 2:
+        return [work(t) for t in tasks]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+        return list(pool.map(work, tasks))
+
+
+# ------------------- MERGE ------------------- #
+def merge_sales(partials):
+    """
+    Per-store rows (highest revenue first), chain totals and the chain's top
+    products by revenue. The chain's customers are the distinct IDs across
+    every store, not the sum of the stores' counts.
+    """
+    products, customers = {}, set()
+    for p in partials:
+        customers |= p['customer_ids']
+        for pid, (units, revenue) in p['products'].items():
+            totals = products.get(pid)
+            if totals is None:
+                products[pid] = [units, revenue]
+            else:
+                totals[0] += units
+                totals[1] += revenue
+    stores = sorted(({'store': p['store'], 'orders': p['orders'], 'customers': len(p['customer_ids']),
+                      'units': p['units'], 'revenue': round(p['revenue'], 2)} for p in partials),
+                    key=lambda r: (-r['revenue'], r['store']))
+    top = heapq.nsmallest(TOP_N, products.items(), key=lambda kv: (-kv[1][1], kv[0]))
+    return {
+        'stores': stores,
+        'total': {'stores': len(stores), 'orders': sum(r['orders'] for r in stores),
+                  'customers': len(customers), 'units': sum(r['units'] for r in stores),
+                  'revenue': round(sum(p['revenue'] for p in partials), 2)},
+        'top_products': [{'product_id': pid, 'units': units, 'revenue': round(revenue, 2)}
+                         for pid, (units, revenue) in top],
+    }
+
+
+def merge_low_stock(partials):
+    """Every store's low items (least stock against level first), and products low in the most stores."""
+    items = sorted((i for p in partials for i in p['low']), key=lambda i: (i[3] - i[4], i[0], i[1]))
+    by_product = {}
+    for store, pid, name, stock, _ in items:
+        entry = by_product.setdefault(pid, {'product_id': pid, 'name': name, 'stores_low': 0, 'stock': 0})
+        entry['stores_low'] += 1
+        entry['stock'] += stock
+    return {
+        'stores': sorted(({'store': p['store'], 'products': p['products'], 'low': len(p['low'])} for p in partials),
+                         key=lambda r: (-r['low'], r['store'])),
+        'items': [{'store': s, 'product_id': pid, 'name': name, 'stock': stock, 'reorder_level': level}
+                  for s, pid, name, stock, level in items],
+        'by_product': sorted(by_product.values(), key=lambda r: (-r['stores_low'], r['stock'], r['product_id'])),
+    }
+
+
+# ------------------- HEAD-OFFICE REPORTS ------------------- #
+def _stores(stores):
+    return [(s, store_dir(s)) for s in (stores if stores is not None else list_stores())]
+
+
+def sales_by_store(start_date, end_date, stores=None, workers=None):
+    """Chain sales for a date range, merged from every store's shard (see merge_sales)."""
+    tasks = [(s, path, storage.BACKEND, start_date, end_date) for s, path in _stores(stores)]
+    return merge_sales(fan_out(shard_sales, tasks, workers))
+
+
+def chain_low_stock(threshold=None, stores=None, workers=None):
+    """Low stock across the chain, merged from every store's shard (see merge_low_stock)."""
+    tasks = [(s, path, storage.BACKEND, threshold) for s, path in _stores(stores)]
+    return merge_low_stock(fan_out(shard_low_stock, tasks, workers))
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='python src/stores.py', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    create = commands.add_parser('create', help='add a store')
+    create.add_argument('store')
+    commands.add_parser('list', help='list the stores')
+    sales = commands.add_parser('sales', help='sales by store for a date range (default: today)')
+    sales.add_argument('dates', nargs='*', metavar='YYYY-MM-DD')
+    low = commands.add_parser('low-stock', help='low stock across every store')
+    low.add_argument('--threshold', type=int)
+    for p in (sales, low):
+        p.add_argument('--workers', type=int, help='processes (default: one per core)')
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'create':
+            print(f"✅ Store {args.store} created at {create_store(args.store)}")
+        elif args.command == 'list':
+            for store in list_stores():
+                print(store)
+        elif args.command == 'sales':
+            if len(args.dates) not in (0, 2):
+                parser.error("give both START and END, or neither")
+            today = datetime.date.today()
+            start, end = [datetime.date.fromisoformat(d) for d in args.dates] if args.dates else (today, today)
+            report = sales_by_store(start, end, workers=args.workers)
+            print(f"📊 Sales by store, {start} to {end}:")
+            print(f"{'Store':<12}{'Orders':>10}{'Customers':>11}{'Units':>10}{'Revenue':>15}")
+            for r in report['stores'] + [dict(report['total'], store='TOTAL')]:
+                print(f"{r['store']:<12}{r['orders']:>10}{r['customers']:>11}{r['units']:>10}{r['revenue']:>15.2f}")
+        else:
+            report = chain_low_stock(args.threshold, workers=args.workers)
+            print(f"📉 Low stock across {len(report['stores'])} stores ({len(report['items'])} items):")
+            print(f"{'Product':<14}{'Name':<25}{'Stores low':>11}{'Stock':>8}")
+            for r in report['by_product'][:TOP_N]:
+                print(f"{r['product_id']:<14}{r['name']:<25}{r['stores_low']:>11}{r['stock']:>8}")
+    except ValueError as exc:
+        print(f"❌ {exc}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,45 @@
+# tests/conftest.py
+"""Every test runs against its own scratch data directory, never data/."""
+import os
+import sys
+
+import pytest
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+for name in ('INVENTORY_SERVICE', 'INVENTORY_STORE', 'INVENTORY_DATA_DIR', 'INVENTORY_BACKEND',
+             'INVENTORY_STOCK_JOURNAL', 'INVENTORY_METRICS', 'INVENTORY_BILL_FILES'):
+    os.environ.pop(name, None)
+os.environ['INVENTORY_PASSWORD_ITERATIONS'] = '1000'   # fast logins; set before accounts is imported
+
+import billing   # noqa: E402
+import storage   # noqa: E402
+from storage import PRODUCT_FIELDS, CUSTOMER_FIELDS, atomic_write_csv   # noqa: E402
+
+PRODUCTS = [
+    {'product_id': 'P001', 'name': 'Basmati Rice 5kg', 'price': '450.00', 'stock': '20'},
+    {'product_id': 'P002', 'name': 'Green Tea', 'price': '120.50', 'stock': '5'},
+    {'product_id': 'P003', 'name': 'Rice Flour', 'price': '60.00', 'stock': '0'},
+]
+CUSTOMERS = [{'customer_id': 'C001', 'name': 'Asha', 'password': 'secret'}]
+
+
+@pytest.fixture(params=['csv'])
+def backend_name(request):
+    return request.param
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch, backend_name):
+    """A data dir seeded with PRODUCTS and CUSTOMERS, made the current one for `backend_name`."""
+    atomic_write_csv(str(tmp_path / 'products.csv'), PRODUCT_FIELDS, PRODUCTS)
+    atomic_write_csv(str(tmp_path / 'customers.csv'), CUSTOMER_FIELDS, CUSTOMERS)
+    monkeypatch.setattr(storage, 'DATA_DIR', str(tmp_path))
+    monkeypatch.setattr(storage, 'BACKEND', backend_name)
+    yield tmp_path
+    billing.wait_for_bills()
+    backend = storage._backends.pop((backend_name, str(tmp_path)), None)
+    if backend is not None:
+        backend.close()
@@ -0,0 +1,70 @@
+# tests/test_csv_backend.py
+import threading
+
+import pytest
+
+import storage
+from storage import ConcurrentModificationError, open_backend, retry_on_conflict
+
+
+def test_retry_on_conflict_retries_until_it_lands():
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ConcurrentModificationError("changed")
+        return 'done'
+
+    assert retry_on_conflict(flaky, base_delay=0) == 'done' and len(calls) == 3
+
+
+def test_retry_on_conflict_gives_up_and_passes_other_errors_on():
+    calls = []
+
+    def always():
+        calls.append(1)
+        raise ConcurrentModificationError("changed")
+
+    with pytest.raises(ConcurrentModificationError):
+        retry_on_conflict(always, attempts=4, base_delay=0)
+    assert len(calls) == 4
+    with pytest.raises(KeyError):
+        retry_on_conflict(lambda: {}['x'])
+
+
+def test_write_that_lost_the_race_is_redone_on_the_new_file(data_dir, monkeypatch):
+    ours, theirs = open_backend('csv', str(data_dir)), open_backend('csv', str(data_dir))
+    merged_values = ours.catalog.merged_values
+    raced = []
+
+    def racing(*args, **kwargs):
+        if not raced:   # the other terminal writes after we read, before we swap our file in
+            raced.append(theirs.adjust_stock({'P001': -5}))
+        return merged_values(*args, **kwargs)
+
+    monkeypatch.setattr(ours.catalog, 'merged_values', racing)
+    assert ours.adjust_stock({'P001': -1}) == {'P001': 14}
+    assert len(raced) == 1
+    assert storage.read_csv(str(data_dir / 'products.csv'))[0]['stock'] == '14'
+
+
+def test_terminals_writing_at_once_lose_no_update(data_dir):
+    refused = []
+
+    def terminal():
+        backend = open_backend('csv', str(data_dir))
+        for _ in range(6):
+            try:
+                backend.adjust_stock({'P001': -1, 'P002': 1})
+            except storage.StockError:
+                refused.append(1)
+
+    threads = [threading.Thread(target=terminal) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stock = {r['product_id']: r['stock'] for r in storage.read_csv(str(data_dir / 'products.csv'))}
+    assert len(refused) == 4
+    assert (stock['P001'], stock['P002']) == ('0', '25')
@@ -0,0 +1,17 @@
+# tests/test_customer.py
+import customer
+import products
+
+
+def line(pid, qty):
+    return {'product_id': pid, 'name': pid, 'price': '1.00', 'qty': qty}
+
+
+def test_checkout_returns_the_order_or_none(data_dir, capsys):
+    assert customer.checkout('C001', []) is None
+    assert "Cart is empty" in capsys.readouterr().out
+    assert customer.checkout('C001', [line('P002', 9)]) is None
+    assert "Checkout failed: stock unchanged" in capsys.readouterr().out
+    order = customer.checkout('C001', [line('P002', 2)])
+    assert order['stock'] == {'P002': 3} and order['order_id'] in capsys.readouterr().out
+    assert products.find_product('P002')['stock'] == '3'
@@ -0,0 +1,75 @@
+# tests/test_ids.py
+import multiprocessing
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+import ids
+import storage
+
+needs_fork = pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs fork")
+
+TERMINAL = textwrap.dedent("""
+    import os, sys
+    sys.path.insert(0, {src!r})
+    import ids
+    ids.new_id()
+    print(ids._generator.node, flush=True)
+    if hasattr(os, 'fork'):
+        pid = os.fork()
+        if pid == 0:
+            ids.new_id()
+            print(ids._generator.node, flush=True)
+            os._exit(0)
+        os.waitpid(pid, 0)
+    print('ready', flush=True)
+    sys.stdin.readline()   # keep the lease until the test lets go
+""")
+
+
+def start_terminal(data_dir, node_id):
+    env = dict(os.environ, INVENTORY_DATA_DIR=str(data_dir), INVENTORY_NODE_ID=str(node_id))
+    proc = subprocess.Popen([sys.executable, '-c', TERMINAL.format(src=os.path.dirname(ids.__file__))],
+                            env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    lines = []
+    while not lines or lines[-1] != 'ready':
+        lines.append(proc.stdout.readline().strip())
+    return proc, [int(n) for n in lines[:-1]]
+
+
+@needs_fork
+def test_terminals_and_their_children_lease_distinct_nodes(tmp_path):
+    first, first_nodes = start_terminal(tmp_path, 777)
+    second, second_nodes = start_terminal(tmp_path, 777)   # same setting by mistake
+    try:
+        assert first_nodes == [777, 778]     # the configured node, then the next free one for the child
+        assert second_nodes == [778, 779]    # 777 is taken; 778 was given back when the child exited
+    finally:
+        for proc in (first, second):
+            proc.communicate('\n', timeout=10)
+
+
+def node_of_a_pool_worker(_):
+    ids.new_id()
+    return os.getpid(), ids._generator.node
+
+
+@needs_fork
+def test_forked_workers_never_share_a_node(data_dir):
+    ids.new_id()
+    with multiprocessing.get_context('fork').Pool(4) as pool:
+        workers = dict(pool.map(node_of_a_pool_worker, range(8), chunksize=1))
+    assert len(set(workers.values())) == len(workers)
+    assert ids._generator.node not in workers.values()
+
+
+def test_node_falls_back_to_the_process_id_without_a_lease_file(tmp_path, monkeypatch):
+    not_a_dir = tmp_path / 'file'
+    not_a_dir.write_text('')
+    monkeypatch.setattr(storage, 'DATA_DIR', str(not_a_dir))
+    generator = ids.IdGenerator()
+    first, second = generator.new_id(), generator.new_id()
+    assert generator.node == os.getpid() & 0xFFFF and first < second
@@ -0,0 +1,39 @@
+# tests/test_low_stock.py
+import low_stock
+import products
+import storage
+from storage import open_backend
+
+
+def test_levels_are_read_only_when_they_change(data_dir, monkeypatch):
+    backend = products.get_backend()
+    reads = []
+    real = backend.list_reorder_levels
+    monkeypatch.setattr(backend, 'list_reorder_levels', lambda: reads.append(1) or real())
+    products.set_reorder_level('P001', 25)
+    assert products.low_stock_items() == [('P001', 20, 25), ('P003', 0, 5)]
+    assert products.reorder_level('P001') == 25
+    reads.clear()
+
+    for _ in range(3):
+        products.low_stock_items()
+        products.adjust_stock({'P002': -1})
+        products.reorder_level('P002')
+    assert reads == []
+
+    other_terminal = open_backend(storage.BACKEND, str(data_dir))
+    other_terminal.set_reorder_level('P002', 10)
+    assert products.low_stock_items() == [('P002', 2, 10), ('P001', 20, 25), ('P003', 0, 5)]
+    assert products.reorder_level('P002') == 10
+    assert reads
+
+
+def test_crossing_the_level_raises_one_event(data_dir):
+    events = []
+    low_stock.on_low_stock(events.append)
+    try:
+        products.adjust_stock({'P002': -1})
+        products.adjust_stock({'P002': -1})
+    finally:
+        low_stock._callbacks.remove(events.append)
+    assert [(e['product_id'], e['stock'], e['reorder_level']) for e in events] == [('P002', 4, 5)]
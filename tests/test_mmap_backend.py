@@ -0,0 +1,136 @@
+# tests/test_mmap_backend.py
+import builtins
+import threading
+
+import pytest
+
+import admin
+import mmap_backend
+import product_feed
+import products
+import search
+from storage import StockError, open_backend
+
+LONG_NAME = 'x' * 120
+on_mmap = pytest.mark.parametrize('backend_name', ['mmap'])
+
+
+@on_mmap
+def test_feed_rejects_rows_that_do_not_fit(data_dir, tmp_path):
+    feed = tmp_path / 'feed.csv'
+    feed.write_text("product_id,name,price,stock\n"
+                    f"P010,{LONG_NAME},1.00,3\n"
+                    "P011,Sugar,2.00,4\n", encoding='utf-8')
+    result = product_feed.import_feed(str(feed))
+    assert (result['accepted'], result['rejected']) == (1, 1)
+    assert result['errors'] == [(2, "name is 120 bytes long; this catalog holds at most 96")]
+    assert products.find_product('P011')['name'] == 'Sugar'
+    assert products.find_product('P010') is None
+
+
+@on_mmap
+def test_update_product_asks_again_for_a_name_that_does_not_fit(data_dir, monkeypatch, capsys):
+    answers = iter(['P001', LONG_NAME, 'Rice', '', '', ''])
+    monkeypatch.setattr(builtins, 'input', lambda prompt='': next(answers))
+    admin.update_product()
+    assert "Too long: name is 120 bytes long" in capsys.readouterr().out
+    assert products.find_product('P001')['name'] == 'Rice'
+
+
+def test_csv_catalog_has_no_limits(data_dir):
+    assert products.field_limits() == {}
+    assert product_feed.validate_product({'product_id': 'P1', 'name': LONG_NAME, 'price': '1', 'stock': '1'},
+                                         products.field_limits())[1] is None
+
+
+@on_mmap
+def test_backend_write_past_a_limit_changes_nothing(data_dir):
+    backend = open_backend('mmap', str(data_dir))
+    with pytest.raises(ValueError, match="longer than 96 bytes"):
+        backend.upsert_products([{'product_id': 'P001', 'name': LONG_NAME, 'price': '1', 'stock': '1'}])
+    assert backend.get_product('P001')['name'] == 'Basmati Rice 5kg'
+
+
+@on_mmap
+def test_other_terminals_stock_writes_keep_the_name_index(data_dir):
+    monitor = search.watch(products.get_backend())
+    index = monitor.index()
+    other_terminal = open_backend('mmap', str(data_dir))
+    other_terminal.adjust_stock({'P001': -1})
+    other_terminal.set_stock('P002', 9)
+    assert monitor.index() is index
+    products.adjust_stock({'P001': -1})   # and our own
+    assert monitor.index() is index
+    other_terminal.upsert_products([{'product_id': 'P002', 'name': 'Jasmine Tea', 'price': '120.50', 'stock': '9'}])
+    assert monitor.index() is not index
+    assert products.search_products('jasm') == (1, [products.find_product('P002')])
+
+
+def renamed(pid, name):
+    row = dict(products.find_product(pid))
+    row['name'] = name
+    return row
+
+
+@on_mmap
+def test_stock_is_written_in_place_and_edits_move_the_product(data_dir):
+    catalog = products.get_backend().catalog
+    products.find_product('P001')
+    slots = catalog.stats()['slots']
+    products.adjust_stock({'P001': -1})
+    products.update_stock('P002', 9)
+    assert (catalog.stats()['slots'], catalog.stats()['retired_slots']) == (slots, 0)
+    products.save_product(renamed('P001', 'Brown Rice'))
+    assert (catalog.stats()['slots'], catalog.stats()['retired_slots']) == (slots + 1, 1)
+    assert products.remove_product('P003') is True
+    assert catalog.stats()['retired_slots'] == 2
+    other_terminal = open_backend('mmap', str(data_dir))
+    assert [(r['product_id'], r['name'], r['stock']) for r in other_terminal.list_products()] == \
+        [('P002', 'Green Tea', '9'), ('P001', 'Brown Rice', '19')]
+
+
+@on_mmap
+def test_retired_slots_are_reclaimed(data_dir, monkeypatch):
+    monkeypatch.setattr(mmap_backend, 'MIN_SLOTS', 4)
+    catalog = products.get_backend().catalog
+    other_terminal = open_backend('mmap', str(data_dir))
+    other_terminal.get_product('P001')   # mapped before the file is compacted
+    for i in range(5):
+        products.save_product(renamed('P002', f"Green Tea {i}"))
+    stats = catalog.stats()
+    assert (stats['products'], stats['slots'], stats['retired_slots']) == (3, 3, 0)
+    assert products.find_product('P002')['name'] == 'Green Tea 4'
+    assert other_terminal.get_product('P002')['name'] == 'Green Tea 4'
+    other_terminal.adjust_stock({'P001': -2})
+    assert products.find_product('P001')['stock'] == '18'
+
+
+@on_mmap
+def test_terminals_writing_stock_in_place_at_once(data_dir):
+    refused, seen, done = [], [], threading.Event()
+
+    def terminal():
+        backend = open_backend('mmap', str(data_dir))
+        for _ in range(6):
+            try:
+                backend.adjust_stock({'P001': -1})
+            except StockError:
+                refused.append(1)
+
+    def reader():   # reads without the lock: every value is whole and stock only falls
+        backend = open_backend('mmap', str(data_dir))
+        while not done.is_set():
+            seen.append(int(backend.get_product('P001')['stock']))
+
+    watcher = threading.Thread(target=reader)
+    watcher.start()
+    threads = [threading.Thread(target=terminal) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    done.set()
+    watcher.join()
+    assert len(refused) == 4 and products.find_product('P001')['stock'] == '0'
+    assert seen == sorted(seen, reverse=True) and set(seen) <= set(range(21))
+    assert products.get_backend().catalog.stats()['retired_slots'] == 0
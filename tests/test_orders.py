@@ -0,0 +1,90 @@
+# tests/test_orders.py
+import datetime
+import json
+import threading
+
+import pytest
+
+import billing
+import orders
+import products
+import sales
+
+TODAY = datetime.date.today()
+
+
+def sold():
+    return [(s['customer_id'], float(s['total'])) for s in sales.iter_sales(TODAY, TODAY)]
+
+
+def test_order_takes_stock_bills_and_logs_the_sale(data_dir):
+    order = orders.place_order('C001', [('P001', 2), {'product_id': 'P002', 'qty': '1'}, ('P001', 1)])
+    assert [(it['product_id'], it['qty']) for it in order['items']] == [('P001', 3), ('P002', 1)]
+    assert (order['total'], order['stock']) == (1470.5, {'P001': 17, 'P002': 4})
+    assert order['bill']['order_id'] == order['order_id']
+    assert sold() == [('C001', 1470.5)]
+
+
+@pytest.mark.parametrize('lines, error', [
+    ([('P001', 1), ('P002', 6)], "stock unchanged"),
+    ([('P001', 1), ('P999', 1)], "product not found: P999"),
+    ([('P001', 0)], "quantity must be a whole number above zero"),
+    ([], "at least one"),
+])
+def test_failed_order_takes_nothing(data_dir, lines, error):
+    with pytest.raises(orders.OrderError, match=error):
+        orders.place_order('C001', lines)
+    assert [p['stock'] for p in products.list_products()] == ['20', '5', '0']
+    assert sold() == []
+
+
+def test_stock_is_put_back_when_the_sale_cannot_be_logged(data_dir, monkeypatch):
+    def disk_full(*args):
+        raise OSError(28, "No space left on device")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(orders, 'append_sale', disk_full)
+        with pytest.raises(orders.OrderError, match="stock unchanged: the sale could not be logged"):
+            orders.place_order('C001', [('P001', 2), ('P002', 1)])
+    assert [p['stock'] for p in products.list_products()] == ['20', '5', '0']
+    assert billing.find_bills('C001') == []
+    order = orders.place_order('C001', [('P001', 2)])
+    assert [b['bill_id'] for b in billing.find_bills('C001')] == [order['bill']['bill_id']]
+
+
+def test_unknown_customer_is_refused(data_dir):
+    with pytest.raises(orders.OrderError, match="unknown customer"):
+        orders.place_order('C999', [('P001', 1)])
+    assert products.find_product('P001')['stock'] == '20'
+
+
+def test_concurrent_orders_sell_exactly_the_stock(data_dir):
+    placed, refused = [], []
+
+    def buy():
+        try:
+            placed.append(orders.place_order('C001', [('P002', 1)]))
+        except orders.OrderError:
+            refused.append(1)
+
+    threads = [threading.Thread(target=buy) for _ in range(12)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert (len(placed), len(refused)) == (5, 7)
+    assert products.find_product('P002')['stock'] == '0'
+    assert len({o['order_id'] for o in placed}) == 5 and len(sold()) == 5
+
+
+def test_batch_places_good_orders_and_lists_failures(data_dir, tmp_path):
+    batch = tmp_path / 'orders.jsonl'
+    batch.write_text('\n'.join(json.dumps(o) for o in [
+        {'customer_id': 'C001', 'lines': [['P001', 2]]},
+        {'customer_id': 'C001', 'lines': [['P003', 1]]},
+        {'customer_id': 'C999', 'lines': [['P001', 1]]},
+    ]) + '\nnot json\n', encoding='utf-8')
+    result = orders.run_batch(str(batch), workers=2)
+    assert (result['read'], result['placed'], result['failed'], result['revenue']) == (4, 1, 3, 900.0)
+    assert sorted(line for line, _ in result['errors']) == [2, 3, 4]
+    assert products.find_product('P001')['stock'] == '18'
@@ -0,0 +1,85 @@
+# tests/test_product_feed.py
+import csv
+import json
+
+import pytest
+
+import product_feed
+import products
+import storage
+
+
+def read_rejects(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return [(int(r['line']), r['error'], r['row']) for r in csv.DictReader(f)]
+
+
+def test_csv_feed_keeps_good_rows_and_lists_the_rest(data_dir, tmp_path):
+    feed = tmp_path / 'feed.csv'
+    feed.write_text("product_id,name,price,stock\n"
+                    "P002,Green Tea,125.00,8\n"      # update
+                    "P010,Sugar,40,2.0\n"            # insert; stock written as a float
+                    "P011,Salt,-1,3\n"
+                    "P012,,5,3\n"
+                    "P013,Oil,abc,3\n"
+                    "P014,Ghee,90,1.5\n"
+                    "P015,Dal,70\n", encoding='utf-8')
+    result = product_feed.import_feed(str(feed))
+    assert {k: result[k] for k in ('read', 'accepted', 'rejected', 'inserted', 'updated')} == \
+        {'read': 7, 'accepted': 2, 'rejected': 5, 'inserted': 1, 'updated': 1}
+    assert read_rejects(result['rejects_file']) == [
+        (4, "price '-1' must be zero or more", json.dumps({'product_id': 'P011', 'name': 'Salt', 'price': '-1',
+                                                           'stock': '3'})),
+        (5, "missing name", json.dumps({'product_id': 'P012', 'name': '', 'price': '5', 'stock': '3'})),
+        (6, "price 'abc' is not a number", json.dumps({'product_id': 'P013', 'name': 'Oil', 'price': 'abc',
+                                                      'stock': '3'})),
+        (7, "stock '1.5' must be a whole number, zero or more",
+         json.dumps({'product_id': 'P014', 'name': 'Ghee', 'price': '90', 'stock': '1.5'})),
+        (8, "expected 4 values, got 3", json.dumps(['P015', 'Dal', '70'])),
+    ]
+    assert products.find_product('P002') == {'product_id': 'P002', 'name': 'Green Tea', 'price': '125.00',
+                                             'stock': '8'}
+    assert products.find_product('P010')['stock'] == '2'
+    assert products.find_product('P011') is None and len(products.list_products()) == 4
+
+
+def test_jsonl_feed_rejects_bad_lines(data_dir, tmp_path):
+    feed = tmp_path / 'feed.jsonl'
+    feed.write_text('{"product_id": "P010", "name": "Sugar", "price": 40, "stock": 2}\n'
+                    '{"product_id": "P011", "name": "Salt"\n'
+                    '\n'
+                    '{"product_id": "P012", "name": "Oil", "price": 5, "stock": 1, "colour": "red"}\n'
+                    '["P013"]\n', encoding='utf-8')
+    result = product_feed.import_feed(str(feed))
+    assert (result['accepted'], result['rejected']) == (1, 3)
+    assert [(line, reason.split(':')[0]) for line, reason in result['errors']] == \
+        [(2, 'invalid JSON'), (4, 'unknown field(s)'), (5, 'not an object')]
+    assert products.find_product('P010')['price'] == '40'
+
+
+def test_clean_feed_leaves_no_rejects_file(data_dir, tmp_path):
+    feed = tmp_path / 'feed.csv'
+    (tmp_path / 'feed.csv.rejects.csv').write_text("stale\n", encoding='utf-8')
+    feed.write_text("product_id,name,price,stock\nP010,Sugar,40,2\n", encoding='utf-8')
+    result = product_feed.import_feed(str(feed))
+    assert (result['rejected'], result['rejects_file']) == (0, None)
+    assert not (tmp_path / 'feed.csv.rejects.csv').exists()
+
+
+@pytest.mark.parametrize('backend_name', ['csv', 'mmap'])
+def test_feed_larger_than_memory_is_merged_from_sorted_runs(data_dir, tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, 'SORT_CHUNK_ROWS', 2)   # every few rows spill to a run on disk
+    feed = tmp_path / 'feed.csv'
+    feed.write_text("product_id,name,price,stock\n"
+                    "P020,Oil,90,1\n"
+                    "P003,Rice Flour 1kg,65.00,4\n"
+                    "P010,Sugar,40,2\n"
+                    "P001,Basmati Rice 5kg,455.00,19\n"
+                    "P010,Sugar 1kg,42,3\n"            # a later row for the same product wins
+                    "P015,Salt,20,9\n", encoding='utf-8')
+    result = product_feed.import_feed(str(feed))
+    assert (result['accepted'], result['inserted'], result['updated']) == (6, 3, 3)
+    assert [(p['product_id'], p['name'], p['stock']) for p in products.list_products()] == [
+        ('P001', 'Basmati Rice 5kg', '19'), ('P002', 'Green Tea', '5'), ('P003', 'Rice Flour 1kg', '4'),
+        ('P010', 'Sugar 1kg', '3'), ('P015', 'Salt', '9'), ('P020', 'Oil', '1')]
+    assert not [p for p in data_dir.iterdir() if p.name.startswith('tmp')]   # the runs are gone
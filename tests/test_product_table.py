@@ -0,0 +1,25 @@
+# tests/test_product_table.py
+from product_table import ProductTable, ProductRows
+
+ROWS = [
+    {'product_id': 'P001', 'name': 'Rice', 'price': '450', 'stock': '20'},
+    {'product_id': 'P002', 'name': 'Tea', 'price': '120.5', 'stock': ''},
+    {'product_id': 'P003', 'name': 'Flour', 'price': '1.999', 'stock': '0'},
+]
+
+
+def test_rows_round_trip_as_written():
+    table = ProductTable.from_rows(ROWS)
+    assert list(ProductRows(table)) == ROWS
+    assert table.get('P002') == ROWS[1] and table.get('P999') is None
+
+
+def test_view_keeps_the_stock_it_was_made_with():
+    table = ProductTable.from_rows(ROWS)
+    view = ProductRows(table)
+    table.upsert({'product_id': 'P001', 'name': 'Rice', 'price': '450', 'stock': '19'})
+    table.upsert({'product_id': 'P002', 'name': 'Tea', 'price': '120.5', 'stock': '4'})
+    table.upsert({'product_id': 'P004', 'name': 'Salt', 'price': '20', 'stock': '7'})
+    assert [r['stock'] for r in view] == ['20', '', '0']
+    assert view[-1]['product_id'] == 'P003' and len(view) == 3
+    assert [r['stock'] for r in ProductRows(table)] == ['19', '4', '0', '7']
@@ -0,0 +1,103 @@
+# tests/test_reservations.py
+import threading
+import time
+
+import pytest
+
+import orders
+import products
+import reservations
+import storage
+from storage import open_backend
+
+
+def test_held_units_are_not_sold_to_other_carts(data_dir):
+    orders.hold_line('cartA', 'P002', 4)
+    assert orders.available_to_sell('P002') == 1
+    assert orders.available_to_sell('P002', 'cartA') == 5
+    with pytest.raises(orders.OrderError, match=r"only 1 available \(4 held in other carts\), 2 requested"):
+        orders.place_order('C001', [('P002', 2)])
+    with pytest.raises(orders.OrderError, match="only 1 available, 2 requested"):
+        orders.hold_line('cartB', 'P002', 2)
+    assert products.find_product('P002')['stock'] == '5'
+
+
+def test_checkout_turns_the_cart_into_the_sale(data_dir):
+    orders.hold_line('cartA', 'P002', 4)
+    orders.hold_line('cartA', 'P001', 1)
+    order = orders.place_order('C001', cart_id='cartA')
+    assert order['stock'] == {'P002': 1, 'P001': 19}
+    assert orders.cart_holds('cartA') == {} and orders.available_to_sell('P002') == 1
+
+
+def test_holds_move_release_and_expire(data_dir):
+    orders.hold_line('cartA', 'P002', 4)
+    orders.hold_line('cartA', 'P002', 2)    # replaces the first hold
+    assert orders.available_to_sell('P002') == 3
+    assert orders.hold_line('cartA', 'P002', 0) is None
+    assert orders.available_to_sell('P002') == 5
+    orders.hold_line('cartB', 'P002', 5, seconds=0.05)
+    assert orders.available_to_sell('P002') == 0
+    time.sleep(0.1)
+    assert orders.available_to_sell('P002') == 5 and orders.cart_holds('cartB') == {}
+
+
+def test_holds_from_another_terminal_count(data_dir):
+    orders.available_to_sell('P002')   # this terminal's ledger is built
+    other = reservations.watch(open_backend(storage.BACKEND, str(data_dir)))
+    with other.locked():
+        other.put([('their-cart', 'P002', 3)])
+    assert orders.available_to_sell('P002') == 2
+    with other.locked():
+        other.release_cart('their-cart')
+    assert orders.available_to_sell('P002') == 5
+
+
+def test_concurrent_holds_never_promise_more_than_the_stock(data_dir):
+    held, refused = [], []
+
+    def hold(cart_id):
+        try:
+            held.append(orders.hold_line(cart_id, 'P002', 1))
+        except orders.OrderError:
+            refused.append(cart_id)
+
+    threads = [threading.Thread(target=hold, args=(f"cart{i}",)) for i in range(12)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert (len(held), len(refused)) == (5, 7)
+    assert orders.available_to_sell('P002') == 0
+    assert len(storage.get_backend().list_holds()) == 5
+
+
+def test_holds_lock_is_taken_only_for_held_products(data_dir, monkeypatch):
+    monitor = reservations.watch(storage.get_backend())
+    locked = []
+    real = monitor.locked
+    monkeypatch.setattr(monitor, 'locked', lambda: locked.append(1) or real())
+    orders.place_order('C001', [('P001', 1), ('P002', 1)])
+    assert locked == []
+    orders.hold_line('cartA', 'P002', 2)
+    locked.clear()
+    orders.place_order('C001', [('P001', 1)])
+    assert locked == []
+    orders.place_order('C001', [('P002', 1)])
+    assert len(locked) == 1
+    orders.place_order('C001', cart_id='cartA')   # no other cart holds P002: just the release
+    assert len(locked) == 2 and orders.cart_holds('cartA') == {}
+    assert [products.find_product(pid)['stock'] for pid in ('P001', 'P002')] == ['18', '1']
+
+
+def test_a_failed_checkout_keeps_the_cart_held(data_dir, monkeypatch):
+    orders.hold_line('cartA', 'P002', 3)
+
+    def disk_full(*args):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(orders, 'append_sale', disk_full)
+    with pytest.raises(orders.OrderError, match="could not be logged"):
+        orders.place_order('C001', cart_id='cartA')
+    assert orders.cart_holds('cartA') == {'P002': 3}
+    assert products.find_product('P002')['stock'] == '5'
@@ -0,0 +1,53 @@
+# tests/test_sales.py
+import datetime
+import os
+
+import csv_backend
+import sales
+from storage import read_csv
+
+DAY = datetime.date(2026, 3, 14)
+NEXT = DAY + datetime.timedelta(days=1)
+
+
+def rollup(data_dir, name='rollup'):
+    return str(data_dir / 'sales' / f"{name}_2026-03.csv")
+
+
+def totals(day=DAY, end=NEXT):
+    return [(d['date'], d['orders'], d['revenue'], sorted(d['customer_ids'])) for d in sales.daily_totals(day, end)]
+
+
+def test_each_sale_is_appended_not_rewritten(data_dir):
+    sales.append_sale('ORD1', 'C001', DAY, 10.0)
+    inode = os.stat(rollup(data_dir)).st_ino
+    sales.append_sale('ORD2', 'C002', DAY, 5.5)
+    sales.append_sale('ORD3', 'C001', DAY, 4.5)
+    sales.append_sale('ORD4', 'C001', NEXT, 1.0)
+    assert os.stat(rollup(data_dir)).st_ino == inode
+    assert len(read_csv(rollup(data_dir))) == 4
+    assert [(r['date'], r['customer_id']) for r in read_csv(rollup(data_dir, 'rollup_customers'))] == \
+        [('2026-03-14', 'C001'), ('2026-03-14', 'C002'), ('2026-03-15', 'C001')]
+    assert totals() == [('2026-03-14', 3, 20.0, ['C001', 'C002']), ('2026-03-15', 1, 1.0, ['C001'])]
+    assert sales.summarize(DAY, NEXT)['customers'] == 2
+
+
+def test_reads_fold_a_month_once_it_carries_enough_rows(data_dir, monkeypatch):
+    monkeypatch.setattr(csv_backend, 'FOLD_ROLLUP_ROWS', 3)
+    for i in range(5):
+        sales.append_sale(f"ORD{i}", f"C00{i % 2}", DAY, 2.0)
+    expected = [('2026-03-14', 5, 10.0, ['C000', 'C001'])]
+    assert totals() == expected
+    assert read_csv(rollup(data_dir)) == [{'date': '2026-03-14', 'orders': '5', 'revenue': '10.0'}]
+    sales.append_sale('ORD5', 'C002', DAY, 1.0)   # appends again after the fold
+    assert totals() == [('2026-03-14', 6, 11.0, ['C000', 'C001', 'C002'])]
+
+
+def test_rollups_in_the_old_layout_are_rebuilt(data_dir):
+    sales.append_sale('ORD1', 'C001', DAY, 10.0)
+    with open(rollup(data_dir), 'w', encoding='utf-8') as f:
+        f.write('date,orders,revenue,customers,customer_ids\n2026-03-14,1,10.0,1,"[""C001""]"\n')
+    sales.append_sale('ORD2', 'C002', DAY, 5.0)
+    assert totals() == [('2026-03-14', 2, 15.0, ['C001', 'C002'])]
+    sales.rebuild_rollups()
+    assert totals() == [('2026-03-14', 2, 15.0, ['C001', 'C002'])]
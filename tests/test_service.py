@@ -0,0 +1,149 @@
+# tests/test_service.py
+"""Every @exposed operation, called through a real service over its Unix socket."""
+import asyncio
+import datetime
+import json
+import os
+import socket
+import stat
+import threading
+
+import pytest
+
+import accounts
+import demand      # noqa: F401  (registers its operations)
+import orders
+import products
+import service
+import storage
+from storage import ADMIN_FIELDS, atomic_write_csv
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason="needs Unix sockets")
+
+
+@pytest.fixture
+def client(data_dir):
+    atomic_write_csv(str(data_dir / 'admin.csv'), ADMIN_FIELDS,
+                     [{'username': 'boss', 'password': accounts.hash_password('pw')}])
+    server = service.Service(str(data_dir / service.SOCKET_NAME))
+    ready = threading.Event()
+    thread = threading.Thread(target=lambda: asyncio.run(server.serve(ready.set)), daemon=True)
+    thread.start()
+    assert ready.wait(10), "service did not start"
+    conn = service.Client(server.address, timeout=10)
+    yield conn
+    conn.close()
+    server.stop()
+    thread.join(10)
+
+
+def plain(value):
+    """What a result should look like after a trip through JSON."""
+    return json.loads(json.dumps(value, default=lambda v: v.isoformat() if isinstance(v, datetime.date) else list(v)))
+
+
+def local(op, *args, **kwargs):
+    return plain(service.OPS[op][0](*args, **kwargs))
+
+
+# op -> (args, check(result)); check runs after the call, against the data dir the service writes to
+CASES = {
+    'list_products': ((), lambda r: r == [dict(p) for p in products.list_products()] and len(r) == 3),
+    'find_product': (('P002',), lambda r: r == {'product_id': 'P002', 'name': 'Green Tea', 'price': '120.50',
+                                                 'stock': '5'}),
+    'add_product': (({'product_id': 'P004', 'name': 'Salt', 'price': '20', 'stock': '7'},),
+                    lambda r: r is None and products.find_product('P004')['stock'] == '7'),
+    'save_product': (({'product_id': 'P002', 'name': 'Green Tea 100g', 'price': '130', 'stock': '5'},),
+                     lambda r: r is None and products.find_product('P002')['name'] == 'Green Tea 100g'),
+    'remove_product': (('P003',), lambda r: r is True and products.find_product('P003') is None),
+    'update_stock': (('P001', 11), lambda r: r is None and products.find_product('P001')['stock'] == '11'),
+    'adjust_stock': (({'P001': -2, 'P002': 3},), lambda r: r == {'P001': 18, 'P002': 8}),
+    'field_limits': ((), lambda r: r == {}),
+    'low_stock_items': ((), lambda r: r == local('low_stock_items') and r == [['P003', 0, 5]]),
+    'invalid_stock_ids': ((), lambda r: r == []),
+    'reorder_level': (('P001',), lambda r: r == products.reorder_level('P001')),
+    'set_reorder_level': (('P001', 25), lambda r: r is None and products.reorder_level('P001') == 25),
+    'recent_low_stock_events': ((), lambda r: r == local('recent_low_stock_events')),
+    'search_products': (('ric',), lambda r: r[0] == 2 and {row['product_id'] for row in r[1]} == {'P001', 'P003'}),
+    'customer_exists': (('C001',), lambda r: r is True),
+    'create_customer': (('C002', 'Ravi', 'pw2'), lambda r: r is True and accounts.customer_exists('C002')),
+    'authenticate_customer': (('C001', 'secret'), lambda r: r == {'customer_id': 'C001', 'name': 'Asha'}),
+    'authenticate_admin': (('boss', 'pw'), lambda r: r == {'username': 'boss'}),
+    'available_to_sell': (('P002',), lambda r: r == 5),
+    'quote': (([['P001', 2]],), lambda r: r == [{'product_id': 'P001', 'name': 'Basmati Rice 5kg',
+                                                  'price': '450.00', 'qty': 2}]),
+    'hold_line': (('cart1', 'P002', 4), lambda r: r['qty'] == 4 and orders.available_to_sell('P002') == 1),
+    'release_cart': (('cart1',), lambda r: r is None),
+    'cart_holds': (('cart1',), lambda r: r == {}),
+    'place_order': (('C001', [['P001', 3]]),
+                    lambda r: r['date'] == datetime.date.today().isoformat() and r['stock'] == {'P001': 17}
+                    and r['total'] == 1350.0 and r['bill']['order_id'] == r['order_id']),
+    'demand_rate': (('P001',), lambda r: r == 0.0),
+    'reorder_suggestions': ((), lambda r: r == []),
+}
+
+
+def test_every_operation_has_a_case():
+    assert set(CASES) == set(service.OPS)
+
+
+@pytest.mark.parametrize('op', sorted(CASES))
+def test_round_trip(client, op):
+    args, check = CASES[op]
+    result = client.call(op, *args)
+    assert check(result), result
+
+
+def test_results_are_plain_json(client):
+    rows = client.call('list_products')
+    assert isinstance(rows, list) and rows[0]['product_id'] == 'P001'
+    assert client.call('low_stock_items', 10) == [['P003', 0], ['P002', 5]]
+
+
+def test_unencodable_result_fails_loudly(client, monkeypatch):
+    monkeypatch.setitem(service.OPS, 'odd', (lambda: object(), False))
+    client.close()   # operations are read per connection
+    with pytest.raises(TypeError, match="cannot be sent"):
+        client.call('odd')
+
+
+def test_errors_keep_their_class(client):
+    with pytest.raises(orders.OrderError, match="only 5 available"):
+        client.call('quote', [['P002', 9]], _errors=orders)
+    with pytest.raises(orders.OrderError, match="unknown customer"):
+        client.call('place_order', 'C999', [['P001', 1]], _errors=orders)
+    assert products.find_product('P001')['stock'] == '20'
+
+
+def test_logins_never_send_the_password(client):
+    assert 'password' not in client.call('authenticate_customer', 'C001', 'secret')
+    assert client.call('authenticate_customer', 'C001', 'wrong') is None
+    assert storage.get_backend().get_customer('C001')['password'].startswith(accounts.SCHEME)   # re-hashed
+
+
+def test_socket_is_owner_only(client, data_dir):
+    client.call('ping')
+    assert stat.S_IMODE(os.stat(data_dir / service.SOCKET_NAME).st_mode) == 0o600
+
+
+def test_concurrent_clients_sell_exactly_the_stock(client):
+    placed, refused = [], []
+
+    def customer():
+        conn = service.Client(client.address, timeout=10)
+        try:
+            for _ in range(3):
+                try:
+                    placed.append(conn.call('place_order', 'C001', [['P002', 1]], _errors=orders)['order_id'])
+                except orders.OrderError:
+                    refused.append(1)
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=customer) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert (len(set(placed)), len(refused)) == (5, 13)
+    assert client.call('find_product', 'P002')['stock'] == '0'
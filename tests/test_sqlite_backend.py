@@ -0,0 +1,40 @@
+# tests/test_sqlite_backend.py
+import datetime
+import threading
+
+from storage import open_backend
+
+TODAY = datetime.date.today()
+
+
+def test_versions_agree_across_threads(data_dir):
+    backend = open_backend('sqlite', str(data_dir))
+    backend.upsert_products([{'product_id': 'P001', 'name': 'Rice', 'price': '1', 'stock': '3'}])
+    seen = []
+    thread = threading.Thread(target=lambda: seen.append((backend.products_version(), backend.holds_version())))
+    thread.start()
+    thread.join()
+    assert seen == [(backend.products_version(), backend.holds_version())]
+
+    products = backend.products_version()
+    backend.append_sale('ORD1', 'C001', TODAY, 10.0)
+    backend.put_holds([{'hold_id': 'h1', 'cart_id': 'c1', 'product_id': 'P001', 'qty': 1, 'expires': 9e9}])
+    assert backend.products_version() == products   # sales and holds leave the products alone
+    backend.set_stock('P001', 2)
+    assert backend.products_version() == products + 1
+    backend.close()
+
+
+def test_migrating_twice_counts_each_sale_once(data_dir):
+    source = open_backend('csv', str(data_dir))
+    source.append_sale('ORD1', 'C001', TODAY, 25.0, [{'product_id': 'P001', 'price': '12.50', 'qty': 2}])
+    target = open_backend('sqlite', str(data_dir))
+    for _ in range(2):
+        counts = target.import_from(source)
+    assert (counts['sales'], counts['line_items']) == (1, 1)
+    assert len(list(target.iter_sales(TODAY, TODAY))) == 1
+    assert len(list(target.iter_line_items(TODAY, TODAY))) == 1
+    day, = target.daily_totals(TODAY, TODAY)
+    assert (day['orders'], day['revenue']) == (1, 25.0)
+    assert target.get_customer('C001')['name'] == 'Asha'
+    target.close()
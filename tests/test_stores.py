@@ -0,0 +1,14 @@
+# tests/test_stores.py
+import stores
+
+
+def partial(store, customer_ids, revenue):
+    return {'store': store, 'orders': len(customer_ids), 'revenue': revenue, 'customer_ids': set(customer_ids),
+            'units': len(customer_ids), 'products': {'P001': (len(customer_ids), revenue)}}
+
+
+def test_chain_counts_each_customer_once():
+    report = stores.merge_sales([partial('S01', ['C001', 'C002'], 30.0), partial('S02', ['C002', 'C003'], 50.0)])
+    assert [(r['store'], r['customers']) for r in report['stores']] == [('S02', 2), ('S01', 2)]
+    assert report['total'] == {'stores': 2, 'orders': 4, 'customers': 3, 'units': 4, 'revenue': 80.0}
+    assert report['top_products'] == [{'product_id': 'P001', 'units': 4, 'revenue': 80.0}]